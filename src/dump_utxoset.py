@@ -1,33 +1,212 @@
 import json, os, sys
+import argparse
 import datetime
+import mmap
+import struct
+import numpy as np
 from tqdm.auto import tqdm
 from store import *
 
+# Compact binary dump layout: a file header (magic, version, compression) followed by one row group per
+# UTXO batch. A row group is a (num_rows, payload_size, raw_size) header followed by the payload (of
+# payload_size bytes, zero padded to a multiple of 8), which holds the columns back to back, 8-byte columns
+# first so they stay aligned when memory-mapped: amount, blockDaaScore, script offsets (num_rows + 1),
+# txId (32 bytes each), index, isCoinbase, scripts
+binary_magic = b'KUTXO\x00'
+binary_version = 1
+binary_header = struct.Struct('<6sBB')
+row_group_header = struct.Struct('<QQQ')
+compressions = {'none': 0, 'zstd': 1}
+
+# File extension of each export format
+formats = {'json': 'json', 'binary': 'bin', 'arrow': 'arrow', 'parquet': 'parquet'}
+
+
+def _pad8(size):
+    return (8 - size % 8) % 8
+
+
+def _zstd():
+    try:
+        import zstandard
+    except ImportError:
+        raise ImportError('zstd compression of binary dumps requires the zstandard package')
+    return zstandard
+
+
+def write_json(batches, f):
+    """
+    Streams the UTXO batches as a JSON list, one entry at a time (same output as json.dump of the whole list)
+    """
+    f.write('[')
+    first = True
+    for batch in batches:
+        for tx_id, index, amount, script, daa_score, is_coinbase in zip(
+                batch.transaction_ids(), batch['index'].tolist(), batch['amount'].tolist(), batch.scripts(),
+                batch['blockDaaScore'].tolist(), batch['isCoinbase'].tolist()):
+            ex_entry = {
+                'txId': tx_id.hex(),
+                'index': index,
+                'amount': amount,
+                'pubkeyScript': script.hex(),
+                'blockDaaScore': daa_score,
+                'isCoinbase': is_coinbase
+            }
+            if not first:
+                f.write(', ')
+            first = False
+            f.write(json.dumps(ex_entry))
+    f.write(']')
+
+
+def write_binary(batches, f, compression='none'):
+    compressor = _zstd().ZstdCompressor() if compression == 'zstd' else None
+    f.write(binary_header.pack(binary_magic, binary_version, compressions[compression]))
+    for batch in batches:
+        columns = [batch['amount'].astype('<u8'), batch['blockDaaScore'].astype('<u8'),
+                   batch['pubkey_script_offsets'].astype('<i8'), batch['transactionId'],
+                   batch['index'].astype('<u4'), batch['isCoinbase'].astype(np.uint8), batch['pubkey_script']]
+        payload = b''.join(column.tobytes() for column in columns)
+        payload += b'\x00' * _pad8(len(payload))
+        raw_size = len(payload)
+        if compressor is not None:
+            payload = compressor.compress(payload)
+        f.write(row_group_header.pack(batch.num_rows, len(payload), raw_size))
+        f.write(payload)
+        f.write(b'\x00' * _pad8(len(payload)))
+
+
+def iter_binary(path):
+    """
+    Reads a binary dump back as UTXOBatch objects. Uncompressed dumps are memory-mapped, so the
+    columns are views over the file and nothing is read before it is accessed
+    """
+    with open(path, 'rb') as f:
+        buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    magic, version, compression = binary_header.unpack_from(buffer, 0)
+    if magic != binary_magic or version != binary_version:
+        raise ValueError('{} is not a version {} UTXO set dump'.format(path, binary_version))
+    decompressor = _zstd().ZstdDecompressor() if compression == compressions['zstd'] else None
+    position = binary_header.size
+    while position < len(buffer):
+        num_rows, payload_size, raw_size = row_group_header.unpack_from(buffer, position)
+        position += row_group_header.size
+        if decompressor is not None:
+            payload = decompressor.decompress(buffer[position:position + payload_size], max_output_size=raw_size)
+            payload_offset = 0
+        else:
+            payload, payload_offset = buffer, position
+        position += payload_size + _pad8(payload_size)
+        columns = {}
+        for field, dtype, count in (('amount', '<u8', num_rows), ('blockDaaScore', '<u8', num_rows),
+                                    ('pubkey_script_offsets', '<i8', num_rows + 1),
+                                    ('transactionId', 'S32', num_rows), ('index', '<u4', num_rows),
+                                    ('isCoinbase', np.bool_, num_rows)):
+            columns[field] = np.frombuffer(payload, dtype=dtype, count=count, offset=payload_offset)
+            payload_offset += columns[field].nbytes
+        columns['pubkey_script'] = np.frombuffer(
+            payload, dtype=np.uint8, count=int(columns['pubkey_script_offsets'][-1]), offset=payload_offset)
+        yield UTXOBatch(num_rows, columns)
+
+
+def _arrow_schema(pa):
+    return pa.schema([('txId', pa.binary(32)), ('index', pa.uint32()), ('amount', pa.uint64()),
+                      ('pubkeyScript', pa.binary()), ('blockDaaScore', pa.uint64()), ('isCoinbase', pa.bool_())])
+
+
+def _to_record_batch(pa, batch):
+    n = batch.num_rows
+    tx_ids = pa.FixedSizeBinaryArray.from_buffers(pa.binary(32), n, [None, pa.py_buffer(batch['transactionId'].tobytes())])
+    scripts = pa.BinaryArray.from_buffers(pa.binary(), n, [
+        None, pa.py_buffer(batch['pubkey_script_offsets'].astype(np.int32)), pa.py_buffer(batch['pubkey_script'])])
+    return pa.RecordBatch.from_arrays(
+        [tx_ids, pa.array(batch['index']), pa.array(batch['amount']), scripts,
+         pa.array(batch['blockDaaScore']), pa.array(batch['isCoinbase'])], schema=_arrow_schema(pa))
+
+
+def _from_record_batch(record_batch):
+    columns = {}
+    tx_ids = record_batch.column('txId')
+    columns['transactionId'] = np.frombuffer(tx_ids.buffers()[1], dtype='S32', count=len(tx_ids), offset=tx_ids.offset * 32)
+    scripts = record_batch.column('pubkeyScript')
+    _, offsets, data = scripts.buffers()
+    offsets = np.frombuffer(offsets, dtype=np.int32, count=len(scripts) + 1, offset=scripts.offset * 4).astype(np.int64)
+    columns['pubkey_script'] = np.frombuffer(data, dtype=np.uint8)[offsets[0]:offsets[-1]]
+    columns['pubkey_script_offsets'] = offsets - offsets[0]
+    for field, name in (('index', 'index'), ('amount', 'amount'), ('blockDaaScore', 'blockDaaScore'),
+                        ('isCoinbase', 'isCoinbase')):
+        columns[field] = record_batch.column(name).to_numpy(zero_copy_only=False)
+    return UTXOBatch(record_batch.num_rows, columns)
+
+
+def write_arrow(batches, path, compression='none'):
+    import pyarrow as pa
+    options = pa.ipc.IpcWriteOptions(compression=None if compression == 'none' else compression)
+    with pa.ipc.new_file(path, _arrow_schema(pa), options=options) as writer:
+        for batch in batches:
+            writer.write_batch(_to_record_batch(pa, batch))
+
+
+def write_parquet(batches, path, compression='none'):
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    with pq.ParquetWriter(path, _arrow_schema(pa), compression=compression) as writer:
+        for batch in batches:
+            # One row group per batch
+            writer.write_table(pa.Table.from_batches([_to_record_batch(pa, batch)]))
+
+
+def iter_utxo_dump(path):
+    """
+    Reads a binary, Arrow IPC or Parquet UTXO set dump back as UTXOBatch objects (memory-mapped where
+    the format allows it)
+    """
+    extension = os.path.splitext(path)[1][1:]
+    if extension == formats['binary']:
+        yield from iter_binary(path)
+    elif extension == formats['arrow']:
+        import pyarrow as pa
+        reader = pa.ipc.open_file(pa.memory_map(path))
+        for i in range(reader.num_record_batches):
+            yield _from_record_batch(reader.get_batch(i))
+    elif extension == formats['parquet']:
+        import pyarrow.parquet as pq
+        for record_batch in pq.ParquetFile(path, memory_map=True).iter_batches():
+            yield _from_record_batch(record_batch)
+    else:
+        raise ValueError('Unknown UTXO set dump format: {}'.format(path))
+
+
 def main():
-    datadir = sys.argv[1] if len(sys.argv) > 1 else os.getenv('localappdata') + r'\Kaspad\kaspa-mainnet\datadir2'
+    parser = argparse.ArgumentParser(description='Dumps the UTXO set of the pruning point')
+    parser.add_argument('datadir', nargs='?', default=None)
+    parser.add_argument('--format', choices=sorted(formats), default='json')
+    parser.add_argument('--compression', choices=sorted(compressions), default='none',
+                        help='Compression of binary, arrow and parquet dumps')
+    parser.add_argument('--batch-size', type=int, default=100000, help='UTXOs per row group')
+    args = parser.parse_args()
+    datadir = args.datadir if args.datadir is not None else os.getenv('localappdata') + r'\Kaspad\kaspa-mainnet\datadir2'
     store = Store(datadir)
     pp = store.pruning_point()
     block = store.get_header_data(pp)
     timestamp =  datetime.datetime.fromtimestamp(block.timeInMilliseconds/1000)
     print('Loading UTXOSET data for pruning point: {}, timestamp: {}, UTXO commitment: {}'.format(pp.hex(), timestamp, block.utxoCommitment.hex()))
-    utxoset = store.get_pruning_point_utxoset()
-    print('Parsing UTXOSET data')
-    lst = []
-    for (key, entry) in tqdm(iter(utxoset)):
-        ex_entry = {
-            'txId': key.transactionId.hex(),
-            'index': key.index,
-            'amount': entry.amount,
-            'pubkeyScript': entry.pubkey_script.hex(),
-            'blockDaaScore': entry.blockDaaScore,
-            'isCoinbase': entry.isCoinbase
-        }
-        lst.append(ex_entry)
+    batches = store.iter_pruning_point_utxoset(batch_size=args.batch_size)
     day, month, year = timestamp.day, timestamp.month, timestamp.year
-    fname = 'cp-{}-{}-{}-utxoset.json'.format(day, month, year)
+    fname = 'cp-{}-{}-{}-utxoset.{}'.format(day, month, year, formats[args.format])
     print('Writing the UTXOSET to file: ', fname)
-    with open(fname, 'w') as f:
-        json.dump(lst, f)
+    if args.format == 'json':
+        with open(fname, 'w') as f:
+            write_json(batches, f)
+    elif args.format == 'binary':
+        if args.compression == 'zstd':
+            _zstd()
+        with open(fname, 'wb') as f:
+            write_binary(batches, f, args.compression)
+    elif args.format == 'arrow':
+        write_arrow(batches, fname, args.compression)
+    else:
+        write_parquet(batches, fname, args.compression)
 
 if __name__ == '__main__':
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,165 @@
+"""
+This module contains an on-disk cache for columns loaded from the Kaspa DB.
+
+Entries are uncompressed .npz files keyed by the DB state (active prefix, tips and pruning point), so a warm
+start of an unchanged datadir reloads them instead of re-reading the whole LevelDB. Indexes which are queried
+in place are kept as directories of .npy files (see array_dir), so they can be memory-mapped.
+"""
+
+import os
+import json
+import shutil
+import hashlib
+
+import numpy as np
+
+
+class FrameCache:
+	"""
+	Class managing a size-capped directory of cached column sets
+	"""
+
+	format_version = 1
+
+	def __init__(self, cache_dir, max_bytes=8 * 2**30):
+		self.cache_dir = cache_dir
+		self.max_bytes = max_bytes
+		os.makedirs(cache_dir, exist_ok=True)
+
+	@staticmethod
+	def state_key(prefix, tips, pruning_point):
+		"""
+		Digest identifying the DB state. Any new block changes the tips, so a changed datadir never
+		matches the key of a cache built over an older state.
+		"""
+		digest = hashlib.sha256()
+		digest.update(prefix)
+		digest.update(pruning_point)
+		for tip in sorted(tips):
+			digest.update(tip)
+		return digest.hexdigest()
+
+	@staticmethod
+	def entry_name(kind, *parts):
+		"""
+		Builds an entry name from a kind and the parameters the entry depends on
+		"""
+		digest = hashlib.sha256()
+		for part in parts:
+			digest.update(part if isinstance(part, bytes) else json.dumps(part).encode('utf-8'))
+		return '{}-{}'.format(kind, digest.hexdigest()[:16])
+
+	def path(self, state_key, name):
+		return os.path.join(self.cache_dir, '{}-{}.npz'.format(name, state_key[:16]))
+
+	def array_dir(self, state_key, name):
+		"""
+		:return: The directory of a memory-mappable entry (created by the caller, evicted like .npz entries)
+		"""
+		return os.path.join(self.cache_dir, '{}-{}.npy.d'.format(name, state_key[:16]))
+
+	def load(self, state_key, name):
+		"""
+		:return: The cached columns, or None if missing or stale (stale and unreadable entries are removed)
+		"""
+		path = self.path(state_key, name)
+		if not os.path.exists(path):
+			return None
+		try:
+			with np.load(path, allow_pickle=False) as npz:
+				meta = json.loads(str(npz['__meta__']))
+				if meta['version'] != FrameCache.format_version or meta['key'] != state_key:
+					raise ValueError('stale cache entry')
+				columns = {field: _decode_column(npz, field, kind) for field, kind in meta['fields']}
+		except Exception as e:
+			print('Dropping invalid cache entry {} ({})'.format(path, e))
+			os.remove(path)
+			return None
+		# Mark as recently used so eviction drops the oldest entries first
+		os.utime(path)
+		return columns
+
+	def save(self, state_key, name, columns):
+		path = self.path(state_key, name)
+		arrays = {}
+		fields = []
+		for field, values in columns.items():
+			fields.append((field, _encode_column(arrays, field, values)))
+		meta = {'version': FrameCache.format_version, 'key': state_key, 'fields': fields}
+		arrays['__meta__'] = np.array(json.dumps(meta))
+		tmp_path = path + '.tmp'
+		with open(tmp_path, 'wb') as f:
+			np.savez(f, **arrays)
+		os.replace(tmp_path, path)
+		self.evict()
+
+	def evict(self):
+		"""
+		Removes least recently used entries until the cache fits in max_bytes
+		"""
+		entries = []
+		for file_name in os.listdir(self.cache_dir):
+			path = os.path.join(self.cache_dir, file_name)
+			if file_name.endswith('.npz'):
+				stat = os.stat(path)
+				entries.append((stat.st_mtime, stat.st_size, file_name))
+			elif file_name.endswith('.npy.d'):
+				size = sum(os.path.getsize(os.path.join(path, f)) for f in os.listdir(path))
+				entries.append((os.stat(path).st_mtime, size, file_name))
+		entries.sort()
+		total = sum(size for _, size, _ in entries)
+		for _, size, file_name in entries:
+			if total <= self.max_bytes:
+				break
+			_remove_entry(os.path.join(self.cache_dir, file_name))
+			total -= size
+
+	def clear(self):
+		for file_name in os.listdir(self.cache_dir):
+			if file_name.endswith('.npz') or file_name.endswith('.npy.d'):
+				_remove_entry(os.path.join(self.cache_dir, file_name))
+
+
+def _remove_entry(path):
+	if os.path.isdir(path):
+		shutil.rmtree(path)
+	else:
+		os.remove(path)
+
+
+def _encode_column(arrays, field, values):
+	if isinstance(values, np.ndarray):
+		arrays[field] = values
+		return 'array'
+	if len(values) > 0 and isinstance(values[0], int) and not isinstance(values[0], bool) and \
+			np.asarray(values).dtype == object:
+		# Ints beyond 64 bits (e.g. blue work) are kept as big-endian bytes
+		kind = 'int'
+		values = [v.to_bytes((v.bit_length() + 7) // 8, 'big') for v in values]
+	elif len(values) > 0 and isinstance(values[0], (bytes, str)):
+		kind = 'bytes' if isinstance(values[0], bytes) else 'str'
+		if kind == 'str':
+			values = [v.encode('utf-8') for v in values]
+	else:
+		arrays[field] = np.asarray(values)
+		return 'list'
+	offsets = np.zeros(len(values) + 1, dtype=np.int64)
+	np.cumsum([len(v) for v in values], out=offsets[1:])
+	arrays[field + '.offsets'] = offsets
+	arrays[field + '.data'] = np.frombuffer(b''.join(values), dtype=np.uint8)
+	return kind
+
+
+def _decode_column(npz, field, kind):
+	if kind == 'array':
+		return npz[field]
+	if kind == 'list':
+		return npz[field].tolist()
+	offsets = npz[field + '.offsets'].tolist()
+	data = npz[field + '.data'].tobytes()
+	values = [data[offsets[i]:offsets[i + 1]] for i in range(len(offsets) - 1)]
+	if kind == 'str':
+		values = [v.decode('utf-8') for v in values]
+	elif kind == 'int':
+		values = [int.from_bytes(v, 'big') for v in values]
+	return values
@@ -15,12 +15,23 @@ import kbech32
 from store import Store
 
 
-def load_blocks(store, filter_=None):    
+def load_blocks(store, filter_=None, range_=None):    
     store.load_blocks()
 
+    block_hashes = None
+    if range_:
+        # Only the blocks in range are read, before any filter runs. The range index loads from its saved copy
+        # (or the cache) when there is one, and only reads all headers when it has to be built
+        field, lo, hi = range_
+        ids = store.blocks_in_range(field, lo, hi)
+        block_hashes = [h for h in store.block_range_index.hashes(ids) if h in store.blocks]
+    else:
+        store.load_header_table()
+
     header_fields = ['timeInMilliseconds', 'blueScore', 'blueWork', 'daaScore', 'difficulty']
     block_fields = ['pubkey_script']
-    frames = store.load_data(header_fields=header_fields, block_fields=block_fields, count_fields=[])
+    frames = store.load_data(header_fields=header_fields, block_fields=block_fields, count_fields=[],
+                             block_hashes=block_hashes)
     
     df = pd.DataFrame(frames).set_index('hash')
     df["address"] = df["pubkey_script"].apply(kbech32.toAddress)
@@ -123,6 +134,10 @@ if __name__ == "__main__":
     parser.add_argument("--group-by", default="blueScore",
                        help="What field define the groups")
     parser.add_argument("--filter", help="Filter the nodes to include in the graph. Pandas `query` syntax")
+    parser.add_argument("--range", nargs=3, metavar=("FIELD", "LO", "HI"),
+                        help="Only load blocks with LO <= FIELD <= HI (timeInMilliseconds, daaScore or blueScore)")
+    parser.add_argument("--cache-dir",
+                        help="Directory where loaded data and indexes (such as the range index) are cached")
     
     args = parser.parse_args()
                         
@@ -132,13 +147,14 @@ if __name__ == "__main__":
     logging.basicConfig(level=logging.INFO)
     
     try:
-        store = Store(args.path)
+        store = Store(args.path, cache_dir=args.cache_dir)
     except plyvel._plyvel.IOError as e:
         logging.critical(f"Could not open leveldb. Check no process has opened it. ({e.args[0].decode('utf-8')})")
         sys.exit(1)
         
     logging.info("Loading blocks")
-    blocks = load_blocks(store, args.filter)
+    range_ = (args.range[0], int(args.range[1]), int(args.range[2])) if args.range else None
+    blocks = load_blocks(store, args.filter, range_)
     logging.info("Building graph")
     G = blocks_to_graphs(store, blocks, args.group_by, args.group_size)
     logging.info("Saving graph")
@@ -53,6 +53,38 @@ def toAddress(script):
         return encodeAddress("kaspa", script[1:(1+script[0])], version)
     raise NotImplementedError(script.hex())
 
+def decodeAddress(address):
+    prefix, _, data = address.partition(":")
+    values = [charset.index(c) for c in data]
+    checksum_num = polymod(
+        bytes([ord(c) & 0x1f for c in prefix]) +
+        bytes([0]) + bytes(values[:-8]) +
+        bytes([0, 0, 0, 0, 0, 0, 0, 0])
+    )
+    if bytes([(checksum_num >> 5*i) & 0x1f for i in range(7,-1,-1)]) != bytes(values[-8:]):
+        raise ValueError("Invalid address checksum: " + address)
+    accumulator = 0
+    bits = 0
+    ret = []
+    for value in values[:-8]:
+        accumulator = (accumulator << 5) | value
+        bits = bits + 5
+        if bits >= 8:
+            bits = bits - 8
+            ret.append((accumulator >> bits) & 0xff)
+    return prefix, bytes(ret[1:]), ret[0]
+
+def toScript(address):
+    # The inverse of toAddress
+    _, payload, version = decodeAddress(address)
+    if version == 0x08:
+        return bytes([0xaa, len(payload)]) + payload + bytes([0x87])
+    if version == 0x01:
+        return bytes([len(payload)]) + payload + bytes([0xab])
+    if version == 0x00:
+        return bytes([len(payload)]) + payload + bytes([0xac])
+    raise NotImplementedError(address)
+
 # Uncomment for testing
 # if __name__ == "__main__":
 #     # Should be kaspa:qyp7xyqdshh6aylqct7x2je0pse4snep8glallgz8jppyaajz7y7qeq4x79fq4z
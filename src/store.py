@@ -1,10 +1,20 @@
-from collections import deque
+import os
+import json
+import time
+import hashlib
+import heapq
+from array import array
+from collections import OrderedDict, deque
+from concurrent.futures import ProcessPoolExecutor
 
 # To install plyvel on Windows, run: `python -m pip install plyvel-wheels`
 # (simple `pip install plyvel` might not work)
 import plyvel
+import numpy as np
 import dbobjects_pb2 as KaspadDB
+import kbech32
 from tqdm.auto import tqdm
+from frame_cache import FrameCache
 
 # A bunch of Kaspa DB kay and store names used below
 sep = b'/'
@@ -28,6 +38,23 @@ utxo_diff_child_store = b'utxo-diff-children'
 highest_chain_block_index = b'highest-chain-block-index'
 chain_block_hash_by_index = b'chain-block-hash-by-index'
 chain_block_index_by_hash = b'chain-block-index-by-hash'
+acceptance_data_store = b'acceptance-data'
+reachability_data_store = b'reachability-data'
+daa_score_store = b'daa-score'
+daa_added_blocks_store = b'daa-added-blocks'
+daa_window_store = b'daa-window'
+
+# Mainnet difficulty adjustment parameters
+difficulty_window_size = 2641
+target_time_per_block = 1000  # In milliseconds
+pow_max = 2 ** 255 - 1
+
+# Mass parameters (kaspad defaults)
+mass_per_tx_byte = 1
+mass_per_script_pub_key_byte = 10
+mass_per_sig_op = 1000
+
+coinbase_subnetwork_id = (1).to_bytes(20, 'little')
 
 
 class Block:
@@ -40,6 +67,663 @@ class Block:
 		self.children = []
 
 
+class LRUCache(dict):
+	"""
+	Dict with an optional entry budget, evicting least recently used entries once it is exceeded.
+	Pinned entries (see pin_all) are never evicted and do not count towards the budget.
+	Lookups through get() are counted as hits or misses.
+	"""
+
+	def __init__(self, max_entries=None):
+		super().__init__()
+		self.max_entries = max_entries
+		# Unpinned keys in least recently used order
+		self._recent = OrderedDict()
+		self.hits = 0
+		self.misses = 0
+		self.evictions = 0
+
+	def get(self, key, default=None):
+		value = super().get(key, _missing)
+		if value is _missing:
+			self.misses += 1
+			return default
+		self.hits += 1
+		if key in self._recent:
+			self._recent.move_to_end(key)
+		return value
+
+	def __setitem__(self, key, value):
+		pinned = key in self and key not in self._recent
+		super().__setitem__(key, value)
+		if pinned:
+			return
+		self._recent[key] = None
+		self._recent.move_to_end(key)
+		if self.max_entries is not None:
+			while len(self._recent) > self.max_entries:
+				super().__delitem__(self._recent.popitem(last=False)[0])
+				self.evictions += 1
+
+	def __delitem__(self, key):
+		super().__delitem__(key)
+		self._recent.pop(key, None)
+
+	def pop(self, key, *default):
+		self._recent.pop(key, None)
+		return super().pop(key, *default)
+
+	def clear(self):
+		super().clear()
+		self._recent.clear()
+
+	def pin(self, key, value):
+		"""
+		Sets a pinned entry, exempt from eviction and from the budget
+		"""
+		super().__setitem__(key, value)
+		self._recent.pop(key, None)
+
+	def pin_all(self):
+		"""
+		Pins the current entries
+		"""
+		self._recent.clear()
+
+	def stats(self):
+		return {'entries': len(self), 'pinned': len(self) - len(self._recent), 'max_entries': self.max_entries,
+				'hits': self.hits, 'misses': self.misses, 'evictions': self.evictions}
+
+
+_missing = object()
+
+
+class BlockIndex:
+	"""
+	Class interning block hashes as dense int32 IDs. Hashes are stored once in a contiguous 'S32' array
+	and the ID of a block is its position in that array.
+	"""
+
+	def __init__(self, hashes=None):
+		self.hashes = np.empty(0, dtype='S32')
+		self._order = np.empty(0, dtype=np.int32)
+		self._sorted = self.hashes
+		if hashes is not None:
+			self.extend(hashes)
+
+	def __len__(self):
+		return len(self.hashes)
+
+	def ids(self, block_hashes):
+		"""
+		:return: An int32 array with the IDs of the given hashes (-1 for unknown hashes)
+		"""
+		keys = np.asarray(block_hashes, dtype='S32')
+		if len(self.hashes) == 0:
+			return np.full(len(keys), -1, dtype=np.int32)
+		positions = np.searchsorted(self._sorted, keys)
+		positions[positions == len(self._sorted)] = 0
+		found = self._sorted[positions] == keys
+		return np.where(found, self._order[positions], -1).astype(np.int32)
+
+	def id(self, block_hash):
+		return int(self.ids([block_hash])[0])
+
+	def hash(self, block_id):
+		return self.hashes[block_id:block_id + 1].tobytes()
+
+	def hash_list(self, block_ids):
+		return hash_list(self.hashes[block_ids])
+
+	def extend(self, block_hashes):
+		"""
+		Interns the given hashes (in order, skipping known and repeated ones)
+		:return: The IDs of all given hashes
+		"""
+		keys = np.asarray(block_hashes, dtype='S32')
+		unknown = keys[self.ids(keys) < 0]
+		_, first = np.unique(unknown, return_index=True)
+		if len(first) > 0:
+			self.hashes = np.concatenate([self.hashes, unknown[np.sort(first)]])
+			self._order = np.argsort(self.hashes, kind='stable').astype(np.int32)
+			self._sorted = self.hashes[self._order]
+		return self.ids(keys)
+
+
+class BlockGraph:
+	"""
+	Class holding the relations of loaded blocks as compressed-sparse-row arrays over a BlockIndex (usually
+	Store.block_index). loaded_ids holds the IDs of the loaded blocks in load order, and row i of each direction
+	lists the IDs of the parents/children of the i'th loaded block. Referenced blocks which were not loaded
+	(e.g. the parents of the pruning point) have an ID but no row.
+	"""
+
+	def __init__(self, index, loaded_ids, parent_offsets, parent_ids, child_offsets, child_ids):
+		self.index = index
+		self.loaded_ids = loaded_ids
+		self.parent_offsets = parent_offsets
+		self.parent_ids = parent_ids
+		self.child_offsets = child_offsets
+		self.child_ids = child_ids
+		self._rows = np.full(len(index), -1, dtype=np.int64)
+		self._rows[loaded_ids] = np.arange(len(loaded_ids))
+
+	@property
+	def num_loaded(self):
+		return len(self.loaded_ids)
+
+	@classmethod
+	def from_relations(cls, index, hash, num_parents, parents, num_children, children):
+		"""
+		Builds the graph from the relation columns of the loaded blocks (as in Store._blocks_to_columns),
+		interning their hashes in index
+		"""
+		loaded_ids = index.extend(hash)
+		parent_ids = index.extend(parents)
+		child_ids = index.extend(children)
+		return cls(index, loaded_ids, _csr_offsets(num_parents), parent_ids, _csr_offsets(num_children), child_ids)
+
+	def rows(self, block_ids):
+		"""
+		:return: The row of each given block (-1 for blocks which are not loaded)
+		"""
+		block_ids = np.asarray(block_ids, dtype=np.int64)
+		known = (block_ids >= 0) & (block_ids < len(self._rows))
+		return np.where(known, self._rows[np.where(known, block_ids, 0)], -1)
+
+	def take(self, block_ids):
+		"""
+		:return: A graph of the same type holding only the given loaded blocks, in the given order
+		"""
+		rows = self.rows(block_ids)
+		parent_counts, parent_ids = _csr_gather(self.parent_offsets, self.parent_ids, rows)
+		child_counts, child_ids = _csr_gather(self.child_offsets, self.child_ids, rows)
+		return type(self)(self.index, self.loaded_ids[rows], _csr_offsets(parent_counts), parent_ids,
+						  _csr_offsets(child_counts), child_ids)
+
+	def num_parents(self):
+		return np.diff(self.parent_offsets)
+
+	def num_children(self):
+		return np.diff(self.child_offsets)
+
+	def degree_histogram(self, use_children=False):
+		"""
+		:return: An array whose i'th entry counts the loaded blocks with i parents (or children)
+		"""
+		return np.bincount(self.num_children() if use_children else self.num_parents())
+
+	def matrix(self, use_children=False):
+		"""
+		:return: The parents (or children) adjacency as a scipy.sparse.csr_matrix of shape
+			(num_loaded, len(index)) with entry (i, j) set if block ID j is a parent (child) of loaded block i
+		"""
+		# scipy is only needed for this method
+		from scipy.sparse import csr_matrix
+		offsets, ids = (self.child_offsets, self.child_ids) if use_children else (self.parent_offsets, self.parent_ids)
+		data = np.ones(len(ids), dtype=np.int8)
+		return csr_matrix((data, ids, offsets), shape=(self.num_loaded, len(self.index)))
+
+	def bfs(self, root_ids, use_children):
+		"""
+		Level-synchronous BFS over the loaded blocks, equivalent to the FIFO BFS of the Store loaders
+		:return: The reached loaded IDs in visiting order, and the number of reached blocks which are not loaded
+		"""
+		offsets, ids = (self.child_offsets, self.child_ids) if use_children else (self.parent_offsets, self.parent_ids)
+		visited = np.zeros(len(self.index), dtype=bool)
+		root_ids = np.asarray(root_ids, dtype=np.int32)
+		frontier = _unique_in_order(root_ids[root_ids >= 0])
+		visited[frontier] = True
+		order = []
+		missing = 0
+		while len(frontier) > 0:
+			rows = self.rows(frontier)
+			loaded = frontier[rows >= 0]
+			missing += len(frontier) - len(loaded)
+			order.append(loaded)
+			_, neighbours = _csr_gather(offsets, ids, rows[rows >= 0])
+			neighbours = _unique_in_order(neighbours[~visited[neighbours]])
+			visited[neighbours] = True
+			frontier = neighbours
+		return np.concatenate(order).astype(np.int32) if order else np.empty(0, dtype=np.int32), missing
+
+	def reachable(self, root_ids, use_children=True):
+		"""
+		:return: A boolean mask over the index marking the blocks reachable from root_ids (inclusive), i.e.
+			their future when following children or their past when following parents
+		"""
+		order, _ = self.bfs(root_ids, use_children)
+		mask = np.zeros(len(self.index), dtype=bool)
+		mask[order] = True
+		return mask
+
+
+class MergesetIndex:
+	"""
+	Class holding the mergesets of selected chain blocks as ID arrays over a BlockIndex (usually
+	Store.block_index). Chain blocks are
+	ordered from the headers selected tip down, and the blue/red mergeset members of chain block i are
+	blue_ids[blue_offsets[i]:blue_offsets[i+1]] (red_ids likewise), in ghostdag data order.
+	"""
+
+	def __init__(self, index, chain_ids, selected_parent_ids, blue_offsets, blue_ids, red_offsets, red_ids):
+		self.index = index
+		self.chain_ids = chain_ids
+		self.selected_parent_ids = selected_parent_ids
+		self.blue_offsets = blue_offsets
+		self.blue_ids = blue_ids
+		self.red_offsets = red_offsets
+		self.red_ids = red_ids
+
+	def __len__(self):
+		return len(self.chain_ids)
+
+
+class UTXODiffTree:
+	"""
+	Class holding the utxo-diff-children pointers as a parent-pointer array over a BlockIndex (usually
+	Store.block_index): child[i] is the ID of the diff child of block i, or -1 (also for IDs interned after the
+	tree was built, which are beyond len(child)), with the blue work of each tree block attached. Common-root
+	queries use binary lifting: ancestors[k][i] is the 2^k-th diff child of i (roots point to themselves).
+	"""
+
+	def __init__(self, index, child, blue_work=None):
+		self.index = index
+		self.child = child
+		self.blue_work = blue_work
+		up = np.where(child >= 0, child, np.arange(len(child), dtype=np.int32)).astype(np.int32)
+		self.depth = (child >= 0).astype(np.int64)
+		self.ancestors = [up]
+		# Pointer jumping: after k rounds depth is exact for blocks within 2^k steps of their root
+		while len(up) > 0 and np.any(up[up] != up):
+			self.depth = self.depth + self.depth[up]
+			up = up[up]
+			self.ancestors.append(up)
+
+	def __len__(self):
+		return len(self.child)
+
+	def _lift(self, ids, steps):
+		for k, up in enumerate(self.ancestors):
+			mask = (steps >> k) & 1 == 1
+			ids[mask] = up[ids[mask]]
+		return ids
+
+	def common_root_ids(self, low_ids, high_ids):
+		"""
+		:return: The ID of the first common block of the diff-child chains starting at the given blocks,
+			or -1 if the chains do not meet (or a block is unknown)
+		"""
+		low_ids = np.array(low_ids, dtype=np.int32)
+		high_ids = np.array(high_ids, dtype=np.int32)
+		if len(self) == 0:
+			return np.full(len(low_ids), -1, dtype=np.int32)
+		known = (low_ids >= 0) & (high_ids >= 0)
+		u, v = np.where(known, low_ids, 0), np.where(known, high_ids, 0)
+		swap = self.depth[u] < self.depth[v]
+		u, v = np.where(swap, v, u), np.where(swap, u, v)
+		u = self._lift(u, self.depth[u] - self.depth[v])
+		for up in reversed(self.ancestors):
+			mask = up[u] != up[v]
+			u[mask], v[mask] = up[u[mask]], up[v[mask]]
+		roots = np.where(u == v, u, self.ancestors[0][u])
+		met = (u == v) | ((self.ancestors[0][u] == self.ancestors[0][v]) & (self.child[u] >= 0))
+		return np.where(known & met, roots, -1).astype(np.int32)
+
+	def common_roots(self, low_hashes, high_hashes):
+		"""
+		Batch version of Store.get_common_utxo_diff_root
+		:return: The common root of each pair (None if the chains do not meet)
+		"""
+		roots = self.common_root_ids(self._child_ids(low_hashes), self._child_ids(high_hashes))
+		return [self.index.hash(root) if root >= 0 else None for root in roots.tolist()]
+
+	def _child_ids(self, block_hashes):
+		ids = self.index.ids(block_hashes)
+		known = (ids >= 0) & (ids < len(self))
+		if len(self) == 0:
+			return np.full(len(ids), -1, dtype=np.int32)
+		return np.where(known, self.child[np.where(known, ids, 0)], -1)
+
+
+class ReachabilityIndex:
+	"""
+	Class holding kaspad's reachability data as arrays over a BlockIndex (usually Store.block_index): whether
+	each block has reachability data (has_data), its reachability tree interval (interval_start, interval_end)
+	and parent, and the future covering sets in CSR form (fcs_offsets, fcs_ids), each set ordered by interval
+	start. Blocks without data, including IDs interned after the index was built, are unknown.
+
+	Queries mirror kaspad (and simulation/ghostdag/reachability): a is a chain ancestor of b if its tree
+	interval contains b's, and a DAG ancestor of b if it is a chain ancestor or one of its future covering
+	blocks is. The candidate covering block is found by a binary search over interval starts (as in
+	is_future_block) and then checked for containment. Both relations hold when a == b.
+	"""
+
+	def __init__(self, index, has_data, parent, interval_start, interval_end, fcs_offsets, fcs_ids):
+		self.index = index
+		self.has_data = has_data
+		self.parent = parent
+		self.interval_start = interval_start
+		self.interval_end = interval_end
+		self.fcs_offsets = fcs_offsets
+		self.fcs_ids = fcs_ids
+		# Future covering blocks keyed by (owner, rank of interval start), so a single searchsorted finds the
+		# last covering block starting at or before a given point in any owner's set
+		self._starts = np.unique(interval_start)
+		self._key_stride = len(self._starts) + 1
+		owners = np.repeat(np.arange(len(fcs_offsets) - 1, dtype=np.int64), np.diff(fcs_offsets))
+		self._fcs_keys = owners * self._key_stride + np.searchsorted(self._starts, interval_start[fcs_ids])
+
+	def __len__(self):
+		return len(self.parent)
+
+	def _known(self, ids):
+		known = (ids >= 0) & (ids < len(self))
+		known[known] = self.has_data[ids[known]]
+		return known
+
+	def is_chain_ancestor_of_ids(self, a_ids, b_ids):
+		a_ids, b_ids = np.asarray(a_ids, dtype=np.int64), np.asarray(b_ids, dtype=np.int64)
+		known = self._known(a_ids) & self._known(b_ids)
+		a, b = np.where(known, a_ids, 0), np.where(known, b_ids, 0)
+		if len(self) == 0:
+			return np.zeros(len(a_ids), dtype=bool)
+		return known & (self.interval_start[a] <= self.interval_start[b]) & (self.interval_end[b] <= self.interval_end[a])
+
+	def is_dag_ancestor_of_ids(self, a_ids, b_ids):
+		a_ids, b_ids = np.asarray(a_ids, dtype=np.int64), np.asarray(b_ids, dtype=np.int64)
+		result = self.is_chain_ancestor_of_ids(a_ids, b_ids)
+		known = self._known(a_ids) & self._known(b_ids)
+		if len(self) == 0 or len(self.fcs_ids) == 0:
+			return result
+		a, b = np.where(known, a_ids, 0), np.where(known, b_ids, 0)
+		end = self.interval_end[b]
+		# Candidate: the last covering block of a starting at or before b's interval end
+		query = a * self._key_stride + np.searchsorted(self._starts, end, side='right')
+		candidate = np.searchsorted(self._fcs_keys, query) - 1
+		in_set = candidate >= self.fcs_offsets[a]
+		candidate = self.fcs_ids[np.maximum(candidate, 0)]
+		covered = in_set & (self.interval_start[candidate] <= self.interval_start[b]) & (end <= self.interval_end[candidate])
+		return result | (known & covered)
+
+	def is_chain_ancestor_of(self, a_hashes, b_hashes):
+		"""
+		:return: A boolean array marking the pairs where a is in the selected chain of b (False for unknown blocks)
+		"""
+		return self.is_chain_ancestor_of_ids(self.index.ids(a_hashes), self.index.ids(b_hashes))
+
+	def is_dag_ancestor_of(self, a_hashes, b_hashes):
+		"""
+		:return: A boolean array marking the pairs where a is in the past of b (False for unknown blocks)
+		"""
+		return self.is_dag_ancestor_of_ids(self.index.ids(a_hashes), self.index.ids(b_hashes))
+
+
+class DAAIndex:
+	"""
+	Class holding the DAA data of many blocks as arrays over a BlockIndex (usually Store.block_index): the
+	selected parent (-1 if unknown) and DAA score (-1 if missing) of each block, and the blocks each block added
+	to the DAA window (the daa-added-blocks bucket) in CSR form (added_offsets, added_ids). block_ids holds the
+	IDs of the blocks with DAA data (in hash order) and has_data marks them.
+
+	kaspad only keeps the daa-window bucket for blocks with trusted data, so windows are rebuilt from the added
+	blocks: every block of the difficulty window of B was added by a block of B's selected chain (B included),
+	and the window is made of the window_size of these with the highest blue work.
+	"""
+
+	def __init__(self, index, block_ids, selected_parent, daa_score, added_offsets, added_ids):
+		self.index = index
+		self.block_ids = block_ids
+		self.has_data = np.zeros(len(selected_parent), dtype=bool)
+		self.has_data[block_ids] = True
+		self.selected_parent = selected_parent
+		self.daa_score = daa_score
+		self.added_offsets = added_offsets
+		self.added_ids = added_ids
+
+	def __len__(self):
+		return len(self.selected_parent)
+
+	def window_ids(self, ids, blue_work, window_size=difficulty_window_size):
+		"""
+		Rebuilds the difficulty windows of the given blocks, walking all their selected chains together (one
+		chain block per iteration)
+
+		:param blue_work: Values ordered as the blue work of the first len(self) blocks of the index, such as
+			its rank (see _blue_work_ranks), or -inf if unknown
+		:return: The CSR offsets of the windows and the concatenated window block IDs, each window ordered by
+			decreasing blue work (windows are shorter than window_size where the DAA data runs out)
+		"""
+		ids = np.asarray(ids, dtype=np.int64)
+		counts = np.diff(self.added_offsets)
+		lowest_added = np.full(len(counts), np.inf)
+		nonempty = counts > 0
+		if np.any(nonempty):
+			lowest_added[nonempty] = np.minimum.reduceat(blue_work[self.added_ids], self.added_offsets[:-1][nonempty])
+
+		steps_rows, steps_chain = [], []
+		rows, current = np.arange(len(ids)), ids
+		num_added = np.zeros(len(ids), dtype=np.int64)
+		lowest = np.full(len(ids), np.inf)
+		while len(rows) > 0:
+			steps_rows.append(rows)
+			steps_chain.append(current)
+			num_added[rows] += counts[current]
+			lowest[rows] = np.minimum(lowest[rows], lowest_added[current])
+			current = self.selected_parent[current].astype(np.int64)
+			# Blocks added further down the chain have less blue work than the chain block adding them, so
+			# a full window is final once that block has no more blue work than all blocks collected so far
+			keep = current >= 0
+			keep[keep] = (num_added[rows[keep]] < window_size) | (blue_work[current[keep]] > lowest[rows[keep]])
+			rows, current = rows[keep], current[keep]
+
+		chain_rows = np.concatenate(steps_rows) if steps_rows else np.empty(0, dtype=np.int64)
+		chain_ids = np.concatenate(steps_chain) if steps_chain else np.empty(0, dtype=np.int64)
+		num_items, window = _csr_gather(self.added_offsets, self.added_ids, chain_ids)
+		owners = np.repeat(chain_rows, num_items)
+		order = np.lexsort((-blue_work[window], owners))
+		owners, window = owners[order], window[order]
+		sizes = np.bincount(owners, minlength=len(ids))
+		rank = np.arange(len(owners)) - np.repeat(_csr_offsets(sizes)[:-1], sizes)
+		return _csr_offsets(np.minimum(sizes, window_size)), window[rank < window_size]
+
+
+def _compact_to_targets(bits):
+	"""
+	:return: The targets of an array of compact bits, as float64
+	"""
+	bits = np.asarray(bits, dtype=np.int64)
+	return np.ldexp((bits & 0x007fffff).astype(np.float64), 8 * ((bits >> 24) - 3))
+
+
+def _targets_to_compact(targets):
+	"""
+	Vectorized HeaderData.big_to_compact of float64 targets, capped at pow_max
+	"""
+	targets = np.asarray(targets, dtype=np.float64)
+	_, bit_lengths = np.frexp(targets)
+	exponents = (bit_lengths.astype(np.int64) + 7) // 8
+	mantissas = np.floor(np.ldexp(targets, -8 * (exponents - 3))).astype(np.int64)
+	carry = (mantissas & 0x00800000) != 0
+	mantissas[carry] >>= 8
+	exponents[carry] += 1
+	bits = (exponents << 24 | mantissas).astype(np.uint32)
+	bits[targets >= float(pow_max)] = HeaderData.big_to_compact(pow_max)
+	return bits
+
+
+def _window_targets(window_offsets, window_ids, targets, timestamps, window_size, target_time):
+	"""
+	kaspad's difficulty adjustment over many windows at once: the average target of the window without its
+	earliest block, scaled by the window timespan over the expected one. Computed in float64, so the encoded
+	bits can be one mantissa unit off kaspad's integer arithmetic.
+
+	:return: The expected target of each window (NaN for windows shorter than window_size)
+	"""
+	sizes = np.diff(window_offsets)
+	full = sizes >= window_size
+	expected = np.full(len(sizes), np.nan)
+	if not np.any(full):
+		return expected
+	owners = np.repeat(np.arange(len(sizes)), sizes)
+	in_full = full[owners]
+	owners, ids = owners[in_full], window_ids[in_full]
+	starts = _csr_offsets(sizes[full])[:-1]
+	window_times, window_targets = timestamps[ids], targets[ids]
+	# The earliest block of each window (the first one in window order on ties)
+	earliest = np.lexsort((np.arange(len(ids)), window_times, owners))[starts]
+	timespan = np.maximum.reduceat(window_times, starts) - window_times[earliest]
+	average = (np.add.reduceat(window_targets, starts) - window_targets[earliest]) / (window_size - 1)
+	expected[full] = average * timespan / target_time / (window_size - 1)
+	return expected
+
+
+class CompactBlocks(BlockGraph):
+	"""
+	Class holding loaded block relations as a BlockGraph, as an alternative to a dict of Block objects.
+	Supports the mapping interface of Store.blocks, building Block objects on access.
+	"""
+
+	max_entries = None
+
+	def __init__(self, index, loaded_ids, parent_offsets, parent_ids, child_offsets, child_ids):
+		super().__init__(index, loaded_ids, parent_offsets, parent_ids, child_offsets, child_ids)
+		self.alive = np.ones(len(loaded_ids), dtype=bool)
+		self._num_alive = len(loaded_ids)
+		# Blocks added or modified after construction (e.g. by Store.refresh)
+		self.overlay = {}
+		self.hits = 0
+		self.misses = 0
+
+	def is_pristine(self):
+		return len(self.overlay) == 0 and self._num_alive == self.num_loaded
+
+	def to_relations(self):
+		alive_rows = self.alive_rows()
+		parent_counts, parent_ids = _csr_gather(self.parent_offsets, self.parent_ids, alive_rows)
+		child_counts, child_ids = _csr_gather(self.child_offsets, self.child_ids, alive_rows)
+		columns = {
+			'hash': 		self.index.hashes[self.loaded_ids[alive_rows]],
+			'num_parents': 	parent_counts.astype(np.int32),
+			'parents': 		self.index.hashes[parent_ids],
+			'num_children': child_counts.astype(np.int32),
+			'children': 	self.index.hashes[child_ids],
+		}
+		if len(self.overlay) > 0:
+			blocks = self.overlay.values()
+			columns['hash'] = np.concatenate([columns['hash'], np.array(list(self.overlay), dtype='S32')])
+			for field, relation in (('parents', 'parents'), ('children', 'children')):
+				counts = np.array([len(getattr(block, relation)) for block in blocks], dtype=np.int32)
+				flat = np.array([h for block in blocks for h in getattr(block, relation)], dtype='S32')
+				columns['num_' + field] = np.concatenate([columns['num_' + field], counts])
+				columns[field] = np.concatenate([columns[field], flat])
+		return columns
+
+	def alive_rows(self):
+		return np.flatnonzero(self.alive)
+
+	def _loaded_row(self, block_hash):
+		row = int(self.rows([self.index.id(block_hash)])[0])
+		if row >= 0 and self.alive[row]:
+			return row
+		return -1
+
+	def _block(self, row):
+		block = Block()
+		block.parents = self.index.hash_list(self.parent_ids[self.parent_offsets[row]:self.parent_offsets[row + 1]])
+		block.children = self.index.hash_list(self.child_ids[self.child_offsets[row]:self.child_offsets[row + 1]])
+		return block
+
+	def get(self, block_hash, default=None):
+		block = self.overlay.get(block_hash)
+		if block is None:
+			row = self._loaded_row(block_hash)
+			block = self._block(row) if row >= 0 else None
+		if block is None:
+			self.misses += 1
+			return default
+		self.hits += 1
+		return block
+
+	def __getitem__(self, block_hash):
+		block = self.overlay.get(block_hash)
+		if block is not None:
+			return block
+		row = self._loaded_row(block_hash)
+		if row < 0:
+			raise KeyError(block_hash)
+		return self._block(row)
+
+	def __setitem__(self, block_hash, block):
+		row = self._loaded_row(block_hash)
+		if row >= 0:
+			self.alive[row] = False
+			self._num_alive -= 1
+		self.overlay[block_hash] = block
+
+	def pin(self, block_hash, block):
+		# No entry is ever evicted
+		self[block_hash] = block
+
+	def __delitem__(self, block_hash):
+		if block_hash in self.overlay:
+			del self.overlay[block_hash]
+			return
+		row = self._loaded_row(block_hash)
+		if row < 0:
+			raise KeyError(block_hash)
+		self.alive[row] = False
+		self._num_alive -= 1
+
+	def __contains__(self, block_hash):
+		return block_hash in self.overlay or self._loaded_row(block_hash) >= 0
+
+	def __len__(self):
+		return self._num_alive + len(self.overlay)
+
+	def __iter__(self):
+		return iter(self.keys())
+
+	def keys(self):
+		return self.index.hash_list(self.loaded_ids[self.alive_rows()]) + list(self.overlay.keys())
+
+	def values(self):
+		return [self[block_hash] for block_hash in self.keys()]
+
+	def items(self):
+		return [(block_hash, self[block_hash]) for block_hash in self.keys()]
+
+	def stats(self):
+		return {'entries': len(self), 'pinned': len(self), 'max_entries': None, 'hits': self.hits,
+				'misses': self.misses, 'evictions': 0}
+
+
+def _csr_offsets(counts):
+	offsets = np.zeros(len(counts) + 1, dtype=np.int64)
+	np.cumsum(counts, out=offsets[1:])
+	return offsets
+
+
+def _csr_gather(offsets, indices, rows):
+	"""
+	:return: The lengths of the given CSR rows and their concatenated indices
+	"""
+	rows = np.asarray(rows, dtype=np.int64)
+	starts = offsets[rows]
+	counts = offsets[rows + 1] - starts
+	total = int(counts.sum())
+	if total == 0:
+		return counts, np.empty(0, dtype=indices.dtype)
+	row_starts = np.repeat(starts - _csr_offsets(counts)[:-1], counts)
+	return counts, indices[row_starts + np.arange(total)]
+
+
+def _unique_in_order(values):
+	_, first = np.unique(values, return_index=True)
+	return values[np.sort(first)]
+
+
+
 class HeaderData:
 	"""
 	Class representing header data
@@ -88,17 +772,235 @@ class HeaderData:
 		else:
 			return destination
 
+	@staticmethod
+	def big_to_compact(target):
+		"""
+		Encodes a non-negative target in the compact bits format (the inverse of compact_to_big)
+		"""
+		exponent = (target.bit_length() + 7) // 8
+		if exponent <= 3:
+			mantissa = target << 8 * (3 - exponent)
+		else:
+			mantissa = target >> 8 * (exponent - 3)
+		if mantissa & 0x00800000 != 0:
+			mantissa >>= 8
+			exponent += 1
+		return exponent << 24 | mantissa
+
+
+class HeaderTable:
+	"""
+	Class representing the header data of many blocks as a struct-of-arrays, sorted by block hash
+	"""
+
+	hash_fields = ['hash', 'hashMerkleRoot', 'acceptedIDMerkleRoot', 'utxoCommitment', 'pruningPoint']
+	dtypes = {
+		'timeInMilliseconds': 	np.int64,
+		'bits': 				np.uint32,
+		'nonce': 				np.uint64,
+		'daaScore': 			np.uint64,
+		'blueScore': 			np.uint64,
+		'version': 				np.uint32,
+		'blueWork': 			'S32',
+		'difficulty': 			np.float64,
+	}
+
+	def __init__(self, columns):
+		"""
+		:param columns: A dict mapping each field to a NumPy array. Hash fields are 'S32' arrays and
+			the 'hash' column must be sorted (which is the key order of the headers bucket). blueWork is kept
+			exact as 32-byte big-endian 'S32' values (see blue_work_ints)
+		"""
+		self.columns = columns
+
+	def __len__(self):
+		return len(self.columns['hash'])
+
+	def __getitem__(self, field):
+		return self.columns[field]
+
+	@staticmethod
+	def from_raw_headers(raw_headers):
+		"""
+		Builds a table from (block hash, serialized DbBlockHeader) pairs given in hash order
+		"""
+		hashes = {field: bytearray() for field in HeaderTable.hash_fields}
+		ints = {field: array('q' if field == 'timeInMilliseconds' else 'Q') for field in
+				['timeInMilliseconds', 'bits', 'nonce', 'daaScore', 'blueScore', 'version']}
+		blue_work = bytearray()
+		for block_hash, value in raw_headers:
+			h = KaspadDB.DbBlockHeader()
+			h.ParseFromString(value)
+			hashes['hash'] += block_hash
+			hashes['hashMerkleRoot'] += h.hashMerkleRoot.hash
+			hashes['acceptedIDMerkleRoot'] += h.acceptedIDMerkleRoot.hash
+			hashes['utxoCommitment'] += h.utxoCommitment.hash
+			hashes['pruningPoint'] += h.pruningPoint.hash
+			ints['timeInMilliseconds'].append(h.timeInMilliseconds)
+			ints['bits'].append(h.bits)
+			ints['nonce'].append(h.nonce)
+			ints['daaScore'].append(h.daaScore)
+			ints['blueScore'].append(h.blueScore)
+			ints['version'].append(h.version)
+			blue_work += h.blueWork.rjust(32, b'\x00')
+
+		columns = {field: np.frombuffer(bytes(buf), dtype='S32') for field, buf in hashes.items()}
+		for field, buf in ints.items():
+			columns[field] = np.frombuffer(buf, dtype=np.int64 if buf.typecode == 'q' else np.uint64).astype(
+				HeaderTable.dtypes[field], copy=False)
+		columns['blueWork'] = np.frombuffer(bytes(blue_work), dtype='S32')
+		# Difficulty only depends on bits, which has few distinct values
+		distinct_bits, inverse = np.unique(columns['bits'], return_inverse=True)
+		distinct_difficulty = np.array([HeaderData.bits_to_difficulty(int(b)) for b in distinct_bits], dtype=np.float64)
+		columns['difficulty'] = distinct_difficulty[inverse.reshape(-1)]
+		return HeaderTable(columns)
+
+	def merge(self, other):
+		"""
+		:return: A table holding the rows of both tables, sorted by hash
+		"""
+		columns = {field: np.concatenate([values, other.columns[field]]) for field, values in self.columns.items()}
+		order = np.argsort(columns['hash'], kind='stable')
+		return HeaderTable({field: values[order] for field, values in columns.items()})
+
+	def select(self, rows):
+		"""
+		:return: A table holding the given rows (a boolean mask or sorted positions)
+		"""
+		return HeaderTable({field: values[rows] for field, values in self.columns.items()})
+
+	def positions(self, block_hashes):
+		"""
+		Finds the rows of the given block hashes (-1 for hashes missing from the table)
+		"""
+		keys = np.array(block_hashes, dtype='S32')
+		table_hashes = self.columns['hash']
+		positions = np.searchsorted(table_hashes, keys)
+		positions[positions == len(table_hashes)] = 0
+		found = table_hashes[positions] == keys if len(table_hashes) > 0 else np.zeros(len(keys), dtype=bool)
+		return np.where(found, positions, -1)
+
+	def column(self, field, positions=None):
+		"""
+		Returns a column restricted to the given rows. The full column is returned as is (without copying)
+		when positions are all rows in table order. Hash fields are returned as lists of bytes, and blueWork
+		as a list of ints.
+		"""
+		values = self.columns[field]
+		if positions is not None and not (len(positions) == len(values) and
+										  np.array_equal(positions, np.arange(len(values)))):
+			values = values[positions]
+		if field in HeaderTable.hash_fields:
+			return hash_list(values)
+		if field == 'blueWork':
+			return blue_work_ints(values)
+		return values
+
+
+def blue_work_ints(values):
+	"""
+	:return: The blue work values of an 'S32' column (32-byte big-endian, as in HeaderTable) as a list of ints
+	"""
+	data = values.tobytes()
+	return [int.from_bytes(data[i:i + 32], 'big') for i in range(0, len(data), 32)]
+
+
+def _blue_work_ranks(values):
+	"""
+	:return: The rank of each value of a blue work 'S32' column (equal values share a rank), as float64 so
+		callers can use infinities for missing blocks. Ranks compare exactly where float blue work would not.
+	"""
+	_, ranks = np.unique(values, return_inverse=True)
+	return ranks.reshape(-1).astype(np.float64)
+
+
+class lazy_field:
+	"""
+	Descriptor for a BlockData field which is computed from the block on first access
+	"""
+
+	def __init__(self, compute):
+		self.compute = compute
+		self.name = compute.__name__
+
+	def __get__(self, obj, cls):
+		if obj is None:
+			return self
+		value = self.compute(obj)
+		obj.__dict__[self.name] = value
+		obj._release_block()
+		return value
+
 
 class BlockData:
 	"""
 	Class representing block data
 	"""
-	def __init__(self, db_block):
+
+	fields = ['num_txs', 'max_sig_ops', 'sum_sig_ops', 'pubkey_version', 'pubkey_script', 'kaspad_version',
+			  'miner_version']
+
+	def __init__(self, db_block, fields=None, read_block=None):
+		"""
+		:param fields: The fields to compute up front (all by default). E.g. asking for 'pubkey_script' alone
+			does not walk the transaction inputs. Other fields are computed on first access.
+		:param read_block: A function reading the block again. If given, the block is dropped once the
+			requested fields are computed (so no block is kept while cached), and read again when another
+			field is first accessed.
+		"""
 		self.header = HeaderData(db_block.header)
-		self.num_txs = len(db_block.transactions)
-		self.max_sig_ops = max(max((inp.sigOpCount for inp in t.inputs), default=0) for t in db_block.transactions)
-		self.sum_sig_ops = sum(sum((inp.sigOpCount for inp in t.inputs)) for t in db_block.transactions)
-		payload = db_block.transactions[0].payload
+		self._db_block = db_block
+		self._read_block = read_block
+		for field in (BlockData.fields if fields is None else fields):
+			getattr(self, field)
+		if read_block is not None:
+			self._db_block = None
+
+	def has_fields(self, fields):
+		return all(field in self.__dict__ for field in fields)
+
+	def _block(self):
+		if self._db_block is not None:
+			return self._db_block
+		return self._read_block()
+
+	def _release_block(self):
+		# The block is no longer needed once every field is computed
+		if self.has_fields(BlockData.fields):
+			self._db_block = None
+			self._read_block = None
+
+	@lazy_field
+	def num_txs(self):
+		return len(self._block().transactions)
+
+	@lazy_field
+	def max_sig_ops(self):
+		return max(max((inp.sigOpCount for inp in t.inputs), default=0) for t in self._block().transactions)
+
+	@lazy_field
+	def sum_sig_ops(self):
+		return sum(sum((inp.sigOpCount for inp in t.inputs)) for t in self._block().transactions)
+
+	@lazy_field
+	def pubkey_version(self):
+		return self._parse_coinbase_payload()['pubkey_version']
+
+	@lazy_field
+	def pubkey_script(self):
+		return self._parse_coinbase_payload()['pubkey_script']
+
+	@lazy_field
+	def kaspad_version(self):
+		return self._parse_coinbase_payload()['kaspad_version']
+
+	@lazy_field
+	def miner_version(self):
+		return self._parse_coinbase_payload()['miner_version']
+
+	def _parse_coinbase_payload(self):
+		# All coinbase fields are split from the payload at once
+		payload = self._block().transactions[0].payload
 
 		uint64_len = 8
 		uint16_len = 2
@@ -106,15 +1008,16 @@ class BlockData:
 		pubkey_len_len = 1
 		pubkey_version_len = uint16_len
 
-		self.pubkey_version = 	payload[uint64_len + subsidy_len]
-		pubkey_length = 		payload[uint64_len + subsidy_len + pubkey_version_len]
+		coinbase = {}
+		coinbase['pubkey_version'] = 	payload[uint64_len + subsidy_len]
+		pubkey_length = 				payload[uint64_len + subsidy_len + pubkey_version_len]
 		pubkey_start = uint64_len + subsidy_len + pubkey_version_len + pubkey_len_len
 		pubkey_end = pubkey_start + pubkey_length
-		self.pubkey_script = payload[pubkey_start:pubkey_end]
+		coinbase['pubkey_script'] = payload[pubkey_start:pubkey_end]
 
 		# Init with default values
-		self.kaspad_version = 'unknown'
-		self.miner_version = 'unknown'
+		coinbase['kaspad_version'] = 'unknown'
+		coinbase['miner_version'] = 'unknown'
 
 		# Try filling up with actual info
 		if len(payload) > pubkey_end:
@@ -122,13 +1025,16 @@ class BlockData:
 				extra_data = payload[pubkey_end:].decode("utf-8")
 				if '/' in extra_data:
 					index_of_sep = extra_data.index('/')
-					self.kaspad_version = extra_data[:index_of_sep]
-					self.miner_version = extra_data[index_of_sep+1:]
+					coinbase['kaspad_version'] = extra_data[:index_of_sep]
+					coinbase['miner_version'] = extra_data[index_of_sep+1:]
 				else:
-					self.kaspad_version = extra_data
+					coinbase['kaspad_version'] = extra_data
 			except:
 				pass
 
+		self.__dict__.update(coinbase)
+		return coinbase
+
 class UTXOKey:
 	def __init__(self, db_entry):
 		self.transactionId = db_entry.transactionID.transactionId
@@ -142,24 +1048,789 @@ class UTXOEntry:
 		self.isCoinbase = 		db_entry.isCoinbase
 
 
+class UTXOBatch(dict):
+	"""
+	A batch of UTXO set entries as NumPy columns: transactionId ('S32'), index (uint32), amount (uint64),
+	blockDaaScore (uint64), isCoinbase (bool) and pubkey_script, stored as a uint8 array of concatenated
+	scripts with the row boundaries in pubkey_script_offsets (int64, num_rows + 1 entries)
+	"""
+
+	fields = ['transactionId', 'index', 'amount', 'pubkey_script', 'blockDaaScore', 'isCoinbase']
+
+	def __init__(self, num_rows, columns):
+		super().__init__(columns)
+		self.num_rows = num_rows
+
+	def scripts(self):
+		"""
+		:return: The scripts of the batch as a list of bytes
+		"""
+		data = self['pubkey_script'].tobytes()
+		offsets = self['pubkey_script_offsets'].tolist()
+		return [data[offsets[i]:offsets[i + 1]] for i in range(self.num_rows)]
+
+	def transaction_ids(self):
+		return hash_list(self['transactionId'])
+
+	def outpoint_keys(self):
+		"""
+		:return: The outpoints of the batch as 'S36' keys (transactionId followed by the little-endian index)
+		"""
+		keys = np.empty((self.num_rows, 36), dtype=np.uint8)
+		keys[:, :32] = self['transactionId'].view(np.uint8).reshape(-1, 32)
+		keys[:, 32:] = self['index'].astype('<u4').view(np.uint8).reshape(-1, 4)
+		return keys.view('S36').reshape(-1)
+
+	def take(self, rows, fields=None):
+		"""
+		:return: A UTXOBatch with the given rows (an index array or a boolean mask) and fields (all by default)
+		"""
+		rows = np.flatnonzero(rows) if rows.dtype == np.bool_ else rows
+		columns = {}
+		for field in self.fields if fields is None else fields:
+			if field == 'pubkey_script':
+				counts, columns[field] = _csr_gather(self['pubkey_script_offsets'], self[field], rows)
+				columns['pubkey_script_offsets'] = _csr_offsets(counts)
+			elif field in self:
+				columns[field] = self[field][rows]
+		return UTXOBatch(len(rows), columns)
+
+	@staticmethod
+	def concat(batches):
+		batches = [batch for batch in batches if batch is not None]
+		columns = {}
+		for field in batches[0]:
+			if field == 'pubkey_script_offsets':
+				columns[field] = _csr_offsets(np.concatenate([np.diff(batch[field]) for batch in batches]))
+			else:
+				columns[field] = np.concatenate([batch[field] for batch in batches])
+		return UTXOBatch(sum(batch.num_rows for batch in batches), columns)
+
+
+_utxo_dtypes = {'index': np.uint32, 'amount': np.uint64, 'blockDaaScore': np.uint64, 'isCoinbase': np.bool_}
+
+
+class _UTXOBatchBuilder:
+	# Accumulates the rows of one UTXOBatch in compact buffers
+
+	def __init__(self, fields):
+		self.fields = fields
+		self.num_rows = 0
+		self.transaction_ids = bytearray()
+		self.scripts = bytearray()
+		self.script_lengths = array('q')
+		self.values = {field: [] for field in _utxo_dtypes if field in fields}
+
+	def append(self, outpoint, db_entry):
+		self.num_rows += 1
+		if 'transactionId' in self.fields:
+			self.transaction_ids += outpoint.transactionID.transactionId
+		if 'pubkey_script' in self.fields:
+			script = db_entry.scriptPublicKey.script
+			self.scripts += script
+			self.script_lengths.append(len(script))
+		for field, values in self.values.items():
+			values.append(outpoint.index if field == 'index' else getattr(db_entry, field))
+
+	def build(self):
+		columns = {}
+		if 'transactionId' in self.fields:
+			columns['transactionId'] = np.frombuffer(bytes(self.transaction_ids), dtype='S32')
+		if 'pubkey_script' in self.fields:
+			columns['pubkey_script'] = np.frombuffer(bytes(self.scripts), dtype=np.uint8)
+			columns['pubkey_script_offsets'] = _csr_offsets(np.frombuffer(self.script_lengths, dtype=np.int64))
+		for field, values in self.values.items():
+			columns[field] = np.array(values, dtype=_utxo_dtypes[field])
+		return UTXOBatch(self.num_rows, columns)
+
+
+def _last_rows_by_key(keys, steps):
+	"""
+	:return: The row of the last step of each distinct key, ordered by key
+	"""
+	order = np.lexsort((steps, keys))
+	last = np.ones(len(order), dtype=bool)
+	last[:-1] = keys[order[1:]] != keys[order[:-1]]
+	return order[last]
+
+
+def _scripts_by_length(batch, rows):
+	"""
+	Splits the scripts of the given rows of a UTXOBatch by length, and views the scripts of each length as
+	fixed width 'S{length}' keys, so they group by their own bytes (empty scripts get a single zero byte key)
+	:return: A generator of (length, positions in rows, keys), by increasing length
+	"""
+	offsets = batch['pubkey_script_offsets']
+	starts = offsets[rows]
+	lengths = offsets[rows + 1] - starts
+	order = np.argsort(lengths, kind='stable')
+	bounds = np.concatenate(([0], np.flatnonzero(np.diff(lengths[order])) + 1, [len(order)]))
+	for begin, end in zip(bounds[:-1].tolist(), bounds[1:].tolist()):
+		if begin == end:
+			continue
+		positions = order[begin:end]
+		length = int(lengths[positions[0]])
+		if length == 0:
+			yield length, positions, np.zeros(len(positions), dtype='S1')
+			continue
+		matrix = batch['pubkey_script'][starts[positions, None] + np.arange(length)]
+		yield length, positions, matrix.view('S{}'.format(length)).reshape(-1)
+
+
+def _script_address(script):
+	try:
+		return kbech32.toAddress(script)
+	except (NotImplementedError, IndexError):
+		return None
+
+
+def _group_sum(keys, amounts, counts):
+	"""
+	:return: The distinct (sorted) keys, with the amount and count sums of each
+	"""
+	order = np.argsort(keys, kind='stable')
+	keys = keys[order]
+	if len(keys) == 0:
+		return keys, amounts[order], counts[order]
+	starts = np.concatenate(([0], np.flatnonzero(keys[1:] != keys[:-1]) + 1))
+	return keys[starts], np.add.reduceat(amounts[order], starts), np.add.reduceat(counts[order], starts)
+
+
+def _merge_groups(groups):
+	if len(groups) == 0:
+		return np.zeros(0, dtype='S32'), np.zeros(0, dtype=np.uint64), np.zeros(0, dtype=np.int64)
+	return _group_sum(np.concatenate([g[0] for g in groups]), np.concatenate([g[1] for g in groups]),
+					  np.concatenate([g[2] for g in groups]))
+
+
+def _write_var_bytes(buffer, data):
+	buffer += len(data).to_bytes(8, 'little')
+	buffer += data
+
+
+def _serialize_transaction(db_transaction, exclude_signature_scripts):
+	# Follows kaspad's transaction serialization for hashing (IDs exclude signature scripts)
+	buffer = bytearray()
+	buffer += db_transaction.version.to_bytes(2, 'little')
+	buffer += len(db_transaction.inputs).to_bytes(8, 'little')
+	for tx_input in db_transaction.inputs:
+		buffer += tx_input.previousOutpoint.transactionID.transactionId
+		buffer += tx_input.previousOutpoint.index.to_bytes(4, 'little')
+		if exclude_signature_scripts:
+			_write_var_bytes(buffer, b'')
+			buffer += b'\x00'
+		else:
+			_write_var_bytes(buffer, tx_input.signatureScript)
+			buffer += tx_input.sigOpCount.to_bytes(1, 'little')
+		buffer += tx_input.sequence.to_bytes(8, 'little')
+	buffer += len(db_transaction.outputs).to_bytes(8, 'little')
+	for tx_output in db_transaction.outputs:
+		buffer += tx_output.value.to_bytes(8, 'little')
+		buffer += tx_output.scriptPublicKey.version.to_bytes(2, 'little')
+		_write_var_bytes(buffer, tx_output.scriptPublicKey.script)
+	buffer += db_transaction.lockTime.to_bytes(8, 'little')
+	buffer += db_transaction.subnetworkID.subnetworkId.ljust(20, b'\x00')
+	buffer += db_transaction.gas.to_bytes(8, 'little')
+	_write_var_bytes(buffer, db_transaction.payload)
+	return bytes(buffer)
+
+
+def transaction_id(db_transaction):
+	"""
+	Computes the ID of a DbTransaction as kaspad does: a blake2b-256 hash keyed with 'TransactionID' over
+	the transaction serialized without signature scripts (coinbase transactions have no inputs)
+	"""
+	return hashlib.blake2b(_serialize_transaction(db_transaction, True), digest_size=32, key=b'TransactionID').digest()
+
+
+def is_coinbase(db_transaction):
+	return db_transaction.subnetworkID.subnetworkId == coinbase_subnetwork_id
+
+
+def _transaction_estimated_serialized_size(db_transaction):
+	# Port of kaspad's transactionEstimatedSerializedSize (which counts a payload hash, but no sigOpCount bytes)
+	if is_coinbase(db_transaction):
+		return 0
+	size = 2 + 8  # version, number of inputs
+	for tx_input in db_transaction.inputs:
+		size += 32 + 4  # outpoint transaction ID and index
+		size += 8 + len(tx_input.signatureScript)
+		size += 8  # sequence
+	size += 8  # number of outputs
+	for tx_output in db_transaction.outputs:
+		size += 8 + 2  # value, script version
+		size += 8 + len(tx_output.scriptPublicKey.script)
+	size += 8 + 20 + 8  # lock time, subnetwork ID, gas
+	size += 32  # payload hash
+	size += 8 + len(db_transaction.payload)
+	return size
+
+
+def transaction_mass(db_transaction):
+	"""
+	Computes the mass of a DbTransaction as kaspad's CalculateTransactionMass with its default parameters
+	(1 per estimated serialized byte, 10 per scriptPublicKey byte and 1000 per signature operation).
+	Coinbase transactions have no mass.
+	"""
+	if is_coinbase(db_transaction):
+		return 0
+	size = _transaction_estimated_serialized_size(db_transaction)
+	script_size = sum(2 + len(tx_output.scriptPublicKey.script) for tx_output in db_transaction.outputs)
+	sig_op_count = sum(tx_input.sigOpCount for tx_input in db_transaction.inputs)
+	return mass_per_tx_byte * size + mass_per_script_pub_key_byte * script_size + mass_per_sig_op * sig_op_count
+
+
+def _save_arrays(path, arrays, version, key):
+	"""
+	Saves a dict of arrays as a directory of .npy files, with a meta.json holding the format version and key
+	"""
+	os.makedirs(path, exist_ok=True)
+	for name, values in arrays.items():
+		np.save(os.path.join(path, name + '.npy'), values)
+	# Written last, so an interrupted save is never loaded
+	with open(os.path.join(path, 'meta.json'), 'w') as f:
+		json.dump({'version': version, 'key': key}, f)
+
+
+def _load_arrays(path, names, version, key):
+	"""
+	:return: The memory-mapped arrays saved by _save_arrays, or None if missing or saved with another
+		version or key
+	"""
+	try:
+		with open(os.path.join(path, 'meta.json')) as f:
+			meta = json.load(f)
+	except (OSError, ValueError):
+		return None
+	if meta.get('version') != version or meta.get('key') != key:
+		return None
+	return {name: np.load(os.path.join(path, name + '.npy'), mmap_mode='r') for name in names}
+
+
+class BlockColumnIndex:
+	"""
+	Base class of the sorted indexes over block bodies. Columns are sorted by key_column, and the block
+	column holds rows of block_hashes (the sorted hashes of the indexed blocks). Once interned (see intern),
+	block_ids maps these rows to IDs of a BlockIndex (Store.block_index).
+
+	Saved indexes are directories of .npy files which load memory-mapped, so lookups (binary searches)
+	only touch the pages they need.
+	"""
+
+	columns = []
+	key_column = None
+	format_version = 1
+
+	def __init__(self, block_hashes, columns):
+		self.block_hashes = block_hashes
+		self.index = None
+		self.block_ids = None
+		for field in self.columns:
+			setattr(self, field, columns[field])
+
+	def intern(self, index):
+		"""
+		Interns the indexed blocks in index, so block IDs returned by the index are IDs of index
+		"""
+		self.index = index
+		self.block_ids = index.extend(self.block_hashes)
+		return self
+
+	def __len__(self):
+		return len(getattr(self, self.key_column))
+
+	def save(self, path, key=''):
+		arrays = dict({field: getattr(self, field) for field in self.columns}, block_hashes=self.block_hashes)
+		_save_arrays(path, arrays, self.format_version, key)
+
+	@classmethod
+	def load(cls, path, key=''):
+		"""
+		:return: The memory-mapped index saved in path, or None if missing or saved with another key
+		"""
+		arrays = _load_arrays(path, cls.columns + ['block_hashes'], cls.format_version, key)
+		if arrays is None:
+			return None
+		return cls(arrays.pop('block_hashes'), arrays)
+
+	def rows(self, key):
+		"""
+		:return: The range of rows of a key (empty if not indexed)
+		"""
+		keys = getattr(self, self.key_column)
+		return range(np.searchsorted(keys, key, side='left'), np.searchsorted(keys, key, side='right'))
+
+	def positions(self, keys):
+		"""
+		:return: The first row of each given key, or -1 if missing
+		"""
+		sorted_keys = getattr(self, self.key_column)
+		keys = np.asarray(keys, dtype=sorted_keys.dtype)
+		if len(self) == 0:
+			return np.full(len(keys), -1, dtype=np.int64)
+		rows = np.minimum(np.searchsorted(sorted_keys, keys), len(self) - 1)
+		return np.where(sorted_keys[rows] == keys, rows, -1)
+
+	def block_id(self, row):
+		return int(self.block_ids[self.block[row]])
+
+	def block_hash(self, row):
+		return self.index.hash(self.block_id(row))
+
+
+class TransactionIndex(BlockColumnIndex):
+	"""
+	Class mapping transaction IDs to the blocks containing them. Columns are sorted by transactionId
+	('S32'): block, position (of the transaction in its block), num_inputs, num_outputs and mass. A
+	transaction included by several blocks has a row per block.
+	"""
+
+	columns = ['transactionId', 'block', 'position', 'num_inputs', 'num_outputs', 'mass']
+	key_column = 'transactionId'
+
+	def lookup(self, tx_id):
+		"""
+		:return: A list of dicts describing each inclusion of the txid (block hash, position, num_inputs,
+			num_outputs and mass)
+		"""
+		found = []
+		for row in self.rows(tx_id):
+			found.append({
+				'block': self.block_hash(row),
+				'position': int(self.position[row]),
+				'num_inputs': int(self.num_inputs[row]),
+				'num_outputs': int(self.num_outputs[row]),
+				'mass': int(self.mass[row]),
+			})
+		return found
+
+
+def script_hash(script):
+	# Fixed width key of a scriptPublicKey in ScriptIndex
+	return hashlib.blake2b(script, digest_size=32).digest()
+
+
+class ScriptIndex(BlockColumnIndex):
+	"""
+	Inverted index of all transaction outputs by scriptPublicKey. Columns are sorted by script_hash
+	('S32', see script_hash): block, position (of the transaction in its block), output_index and amount.
+	"""
+
+	columns = ['script_hash', 'block', 'position', 'output_index', 'amount']
+	key_column = 'script_hash'
+
+	def lookup(self, script):
+		"""
+		:return: The outputs paid to a script, as a dict of columns (block hashes, position, output_index
+			and amount) in block hash order
+		"""
+		rows = self.rows(script_hash(script))
+		return {
+			'block': self.index.hash_list(self.block_ids[self.block[rows.start:rows.stop]]),
+			'position': np.asarray(self.position[rows.start:rows.stop]),
+			'output_index': np.asarray(self.output_index[rows.start:rows.stop]),
+			'amount': np.asarray(self.amount[rows.start:rows.stop]),
+		}
+
+	def lookup_address(self, address):
+		return self.lookup(kbech32.toScript(address))
+
+
+def _project_transactions(keys, values):
+	# Projection of Store.load_transaction_index (runs in a parallel_scan worker)
+	tx_ids, blocks, positions, num_inputs, num_outputs, masses = bytearray(), [], [], [], [], []
+	for block_row, block_bytes in enumerate(values):
+		b = KaspadDB.DbBlock()
+		b.ParseFromString(block_bytes)
+		for position, tx in enumerate(b.transactions):
+			tx_ids += transaction_id(tx)
+			blocks.append(block_row)
+			positions.append(position)
+			num_inputs.append(len(tx.inputs))
+			num_outputs.append(len(tx.outputs))
+			masses.append(transaction_mass(tx))
+	return {
+		'transactionId': np.frombuffer(bytes(tx_ids), dtype='S32'),
+		'block': np.array(blocks, dtype=np.int32),
+		'position': np.array(positions, dtype=np.uint32),
+		'num_inputs': np.array(num_inputs, dtype=np.uint32),
+		'num_outputs': np.array(num_outputs, dtype=np.uint32),
+		'mass': np.array(masses, dtype=np.uint64),
+	}
+
+
+class BlockRangeIndex:
+	"""
+	Class mapping header fields to the blocks having them. For each range field, the field column holds the
+	sorted values and the matching <field>_block column the rows of block_hashes (the hash-sorted headers
+	bucket) of the blocks, which block_ids maps to block IDs once interned (see intern). Saved like a
+	BlockColumnIndex.
+	"""
+
+	fields = ['timeInMilliseconds', 'daaScore', 'blueScore']
+	columns = [column for field in fields for column in (field, field + '_block')]
+	format_version = 1
+
+	def __init__(self, block_hashes, columns):
+		self.block_hashes = block_hashes
+		self.index = None
+		self.block_ids = None
+		for column in self.columns:
+			setattr(self, column, columns[column])
+
+	def intern(self, index):
+		self.index = index
+		self.block_ids = index.extend(self.block_hashes)
+		return self
+
+	def __len__(self):
+		return len(self.block_hashes)
+
+	def save(self, path, key=''):
+		arrays = dict({column: getattr(self, column) for column in self.columns}, block_hashes=self.block_hashes)
+		_save_arrays(path, arrays, self.format_version, key)
+
+	@classmethod
+	def load(cls, path, key=''):
+		arrays = _load_arrays(path, cls.columns + ['block_hashes'], cls.format_version, key)
+		if arrays is None:
+			return None
+		return cls(arrays.pop('block_hashes'), arrays)
+
+	@classmethod
+	def from_header_table(cls, header_table):
+		columns = {}
+		for field in cls.fields:
+			order = np.argsort(header_table[field], kind='stable')
+			columns[field] = header_table[field][order]
+			columns[field + '_block'] = order.astype(np.int32)
+		return cls(header_table['hash'], columns)
+
+	def ids_in_range(self, field, lo=None, hi=None):
+		"""
+		:return: The IDs of the blocks with lo <= field <= hi (either bound may be None), ordered by the field
+		"""
+		if field not in self.fields:
+			raise KeyError('{} is not a range field, expected one of {}'.format(field, self.fields))
+		values = getattr(self, field)
+		start = 0 if lo is None else np.searchsorted(values, lo, side='left')
+		stop = len(values) if hi is None else np.searchsorted(values, hi, side='right')
+		return self.block_ids[getattr(self, field + '_block')[start:stop]]
+
+	def hashes(self, ids):
+		return self.index.hash_list(ids)
+
+
+class AcceptanceIndex:
+	"""
+	Class indexing the acceptance data of the selected chain. chain holds the chain hashes ('S32') from the
+	pruning point up, and chain positions below refer to it.
+
+	Transaction columns (sorted by transactionId): transactionId, chain_position (the accepting chain
+	block), merged_block (position in merged_blocks), is_accepted and fee. A transaction merged by
+	several blocks appears once, with its earliest accepted inclusion if any.
+
+	Block columns (one row per merged block of each chain block): merged_blocks ('S32'),
+	merged_chain_position, num_txs, num_accepted and is_accepted (whether any of its transactions were
+	accepted).
+	"""
+
+	def __init__(self, chain, columns):
+		self.chain = chain
+		self.merged_blocks = columns['merged_blocks']
+		self.merged_chain_position = columns['merged_chain_position']
+		self.num_txs = columns['num_txs']
+		self.num_accepted = columns['num_accepted']
+		self.is_block_accepted = self.num_accepted > 0
+
+		merged_block = np.repeat(np.arange(len(self.merged_blocks), dtype=np.int64), self.num_txs)
+		# Sort by txid with accepted inclusions first (then by chain position), and keep the first row of each txid
+		order = np.lexsort((self.merged_chain_position[merged_block], ~columns['is_accepted'], columns['transactionId']))
+		tx_ids = columns['transactionId'][order]
+		first = np.ones(len(tx_ids), dtype=bool)
+		first[1:] = tx_ids[1:] != tx_ids[:-1]
+		order = order[first]
+		self.transaction_ids = columns['transactionId'][order]
+		self.merged_block = merged_block[order]
+		self.chain_position = self.merged_chain_position[self.merged_block]
+		self.is_accepted = columns['is_accepted'][order]
+		self.fee = columns['fee'][order]
+
+	def __len__(self):
+		return len(self.transaction_ids)
+
+	def positions(self, tx_ids):
+		"""
+		:return: The row of each given txid in the transaction columns, or -1 if missing
+		"""
+		tx_ids = np.asarray(tx_ids, dtype='S32')
+		if len(self) == 0:
+			return np.full(len(tx_ids), -1, dtype=np.int64)
+		rows = np.minimum(np.searchsorted(self.transaction_ids, tx_ids), len(self) - 1)
+		return np.where(self.transaction_ids[rows] == tx_ids, rows, -1)
+
+	def accepting_chain_blocks(self, tx_ids):
+		"""
+		:return: The hash of the chain block accepting each given txid, or None if it was not accepted
+		"""
+		rows = self.positions(tx_ids)
+		if len(self) == 0:
+			return [None] * len(rows)
+		accepted = (rows >= 0) & self.is_accepted[np.maximum(rows, 0)]
+		hashes = hash_list(self.chain[self.chain_position[np.maximum(rows, 0)]])
+		return [block_hash if is_accepted else None for block_hash, is_accepted in zip(hashes, accepted)]
+
+	def accepted_counts(self):
+		"""
+		:return: The number of transactions accepted by each chain block (aligned with chain)
+		"""
+		return np.bincount(self.chain_position[self.is_accepted], minlength=len(self.chain))
+
+
+def _project_acceptance(keys, values):
+	# Projection of Store.iter_acceptance_data (runs in a parallel_scan worker)
+	accepting, merged, num_txs, tx_ids, is_accepted, fees = bytearray(), bytearray(), array('q'), bytearray(), [], []
+	for key, value in zip(keys, values):
+		acceptance_data = KaspadDB.DbAcceptanceData()
+		acceptance_data.ParseFromString(value)
+		for block_acceptance in acceptance_data.blockAcceptanceData:
+			accepting += key
+			merged += block_acceptance.blockHash.hash
+			num_txs.append(len(block_acceptance.transactionAcceptanceData))
+			for tx_acceptance in block_acceptance.transactionAcceptanceData:
+				tx_ids += transaction_id(tx_acceptance.transaction)
+				is_accepted.append(tx_acceptance.isAccepted)
+				fees.append(tx_acceptance.fee)
+	return {
+		'accepting_block': np.frombuffer(bytes(accepting), dtype='S32'),
+		'merged_blocks': np.frombuffer(bytes(merged), dtype='S32'),
+		'num_txs': np.frombuffer(num_txs, dtype=np.int64).copy(),
+		'transactionId': np.frombuffer(bytes(tx_ids), dtype='S32'),
+		'is_accepted': np.array(is_accepted, dtype=bool),
+		'fee': np.array(fees, dtype=np.uint64),
+	}
+
+
+def _block_data_row(block_data, header_fields, block_fields):
+	return tuple(getattr(block_data.header, field) for field in header_fields) + \
+		tuple(getattr(block_data, field) for field in block_fields)
+
+
+def _project_blocks(keys, values, header_fields, block_fields):
+	# Projection of Store.load_block_columns (runs in a parallel_scan worker)
+	columns = {field: [] for field in header_fields + block_fields}
+	for block_bytes in values:
+		b = KaspadDB.DbBlock()
+		b.ParseFromString(block_bytes)
+		row = _block_data_row(BlockData(b, block_fields), header_fields, block_fields)
+		for field, value in zip(header_fields + block_fields, row):
+			columns[field].append(value)
+	return columns
+
+
+def _project_utxos(keys, values, fields):
+	# Projection of Store.load_utxo_data (runs in a parallel_scan worker)
+	parse_key = 'transactionId' in fields or 'index' in fields
+	outpoint = KaspadDB.DbOutpoint()
+	db_entry = KaspadDB.DbUtxoEntry()
+	builder = _UTXOBatchBuilder(fields)
+	for key, value in zip(keys, values):
+		if parse_key:
+			outpoint.ParseFromString(key)
+		db_entry.ParseFromString(value)
+		builder.append(outpoint, db_entry)
+	batch = builder.build()
+	if 'pubkey_script' in fields:
+		batch['pubkey_script'] = batch.scripts()
+		del batch['pubkey_script_offsets']
+	return dict(batch)
+
+
+def _project_outputs(keys, values):
+	# Projection of Store.load_script_index (runs in a parallel_scan worker)
+	script_hashes, blocks, positions, output_indices, amounts = bytearray(), [], [], [], []
+	for block_row, block_bytes in enumerate(values):
+		b = KaspadDB.DbBlock()
+		b.ParseFromString(block_bytes)
+		for position, tx in enumerate(b.transactions):
+			for output_index, tx_output in enumerate(tx.outputs):
+				script_hashes += script_hash(tx_output.scriptPublicKey.script)
+				blocks.append(block_row)
+				positions.append(position)
+				output_indices.append(output_index)
+				amounts.append(tx_output.value)
+	return {
+		'script_hash': np.frombuffer(bytes(script_hashes), dtype='S32'),
+		'block': np.array(blocks, dtype=np.int32),
+		'position': np.array(positions, dtype=np.uint32),
+		'output_index': np.array(output_indices, dtype=np.uint32),
+		'amount': np.array(amounts, dtype=np.uint64),
+	}
+
+
+def _concat_columns(chunks):
+	"""
+	Concatenates chunks of columns (dicts of NumPy arrays or lists)
+	"""
+	columns = {}
+	for chunk in chunks:
+		for field, values in chunk.items():
+			columns.setdefault(field, []).append(values)
+	for field, parts in columns.items():
+		if isinstance(parts[0], np.ndarray):
+			columns[field] = np.concatenate(parts)
+		else:
+			columns[field] = [value for part in parts for value in part]
+	return columns
+
+
+def _key_successor(prefix):
+	# The smallest key greater than all keys starting with prefix
+	prefix = prefix.rstrip(b'\xff')
+	return prefix[:-1] + bytes([prefix[-1] + 1])
+
+
+def hash_list(hashes):
+	"""
+	Converts an 'S32' array to a list of bytes (indexing the array directly drops trailing zero bytes)
+	"""
+	raw = hashes.tobytes()
+	return [raw[i:i + 32] for i in range(0, len(raw), 32)]
+
+
 class Store:
 	"""
 	Class managing all accesses to the underlying Kaspa DB
 	"""
 
-	def __init__(self, db_path, print_freq=40000):
-		self.db = plyvel.DB(db_path)
-		self.prefix = self.db.get(b'active-prefix')
-		self.blocks = {}
-		self.headers = {}
-		self.bodies = {}
+	def __init__(self, db_path, print_freq=40000, cache_dir=None, cache_max_bytes=8 * 2**30,
+				 max_blocks=None, max_headers=None, max_bodies=None,
+				 use_snapshot=False, block_cache_size=None, fill_cache_on_scans=False):
+		"""
+		:param use_snapshot: If True, all reads go through a LevelDB snapshot pinned when the Store is opened
+			(see pin_snapshot), so multi-pass analyses see a consistent DB state
+		:param block_cache_size: Size in bytes of the LevelDB block cache (LevelDB default if None)
+		:param fill_cache_on_scans: Whether bulk scans fill the LevelDB block cache (off, so scans do not
+			evict the blocks used by random reads)
+		:param max_blocks, max_headers, max_bodies: Entry budgets of the blocks, headers and bodies caches
+			(unbounded by default). Least recently used entries are evicted once a budget is exceeded. The
+			set loaded by load_blocks is pinned in self.blocks, so max_blocks only bounds the blocks cached
+			by get_block besides it.
+		:param cache_dir: If set, loaded blocks, header tables and data frames are cached in this directory,
+			keyed by the DB state, and reloaded from it while the datadir is unchanged
+		:param cache_max_bytes: Size cap of the cache directory (least recently used entries are evicted)
+		"""
+		self.block_cache_size = block_cache_size
+		self.fill_cache_on_scans = fill_cache_on_scans
+		self.use_snapshot = use_snapshot
+		self.snapshot = None
+		self._open(db_path)
+		self.max_blocks = max_blocks
+		self.blocks = LRUCache(max_blocks)
+		self.headers = LRUCache(max_headers)
+		self.bodies = LRUCache(max_bodies)
+		# The block IDs shared by the graph and all indexes (append-only, so IDs stay valid across refreshes)
+		self.block_index = BlockIndex()
+		self.header_table = None
+		self.graph = None
+		self.mergeset_index = None
+		self.utxo_diff_tree = None
+		self.reachability = None
+		self.daa_index = None
+		self.block_range_index = None
+		# The DB state (see _cache_state_key) each of the indexes above was built over
+		self._index_state_keys = {}
 		self.print_freq = print_freq
+		self.loaded_after_pruning_point = True
+		self.frame_cache = FrameCache(cache_dir, cache_max_bytes) if cache_dir is not None else None
+
+	def _open(self, db_path):
+		# The Store never writes, and refuses to create a DB at a wrong path (LevelDB has no read-only mode)
+		if self.block_cache_size is not None:
+			self.db = plyvel.DB(db_path, create_if_missing=False, lru_cache_size=self.block_cache_size)
+		else:
+			self.db = plyvel.DB(db_path, create_if_missing=False)
+		self.reader = self.db
+		self._state_key = None
+		if self.use_snapshot:
+			self.pin_snapshot()
+		self.prefix = self._get(b'active-prefix')
 
 	def close(self):
+		self.release_snapshot()
 		self.db.close()
 
+	def pin_snapshot(self):
+		"""
+		Pins a new LevelDB snapshot that all getters and iterators read through until released
+		"""
+		self.release_snapshot()
+		self.snapshot = self.db.snapshot()
+		self.reader = self.snapshot
+		self._state_key = None
+
+	def release_snapshot(self):
+		if self.snapshot is not None:
+			self.snapshot.close()
+			self.snapshot = None
+		self.reader = self.db
+		self._state_key = None
+
+	def _get(self, key):
+		return self.reader.get(key)
+
+	def _scan(self, **kwargs):
+		return self.reader.iterator(fill_cache=self.fill_cache_on_scans, **kwargs)
+
+	def cache_stats(self):
+		"""
+		:return: Size, budget and hit/miss/eviction counters of the blocks, headers and bodies caches
+		"""
+		return {'blocks': self.blocks.stats(), 'headers': self.headers.stats(), 'bodies': self.bodies.stats()}
+
+	def block_count(self):
+		"""
+		:return: The number of block bodies according to kaspad's blocks-count record, or None if missing
+		"""
+		count_bytes = self._get(self.prefix + sep + block_count_key)
+		if count_bytes is None:
+			return None
+		count = KaspadDB.DbBlockCount()
+		count.ParseFromString(count_bytes)
+		return count.count
+
+	def _cache_state_key(self, fresh=False):
+		"""
+		:return: The key of the DB state (tips and pruning point), computed once per opened DB or pinned
+			snapshot (index loaders pass fresh=True to recompute it)
+		"""
+		if fresh or self._state_key is None:
+			tips, hst = self.tips()
+			self._state_key = FrameCache.state_key(self.prefix, tips, self.pruning_point())
+		return self._state_key
+
+	def _get_index(self, name, load):
+		"""
+		:return: The index held in attribute name, (re)loaded by load if missing or built over an older DB state
+		"""
+		if getattr(self, name) is None or self._index_state_keys.get(name) != self._cache_state_key():
+			load()
+		return getattr(self, name)
+
+	def _load_from_cache(self, name):
+		if self.frame_cache is None:
+			return None
+		columns = self.frame_cache.load(self._cache_state_key(), name)
+		if columns is not None:
+			print('Loaded {} from cache'.format(name))
+		return columns
+
+	def _save_to_cache(self, name, columns):
+		if self.frame_cache is not None:
+			self.frame_cache.save(self._cache_state_key(), name, columns)
+
 	def get_raw_header(self, block_hash):
-		header_bytes = self.db.get(self.prefix + sep + header_store + sep + block_hash)
+		header_bytes = self._get(self.prefix + sep + header_store + sep + block_hash)
 		if header_bytes is None:
 			return None
 		h = KaspadDB.DbBlockHeader()
@@ -167,7 +1838,7 @@ class Store:
 		return h
 
 	def get_raw_block(self, block_hash):
-		block_bytes = self.db.get(self.prefix + sep + block_store + sep + block_hash)
+		block_bytes = self._get(self.prefix + sep + block_store + sep + block_hash)
 		if block_bytes is None:
 			return None
 		b = KaspadDB.DbBlock()
@@ -175,26 +1846,27 @@ class Store:
 		return b
 
 	def get_highest_chain_block_index(self):
-		index_bytes = self.db.get(self.prefix + sep + highest_chain_block_index)
+		index_bytes = self._get(self.prefix + sep + highest_chain_block_index)
 		index = int.from_bytes(index_bytes, 'little')
 		return index
 
 	def get_chain_block_hash_by_index(self, index):
-		hash_bytes = self.db.get(self.prefix + sep + chain_block_hash_by_index + sep + 
+		hash_bytes = self._get(self.prefix + sep + chain_block_hash_by_index + sep + 
 			   index.to_bytes(8, 'big'))
 		return hash_bytes
 
 	def get_chain_block_index_by_hash(self, block_hash):
-		index_bytes = self.db.get(self.prefix + sep + chain_block_index_by_hash + sep + 
+		index_bytes = self._get(self.prefix + sep + chain_block_index_by_hash + sep + 
 			   block_hash)
 		index = int.from_bytes(index_bytes, 'little')
 		return index
 
 	def get_header_data(self, block_hash):
-		if block_hash in self.headers:
-			return self.headers[block_hash]
+		cached = self.headers.get(block_hash)
+		if cached is not None:
+			return cached
 
-		header_bytes = self.db.get(self.prefix + sep + header_store + sep + block_hash)
+		header_bytes = self._get(self.prefix + sep + header_store + sep + block_hash)
 		if header_bytes is None:
 			return None
 		h = KaspadDB.DbBlockHeader()
@@ -204,8 +1876,25 @@ class Store:
 		self.headers[block_hash] = header
 		return header
 
+	def load_header_table(self):
+		"""
+		Streams the whole headers bucket once into a HeaderTable (without creating HeaderData objects).
+		Once loaded, load_data reads header fields from the table.
+		"""
+		columns = self._load_from_cache('headers')
+		if columns is not None:
+			self.header_table = HeaderTable(columns)
+			return self.header_table
+
+		headers_bucket = self.prefix + sep + header_store + sep
+		prefix_len = len(headers_bucket)
+		self.header_table = HeaderTable.from_raw_headers(
+			(key[prefix_len:], value) for key, value in tqdm(self._scan(prefix=headers_bucket)))
+		self._save_to_cache('headers', self.header_table.columns)
+		return self.header_table
+
 	def get_block_status(self, block_hash):
-		status_bytes = self.db.get(self.prefix + sep + block_status_store + sep + block_hash)
+		status_bytes = self._get(self.prefix + sep + block_status_store + sep + block_hash)
 		if status_bytes is None:
 			return None
 		s = KaspadDB.DbBlockStatus()
@@ -225,39 +1914,60 @@ class Store:
 			print('Number of blocks missing block status: ', none_count)
 		return statuses
 
-	def get_block_data(self, block_hash):
-		if block_hash in self.bodies:
-			return self.bodies[block_hash]
-
-		block_bytes = self.db.get(self.prefix + sep + block_store + sep + block_hash)
-		if block_bytes is None:
+	def get_block_data(self, block_hash, fields=None):
+		"""
+		:param fields: The BlockData fields to compute (all by default)
+		"""
+		if fields is None:
+			fields = BlockData.fields
+		cached = self.bodies.get(block_hash)
+		if cached is not None:
+			# Fields not computed yet read the block from the DB again on access
+			return cached
+
+		b = self._read_db_block(block_hash)
+		if b is None:
 			return None
-		b = KaspadDB.DbBlock()
-		b.ParseFromString(block_bytes)
-		body = BlockData(b)
+		body = BlockData(b, fields, lambda: self._read_db_block(block_hash))
 
 		self.bodies[block_hash] = body
 		return body
 
+	def _read_db_block(self, block_hash):
+		block_bytes = self._get(self.prefix + sep + block_store + sep + block_hash)
+		if block_bytes is None:
+			return None
+		b = KaspadDB.DbBlock()
+		b.ParseFromString(block_bytes)
+		return b
+
 	def get_ghostdag_data(self, block_hash):
 		ghostdag_data_bucket = self.prefix + sep + level + sep + ghostdag_data_store + sep
-		ghostdag_data_bytes = self.db.get(ghostdag_data_bucket + block_hash)
+		ghostdag_data_bytes = self._get(ghostdag_data_bucket + block_hash)
 		gdd = KaspadDB.DbBlockGhostdagData()
 		gdd.ParseFromString(ghostdag_data_bytes)
 		return len(gdd.mergeSetBlues), len(gdd.mergeSetReds)
 
 	def get_detailed_ghostdag_data(self, block_hash):
 		ghostdag_data_bucket = self.prefix + sep + level + sep + ghostdag_data_store + sep
-		ghostdag_data_bytes = self.db.get(ghostdag_data_bucket + block_hash)
+		ghostdag_data_bytes = self._get(ghostdag_data_bucket + block_hash)
 		gdd = KaspadDB.DbBlockGhostdagData()
 		gdd.ParseFromString(ghostdag_data_bytes)
 		return [b.hash for b in gdd.mergeSetBlues], [r.hash for r in gdd.mergeSetReds], gdd.selectedParent.hash
 
 	def get_block(self, block_hash):
-		if block_hash in self.blocks:
-			return self.blocks[block_hash]
+		cached = self.blocks.get(block_hash)
+		if cached is not None:
+			return cached
+
+		block = self._read_block(block_hash)
+		if block is None:
+			return None
+		self.blocks[block_hash] = block
+		return block
 
-		block_relations_bytes = self.db.get(self.prefix + sep + level + sep + relations_store + sep + block_hash)
+	def _read_block(self, block_hash):
+		block_relations_bytes = self._get(self.prefix + sep + level + sep + relations_store + sep + block_hash)
 		if block_relations_bytes is None:
 			return None
 		br = KaspadDB.DbBlockRelations()
@@ -268,13 +1978,42 @@ class Store:
 			block.children.append(child.hash)
 		for parent in br.parents:
 			block.parents.append(parent.hash)
-
-		self.blocks[block_hash] = block
 		return block
 
 	def get_virtual_chain(self):
+		"""
+		:return: The selected chain hashes from the headers selected tip down to the pruning point
+		"""
+		chain, _ = self.load_selected_chain()
+		return hash_list(chain[::-1])
+
+	def load_selected_chain(self):
+		"""
+		Loads the selected chain from the pruning point up to the headers selected tip with a single ordered
+		range scan over the chain-block-hash-by-index bucket. Falls back to walking selected parents through
+		the ghostdag data when the chain index is missing or does not match the tips.
+
+		:return: The chain hashes as an 'S32' array ordered from the pruning point up, and their chain
+			indices as a uint64 array (None when the ghostdag walk was used)
+		"""
 		tips, hst = self.tips()
 		pp = self.pruning_point()
+		highest_bytes = self._get(self.prefix + sep + highest_chain_block_index)
+		low_bytes = self._get(self.prefix + sep + chain_block_index_by_hash + sep + pp)
+		if highest_bytes is not None and low_bytes is not None:
+			low, high = int.from_bytes(low_bytes, 'little'), int.from_bytes(highest_bytes, 'little')
+			bucket = self.prefix + sep + chain_block_hash_by_index + sep
+			hashes, indices = bytearray(), array('Q')
+			for key, value in self._scan(start=bucket + low.to_bytes(8, 'big'),
+										 stop=bucket + (high + 1).to_bytes(8, 'big')):
+				indices.append(int.from_bytes(key[len(bucket):], 'big'))
+				hashes += value
+			chain = np.frombuffer(bytes(hashes), dtype='S32')
+			if len(indices) == high - low + 1 and len(chain) == len(indices) and \
+					chain[:1].tobytes() == pp and chain[-1:].tobytes() == hst:
+				return chain, np.frombuffer(indices, dtype=np.uint64)
+			print('Chain block index does not match the tips, walking the ghostdag data instead')
+
 		selected_chain = []
 		current = hst
 		while current != pp:
@@ -282,59 +2021,250 @@ class Store:
 			_, _, selected_parent = self.get_detailed_ghostdag_data(current)
 			current = selected_parent
 		selected_chain.append(pp)
-		return selected_chain
+		return np.array(selected_chain[::-1], dtype='S32'), None
 
-	def get_virtual_reds(self, threshold=0, time_distance=0):
-		tips, hst = self.tips()
-		pp = self.pruning_point()
-		overall_reds = []
-		current = hst
-		while current != pp:
-			mergeset_blues, mergeset_reds, selected_parent = self.get_detailed_ghostdag_data(current)
-			if len(mergeset_reds) > threshold:
-				if time_distance > 0:
-					current_time = self.get_header_data(current).timeInMilliseconds
-					for r in mergeset_reds:
-						red_time = self.get_header_data(r).timeInMilliseconds
-						if current_time - red_time > time_distance:
-							overall_reds.append(r)
+	def load_mergeset_index(self):
+		"""
+		Builds a MergesetIndex of the selected chain (headers selected tip down to the pruning point, exclusive)
+		with a single scan over the level-0 ghostdag data bucket, decoding only chain blocks
+		"""
+		state_key = self._cache_state_key(fresh=True)
+		chain, _ = self.load_selected_chain()
+		# Walk order of the virtual queries: from the headers selected tip down, excluding the pruning point
+		chain = chain[::-1][:-1]
+		positions = {block_hash: i for i, block_hash in enumerate(hash_list(chain))}
+		selected_parents = [None] * len(chain)
+		blues, reds = [None] * len(chain), [None] * len(chain)
+		ghostdag_data_bucket = self.prefix + sep + level + sep + ghostdag_data_store + sep
+		prefix_len = len(ghostdag_data_bucket)
+		for key, value in tqdm(self._scan(prefix=ghostdag_data_bucket)):
+			position = positions.get(key[prefix_len:])
+			if position is None:
+				continue
+			gdd = KaspadDB.DbBlockGhostdagData()
+			gdd.ParseFromString(value)
+			selected_parents[position] = gdd.selectedParent.hash
+			blues[position] = [b.hash for b in gdd.mergeSetBlues]
+			reds[position] = [r.hash for r in gdd.mergeSetReds]
+		missing = [i for i, sp in enumerate(selected_parents) if sp is None]
+		if len(missing) > 0:
+			raise KeyError('Missing ghostdag data of {} chain blocks'.format(len(missing)))
+
+		index = self.block_index
+		self.mergeset_index = MergesetIndex(
+			index, index.extend(chain), index.extend(selected_parents),
+			_csr_offsets([len(b) for b in blues]), index.extend([h for b in blues for h in b]),
+			_csr_offsets([len(r) for r in reds]), index.extend([h for r in reds for h in r]))
+		self._index_state_keys['mergeset_index'] = state_key
+		return self.mergeset_index
+
+	def _get_mergeset_index(self):
+		return self._get_index('mergeset_index', self.load_mergeset_index)
+
+	def header_values(self, hashes, field, skip_missing=False):
+		"""
+		:param hashes: An 'S32' array of block hashes
+		:param skip_missing: If True, blocks without a header get None (blueWork) or -1, else they raise a KeyError
+		:return: A NumPy array with the given header field of each block, read from the header table when loaded
+			(blueWork is returned exactly, as an object array of ints)
+		"""
+		distinct, inverse = np.unique(hashes, return_inverse=True)
+		values = None
+		if self.header_table is not None:
+			positions = self.header_table.positions(distinct)
+			if np.all(positions >= 0):
+				values = self.header_table.column(field, positions)
+		if values is None:
+			values = []
+			for h in hash_list(distinct):
+				header = self.get_header_data(h)
+				if header is not None:
+					values.append(getattr(header, field))
+				elif skip_missing:
+					values.append(None if field == 'blueWork' else -1)
 				else:
-					overall_reds.extend(mergeset_reds)
-			current = selected_parent
-		return overall_reds
+					raise KeyError("Missing header of block " + h.hex())
+		values = np.array(values, dtype=object if field == 'blueWork' else None)
+		return values[inverse.reshape(-1)]
+
+	def get_virtual_reds(self, threshold=0, time_distance=0):
+		return self._filter_virtual_reds(threshold, 'timeInMilliseconds', time_distance)
 
 	def get_virtual_blues(self):
-		tips, hst = self.tips()
-		pp = self.pruning_point()
-		overall_blues = []
-		current = hst
-		while current != pp:
-			mergeset_blues, mergeset_reds, selected_parent = self.get_detailed_ghostdag_data(current)
-			overall_blues.extend(mergeset_blues)
-			current = selected_parent
-		return overall_blues
+		mergesets = self._get_mergeset_index()
+		return mergesets.index.hash_list(mergesets.blue_ids)
 
 	def get_virtual_none_daa(self, threshold=0, daa_distance=2641):
-		tips, hst = self.tips()
-		pp = self.pruning_point()
-		overall_non_daa = []
-		current = hst
-		while current != pp:
-			mergeset_blues, mergeset_reds, selected_parent = self.get_detailed_ghostdag_data(current)
-			if len(mergeset_reds) > threshold:
-				if daa_distance > 0:
-					current_daa = self.get_header_data(current).daaScore
-					for r in mergeset_reds:
-						red_daa = self.get_header_data(r).daaScore
-						if current_daa - red_daa > daa_distance:
-							overall_non_daa.append(r)
-				else:
-					overall_non_daa.extend(mergeset_reds)
-			current = selected_parent
-		return overall_non_daa
+		return self._filter_virtual_reds(threshold, 'daaScore', daa_distance)
+
+	def _filter_virtual_reds(self, threshold, field, distance):
+		"""
+		Collects the reds merged by chain blocks with more than threshold reds, keeping only reds whose header
+		field is more than distance below that of the merging chain block (if distance > 0)
+		"""
+		mergesets = self._get_mergeset_index()
+		red_counts = np.diff(mergesets.red_offsets)
+		red_chain_rows = np.repeat(np.arange(len(red_counts)), red_counts)
+		keep = red_counts[red_chain_rows] > threshold
+		if distance > 0 and np.any(keep):
+			red_ids = mergesets.red_ids[keep]
+			chain_ids = mergesets.chain_ids[red_chain_rows[keep]]
+			red_values = self.header_values(mergesets.index.hashes[red_ids], field).astype(np.int64)
+			chain_values = self.header_values(mergesets.index.hashes[chain_ids], field).astype(np.int64)
+			keep[keep] = chain_values - red_values > distance
+		return mergesets.index.hash_list(mergesets.red_ids[keep])
+
+	def load_transaction_index(self, path=None, workers=None):
+		"""
+		Loads the TransactionIndex of all block bodies (see _load_block_column_index)
+		"""
+		return self._load_block_column_index(TransactionIndex, 'transactions', _project_transactions, path, workers)
+
+	def load_script_index(self, path=None, workers=None):
+		"""
+		Loads the ScriptIndex of all transaction outputs in block bodies (see _load_block_column_index)
+		"""
+		return self._load_block_column_index(ScriptIndex, 'scripts', _project_outputs, path, workers)
+
+	def _load_block_column_index(self, index_class, name, project, path, workers):
+		"""
+		Loads a BlockColumnIndex, building it with a single parallel_scan of the blocks bucket if needed
+		(see _load_saved_index)
+		"""
+		def build():
+			block_hashes, chunks = [], []
+			for keys, columns in tqdm(self.iter_parallel_scan(self.prefix + sep + block_store + sep, project,
+															  workers=workers)):
+				# Chunks come in key order, so blocks are numbered in sorted hash order
+				columns['block'] += len(block_hashes)
+				block_hashes.extend(keys)
+				chunks.append(columns)
+			columns = _concat_columns(chunks) if len(chunks) > 0 else project([], [])
+			order = np.argsort(columns[index_class.key_column], kind='stable')
+			return index_class(np.array(block_hashes, dtype='S32'),
+							   {field: values[order] for field, values in columns.items()})
+		return self._load_saved_index(index_class, name, path, build)
+
+	def _load_saved_index(self, index_class, name, path, build):
+		"""
+		Loads an index (a BlockColumnIndex or BlockRangeIndex) saved in path, which defaults to a cache_dir entry
+		keyed by the DB state, or builds it and saves it there (then reloads it memory-mapped). Without either,
+		the index is kept in memory.
+		The indexed blocks are interned in self.block_index.
+		"""
+		key = self._cache_state_key(fresh=True)
+		if path is None and self.frame_cache is not None:
+			path = self.frame_cache.array_dir(key, name)
+		if path is not None:
+			index = index_class.load(path, key)
+			if index is not None:
+				print('Loaded the {} index from {}'.format(name, path))
+				return index.intern(self.block_index)
+
+		index = build()
+		if path is not None:
+			index.save(path, key)
+			if self.frame_cache is not None:
+				self.frame_cache.evict()
+			index = index_class.load(path, key)
+		return index.intern(self.block_index)
+
+	def load_block_range_index(self, path=None):
+		"""
+		Loads the BlockRangeIndex of all headers, building it from the header table if needed (see
+		_load_saved_index). Once loaded, blocks_in_range uses it.
+		"""
+		def build():
+			header_table = self.header_table if self.header_table is not None else self.load_header_table()
+			return BlockRangeIndex.from_header_table(header_table)
+		state_key = self._cache_state_key(fresh=True)
+		self.block_range_index = self._load_saved_index(BlockRangeIndex, 'block-ranges', path, build)
+		self._index_state_keys['block_range_index'] = state_key
+		return self.block_range_index
+
+	def blocks_in_range(self, field, lo=None, hi=None):
+		"""
+		Finds the blocks with lo <= field <= hi by binary search, for field in BlockRangeIndex.fields
+		(timeInMilliseconds, daaScore or blueScore)
+
+		:return: The IDs (of self.block_index) of the blocks ordered by the field. self.block_index.hash_list(ids)
+			gives their hashes (e.g. for load_data or load_block_columns)
+		"""
+		return self._get_index('block_range_index', self.load_block_range_index).ids_in_range(field, lo, hi)
+
+	def get_acceptance_data(self, block_hash):
+		acceptance_bytes = self._get(self.prefix + sep + acceptance_data_store + sep + block_hash)
+		if acceptance_bytes is None:
+			return None
+		acceptance_data = KaspadDB.DbAcceptanceData()
+		acceptance_data.ParseFromString(acceptance_bytes)
+		return acceptance_data
+
+	def iter_acceptance_data(self, workers=None, chunk_size=1000):
+		"""
+		Streams the acceptance-data bucket (see parallel_scan) without keeping any DbTransaction. Each chunk
+		has one row per merged block (accepting_block, merged_blocks, num_txs) and one row per transaction
+		(transactionId, is_accepted, fee), in merged block order
+		:return: A generator of (chain block hashes, columns) chunks
+		"""
+		return self.iter_parallel_scan(self.prefix + sep + acceptance_data_store + sep, _project_acceptance,
+									   workers=workers, chunk_size=chunk_size)
+
+	def load_acceptance_index(self, workers=None):
+		"""
+		Builds an AcceptanceIndex over the acceptance data of the selected chain (acceptance data of blocks
+		no longer on the selected chain is skipped)
+		"""
+		chain, _ = self.load_selected_chain()
+		chain_order = np.argsort(chain)
+		sorted_chain = chain[chain_order]
+		chunks = []
+		for _, columns in tqdm(self.iter_acceptance_data(workers)):
+			rows = np.minimum(np.searchsorted(sorted_chain, columns['accepting_block']), len(chain) - 1)
+			on_chain = sorted_chain[rows] == columns['accepting_block']
+			tx_on_chain = np.repeat(on_chain, columns['num_txs'])
+			chunks.append({
+				'merged_blocks': columns['merged_blocks'][on_chain],
+				'merged_chain_position': chain_order[rows[on_chain]],
+				'num_txs': columns['num_txs'][on_chain],
+				'transactionId': columns['transactionId'][tx_on_chain],
+				'is_accepted': columns['is_accepted'][tx_on_chain],
+				'fee': columns['fee'][tx_on_chain],
+			})
+		columns = _concat_columns(chunks)
+		if len(chunks) == 0:
+			columns = {'merged_blocks': np.zeros(0, dtype='S32'), 'merged_chain_position': np.zeros(0, dtype=np.int64),
+					   'num_txs': np.zeros(0, dtype=np.int64), 'transactionId': np.zeros(0, dtype='S32'),
+					   'is_accepted': np.zeros(0, dtype=bool), 'fee': np.zeros(0, dtype=np.uint64)}
+		offsets = _csr_offsets(columns['num_txs'])
+		accepted_before = _csr_offsets(columns['is_accepted'])
+		columns['num_accepted'] = accepted_before[offsets[1:]] - accepted_before[offsets[:-1]]
+		return AcceptanceIndex(chain, columns)
+
+	def accepted_tps(self, acceptance_index, bin_ms=1000):
+		"""
+		Accepted transactions per second over time, binned by the timestamps of the accepting chain blocks
+		:return: The bin start times (ms) and the accepted TPS of each bin
+		"""
+		counts = acceptance_index.accepted_counts()
+		times = self.header_values(acceptance_index.chain, 'timeInMilliseconds').astype(np.int64)
+		start = times.min()
+		bins = (times - start) // bin_ms
+		tps = np.bincount(bins, weights=counts) / (bin_ms / 1000)
+		return start + bin_ms * np.arange(len(tps), dtype=np.int64), tps
 
 	def load_count_data(self, frames, count_fields):
-		if 'num_parents' in count_fields or 'num_children' in count_fields:
+		rows = None
+		if self.graph is not None and ('num_parents' in count_fields or 'num_children' in count_fields):
+			rows = self.graph.rows(self.block_index.ids(frames['hash']))
+			if not np.all(rows >= 0):
+				rows = None
+		if rows is not None:
+			if 'num_parents' in count_fields:
+				frames['num_parents'] = self.graph.num_parents()[rows]
+			if 'num_children' in count_fields:
+				frames['num_children'] = self.graph.num_children()[rows]
+		elif 'num_parents' in count_fields or 'num_children' in count_fields:
 			num_parents_col, num_children_col = [], []
 			for h in tqdm(frames['hash']):
 				relations = self.get_block(h)
@@ -358,11 +2288,40 @@ class Store:
 			if 'num_reds' in count_fields:
 				frames['num_reds'] = num_reds_col
 
-	def load_data(self, header_fields=None, block_fields=None, count_fields=None):
+	def load_data(self, header_fields=None, block_fields=None, count_fields=None, workers=None, block_hashes=None):
+		"""
+		Loads the requested fields of all loaded blocks into a dict of columns
+
+		:param workers: Number of processes used for parsing block bodies when block_fields are requested
+			(defaults to the number of cores, 1 parses serially through get_block_data)
+		:param block_hashes: Loads these blocks instead of the loaded ones (e.g. the hashes of blocks_in_range)
+		"""
 		if header_fields is None:
 			header_fields = []
 		if block_fields is None:
 			block_fields = []
+		if block_hashes is None:
+			block_hashes = list(self.blocks.keys())
+		elif isinstance(block_hashes, np.ndarray):
+			block_hashes = hash_list(block_hashes)
+		cache_name = None
+		if self.frame_cache is not None:
+			cache_name = FrameCache.entry_name('data', header_fields, block_fields, count_fields,
+											   self.header_table is not None, b''.join(block_hashes))
+			frames = self._load_from_cache(cache_name)
+			if frames is not None:
+				return frames
+		frames = self._load_frames(block_hashes, header_fields, block_fields, workers)
+		if count_fields is not None:
+			self.load_count_data(frames, count_fields)
+		if cache_name is not None:
+			self._save_to_cache(cache_name, frames)
+		return frames
+
+	def _load_frames(self, block_hashes, header_fields, block_fields, workers):
+		if self.header_table is not None:
+			return self._load_data_from_header_table(block_hashes, header_fields, block_fields, workers)
+
 		frames = {'hash': []}
 		for header_field in header_fields:
 			frames[header_field] = []
@@ -370,54 +2329,428 @@ class Store:
 			frames[block_field] = []
 		missing_headers = 0
 		missing_blocks  = 0
-		for block_hash in tqdm(self.blocks.keys()):
-			if len(block_fields) > 0:
-				block_data = self.get_block_data(block_hash)
-				if block_data:
-					for block_field in block_fields:
-						frames[block_field].append(getattr(block_data, block_field))
-					header_data = block_data.header
-				else:
-					missing_blocks += 1
-					header_data = None
-			else:
+		if len(block_fields) > 0:
+			columns, found = self.load_block_columns(block_hashes, block_fields, header_fields, workers)
+			missing_blocks = len(block_hashes) - int(np.count_nonzero(found))
+			missing_headers = missing_blocks
+			frames['hash'] = [block_hash for block_hash, is_found in zip(block_hashes, found) if is_found]
+			frames.update(columns)
+		else:
+			for block_hash in tqdm(block_hashes):
 				header_data = self.get_header_data(block_hash)
-			if not header_data:
-				missing_headers += 1
-				continue
-			frames['hash'].append(block_hash)
-			for header_field in header_fields:
-				frames[header_field].append(getattr(header_data, header_field))
+				if not header_data:
+					missing_headers += 1
+					continue
+				frames['hash'].append(block_hash)
+				for header_field in header_fields:
+					frames[header_field].append(getattr(header_data, header_field))
 
 		if missing_headers > 0:
 			print('Number of headers missing header data: ', missing_headers)
 		if missing_blocks > 0:
 			print('Number of blocks missing block data: ', missing_blocks)
+		return frames
 
-		if count_fields is not None:
-			self.load_count_data(frames, count_fields)
+	def load_block_columns(self, block_hashes, block_fields, header_fields=(), workers=None, chunk_size=1000,
+						   scan_fraction=0.5):
+		"""
+		Parses the given header and block fields of many block bodies
+
+		With more than one worker, bodies are decoded in a process pool. They are read with a scan of the
+		blocks bucket (see iter_parallel_scan) when block_hashes cover at least scan_fraction of it (as counted
+		by block_count, or the loaded blocks if kaspad has no count), and with point reads in key order otherwise
+
+		:return: A dict of columns aligned with the found blocks of block_hashes, and a boolean array
+			marking which of block_hashes were found in the DB
+		"""
+		if workers is None:
+			workers = os.cpu_count() or 1
+		header_fields, block_fields = list(header_fields), list(block_fields)
+		fields = header_fields + block_fields
+		rows = [None] * len(block_hashes)
+		if workers <= 1:
+			for i, block_hash in enumerate(tqdm(block_hashes)):
+				block_data = self.get_block_data(block_hash, block_fields)
+				if block_data:
+					rows[i] = _block_data_row(block_data, header_fields, block_fields)
+		else:
+			positions = {block_hash: i for i, block_hash in enumerate(block_hashes)}
+			bucket = self.prefix + sep + block_store + sep
+			num_blocks = self.block_count()
+			if num_blocks is None:
+				num_blocks = len(self.blocks)
+			if num_blocks > 0 and len(positions) >= scan_fraction * num_blocks:
+				chunks = self.iter_parallel_scan(bucket, _project_blocks, (header_fields, block_fields),
+												 workers=workers, chunk_size=chunk_size, keep=positions.__contains__)
+			else:
+				chunks = self._map_chunks(self._iter_point_read_chunks(bucket, sorted(positions), chunk_size),
+										  _project_blocks, (header_fields, block_fields), workers)
+			progress = tqdm(total=len(block_hashes))
+			for keys, columns in chunks:
+				for j, key in enumerate(keys):
+					rows[positions[key]] = tuple(columns[field][j] for field in fields)
+				progress.update(len(keys))
+			progress.close()
+
+		found = np.array([row is not None for row in rows], dtype=bool)
+		columns = {}
+		for j, field in enumerate(fields):
+			columns[field] = [row[j] for row in rows if row is not None]
+		return columns, found
+
+	def parallel_scan(self, bucket, project, args=(), workers=None, num_ranges=None, chunk_size=10000, keep=None):
+		"""
+		Decodes all entries of a bucket in parallel (see iter_parallel_scan)
+		:return: The concatenated columns of all chunks, in key order
+		"""
+		return _concat_columns(columns for _, columns in self.iter_parallel_scan(
+			bucket, project, args, workers, num_ranges, chunk_size, keep))
+
+	def iter_parallel_scan(self, bucket, project, args=(), workers=None, num_ranges=None, chunk_size=10000, keep=None):
+		"""
+		Scans the keys starting with bucket, split into key ranges whose boundaries are sampled from the DB
+
+		The ranges are read in key order from a DB snapshot and cut into chunks, which are decoded in a
+		process pool by project(keys, values, *args). LevelDB allows a single process to open the DB, so
+		workers receive the raw bytes instead of opening the DB themselves.
+
+		:param bucket: The key prefix of the bucket (keys passed to project are stripped of it)
+		:param project: A picklable (module level) function returning a dict of columns (NumPy arrays or
+			lists) for a chunk
+		:param workers: Size of the process pool (all cores by default). With a single worker chunks are
+			decoded in this process
+		:param num_ranges: Number of key ranges (4 per worker by default)
+		:param keep: Optional predicate on the stripped keys selecting which entries are decoded
+		:return: A generator of (keys, columns) chunks, in key order
+		"""
+		if workers is None:
+			workers = os.cpu_count() or 1
+		if num_ranges is None:
+			num_ranges = 4 * workers
+		snapshot = self.snapshot if self.snapshot is not None else self.db.snapshot()
+		try:
+			chunks = self._iter_range_chunks(snapshot, bucket, self._sample_key_ranges(snapshot, bucket, num_ranges),
+											 chunk_size, keep)
+			yield from self._map_chunks(chunks, project, args, workers)
+		finally:
+			if snapshot is not self.snapshot:
+				snapshot.close()
+
+	@staticmethod
+	def _map_chunks(chunks, project, args, workers):
+		"""
+		Decodes (keys, values) chunks by project(keys, values, *args) in a process pool (in this process with a
+		single worker)
+		:return: A generator of (keys, columns) chunks, in the order of chunks
+		"""
+		if workers <= 1:
+			for keys, values in chunks:
+				yield keys, project(keys, values, *args)
+			return
+		with ProcessPoolExecutor(workers) as executor:
+			# Keep a bounded number of chunks in flight so raw values are not all read ahead into memory
+			pending = deque()
+			for keys, values in chunks:
+				pending.append((keys, executor.submit(project, keys, values, *args)))
+				while len(pending) > 2 * workers:
+					keys, future = pending.popleft()
+					yield keys, future.result()
+			while len(pending) > 0:
+				keys, future = pending.popleft()
+				yield keys, future.result()
+
+	@staticmethod
+	def _sample_key_ranges(reader, bucket, num_ranges):
+		"""
+		Splits the keys of a bucket into (start, stop) ranges. Probes are interpolated between the first
+		and last keys past their common prefix (keys are hash based, so uniformly distributed there) and
+		snapped to the next actual key, so no range is empty
+		"""
+		first = next(reader.iterator(prefix=bucket, include_value=False), None)
+		if first is None:
+			return []
+		last = next(reader.iterator(prefix=bucket, reverse=True, include_value=False))
+		common = os.path.commonprefix([first, last])
+		low = int.from_bytes(first[len(common):len(common) + 8].ljust(8, b'\x00'), 'big')
+		high = int.from_bytes(last[len(common):len(common) + 8].ljust(8, b'\x00'), 'big')
+		boundaries = [first]
+		for i in range(1, num_ranges):
+			probe = common + (low + (high - low) * i // num_ranges).to_bytes(8, 'big')
+			key = next(reader.iterator(start=probe, stop=_key_successor(bucket), include_value=False), None)
+			if key is not None and key > boundaries[-1]:
+				boundaries.append(key)
+		return list(zip(boundaries, boundaries[1:] + [_key_successor(bucket)]))
+
+	def _iter_point_read_chunks(self, bucket, keys, chunk_size):
+		# Reads the given keys of a bucket (stripped of it) one by one, skipping missing ones
+		chunk_keys, values = [], []
+		for key in keys:
+			value = self._get(bucket + key)
+			if value is None:
+				continue
+			chunk_keys.append(key)
+			values.append(value)
+			if len(chunk_keys) == chunk_size:
+				yield chunk_keys, values
+				chunk_keys, values = [], []
+		if len(chunk_keys) > 0:
+			yield chunk_keys, values
+
+	def _iter_range_chunks(self, reader, bucket, ranges, chunk_size, keep):
+		prefix_len = len(bucket)
+		for start, stop in ranges:
+			keys, values = [], []
+			for key, value in reader.iterator(start=start, stop=stop, fill_cache=self.fill_cache_on_scans):
+				key = key[prefix_len:]
+				if keep is not None and not keep(key):
+					continue
+				keys.append(key)
+				values.append(value)
+				if len(keys) == chunk_size:
+					yield keys, values
+					keys, values = [], []
+			if len(keys) > 0:
+				yield keys, values
+
+	def _load_data_from_header_table(self, block_hashes, header_fields, block_fields, workers):
+		# Rows follow block_hashes (as without the table), skipping blocks without header
+		positions = self.header_table.positions(block_hashes)
+		missing_headers = int(np.count_nonzero(positions < 0))
+		positions = positions[positions >= 0]
+		frames = {}
+		if len(block_fields) > 0:
+			block_hashes = self.header_table.column('hash', positions)
+			block_columns, has_block = self.load_block_columns(block_hashes, block_fields, workers=workers)
+			missing_blocks = len(positions) - int(np.count_nonzero(has_block))
+			if missing_blocks > 0:
+				print('Number of blocks missing block data: ', missing_blocks)
+				missing_headers += missing_blocks
+				positions = positions[has_block]
+		frames['hash'] = self.header_table.column('hash', positions)
+		for header_field in header_fields:
+			frames[header_field] = self.header_table.column(header_field, positions)
+		if len(block_fields) > 0:
+			frames.update(block_columns)
 
+		if missing_headers > 0:
+			print('Number of headers missing header data: ', missing_headers)
 		return frames
 
-	def load_utxo_data(self, fields=None):
+	def load_utxo_data(self, fields=None, workers=1):
+		"""
+		Loads the given fields of the virtual UTXO set (see UTXOBatch). pubkey_script and transactionId
+		are returned as lists of bytes, all other fields as NumPy arrays
+		:param workers: With more than one worker, the UTXO set is decoded with parallel_scan
+		"""
 		if fields is None:
 			fields = []
+		fields = list(fields)
+		if workers is None or workers > 1:
+			frames = self.parallel_scan(self.prefix + sep + virtual_utxo_set_key + sep, _project_utxos, (fields,),
+										workers=workers)
+			if 'transactionId' in frames:
+				frames['transactionId'] = hash_list(frames['transactionId'])
+			for field in fields:
+				if field not in frames:
+					frames[field] = [] if field in ('pubkey_script', 'transactionId') else \
+						np.zeros(0, dtype=_utxo_dtypes[field])
+			return frames
+		batches = {field: [] for field in fields}
+		for batch in self.iter_utxoset(virtual_utxo_set_key, fields=fields):
+			for field in fields:
+				if field == 'pubkey_script':
+					batches[field].extend(batch.scripts())
+				elif field == 'transactionId':
+					batches[field].extend(batch.transaction_ids())
+				else:
+					batches[field].append(batch[field])
 		frames = {}
-		for header_field in fields:
-			frames[header_field] = []
-		for key, value in tqdm(self.db.iterator(prefix=self.prefix + sep + virtual_utxo_set_key)):
-			db_entry = KaspadDB.DbUtxoEntry()
-			db_entry.ParseFromString(value)
-			entry_data = UTXOEntry(db_entry)
-			for header_field in fields:
-				frames[header_field].append(getattr(entry_data, header_field))
+		for field in fields:
+			if field in ('pubkey_script', 'transactionId'):
+				frames[field] = batches[field]
+			else:
+				frames[field] = np.concatenate(batches[field]) if len(batches[field]) > 0 else \
+					np.zeros(0, dtype=_utxo_dtypes[field])
 		return frames
-	
+
+	def iter_utxoset(self, store_key, fields=None, batch_size=100000):
+		"""
+		Streams a UTXO set in batches of NumPy columns, so memory stays bounded by batch_size
+		:param store_key: virtual_utxo_set_key or pruning_utxo_set_key
+		:param fields: The UTXOBatch fields to decode (all by default). The outpoint key is only
+			parsed if transactionId or index is requested
+		:return: A generator of UTXOBatch objects with at most batch_size rows each
+		"""
+		if fields is None:
+			fields = UTXOBatch.fields
+		fields = list(fields)
+		unknown = set(fields) - set(UTXOBatch.fields)
+		if len(unknown) > 0:
+			raise ValueError('Unknown UTXO fields: {}'.format(sorted(unknown)))
+		parse_key = 'transactionId' in fields or 'index' in fields
+		prefix = self.prefix + sep + store_key + sep
+		prefix_len = len(prefix)
+		outpoint = KaspadDB.DbOutpoint()
+		db_entry = KaspadDB.DbUtxoEntry()
+		builder = _UTXOBatchBuilder(fields)
+		for key, value in tqdm(self._scan(prefix=prefix)):
+			if parse_key:
+				outpoint.ParseFromString(key[prefix_len:])
+			db_entry.ParseFromString(value)
+			builder.append(outpoint, db_entry)
+			if builder.num_rows >= batch_size:
+				yield builder.build()
+				builder = _UTXOBatchBuilder(fields)
+		if builder.num_rows > 0:
+			yield builder.build()
+
+	def iter_pruning_point_utxoset(self, fields=None, batch_size=100000):
+		return self.iter_utxoset(pruning_utxo_set_key, fields, batch_size)
+
+	def iter_virtual_utxoset(self, fields=None, batch_size=100000):
+		return self.iter_utxoset(virtual_utxo_set_key, fields, batch_size)
+
+	def get_utxo_diff(self, block_hash):
+		diff_bytes = self._get(self.prefix + sep + utxo_diff_store + sep + block_hash)
+		if diff_bytes is None:
+			return None
+		diff = KaspadDB.DbUtxoDiff()
+		diff.ParseFromString(diff_bytes)
+		return diff
+
+	def get_utxo_diff_chain(self, block_hash):
+		"""
+		:return: The hashes of block_hash and its successive utxo diff children, up to the block whose diff
+			is relative to the virtual UTXO set
+		"""
+		if self.utxo_diff_tree is not None:
+			tree = self._get_utxo_diff_tree()
+			chain = []
+			current = tree.index.id(block_hash)
+			if current >= len(tree):
+				current = -1
+			while current >= 0:
+				chain.append(current)
+				current = int(tree.child[current])
+			return tree.index.hash_list(np.array(chain, dtype=np.int32)) if len(chain) > 0 else [block_hash]
+		chain = [block_hash]
+		while True:
+			child_bytes = self._get(self.prefix + sep + utxo_diff_child_store + sep + chain[-1])
+			if child_bytes is None:
+				return chain
+			h = KaspadDB.DbHash()
+			h.ParseFromString(child_bytes)
+			chain.append(h.hash)
+
+	def iter_historical_utxoset(self, block_hash, fields=None, batch_size=100000):
+		"""
+		Streams the UTXO set of a past block (as kaspad restores it from utxo diffs) in the UTXOBatch format.
+		Starting from the virtual UTXO set, the diffs of the block's utxo diff chain are applied backwards
+		(from the virtual side down to the block). Each diff is read once and folded into a net diff with
+		vectorized set operations on outpoint keys, which then filters the streamed virtual UTXO set
+		:return: A generator of UTXOBatch objects
+		"""
+		if fields is None:
+			fields = UTXOBatch.fields
+		fields = list(fields)
+		adds, add_steps, removes, remove_steps = [], [], [], []
+		for step, diff_block in enumerate(tqdm(self.get_utxo_diff_chain(block_hash)[::-1])):
+			diff = self.get_utxo_diff(diff_block)
+			if diff is None:
+				raise KeyError('Missing utxo diff of block {}'.format(diff_block.hex()))
+			to_add, to_remove = _UTXOBatchBuilder(UTXOBatch.fields), _UTXOBatchBuilder(['transactionId', 'index'])
+			for item in diff.toAdd:
+				to_add.append(item.outpoint, item.utxoEntry)
+			for item in diff.toRemove:
+				to_remove.append(item.outpoint, item.utxoEntry)
+			adds.append(to_add.build())
+			add_steps.append(np.full(adds[-1].num_rows, step, dtype=np.int64))
+			removes.append(to_remove.build().outpoint_keys())
+			remove_steps.append(np.full(len(removes[-1]), step, dtype=np.int64))
+
+		# Net diff: the latest addition of an outpoint survives unless a later step removes it
+		added = UTXOBatch.concat(adds)
+		added_keys, add_steps = added.outpoint_keys(), np.concatenate(add_steps)
+		remove_keys, remove_steps = np.concatenate(removes), np.concatenate(remove_steps)
+		last_removals = _last_rows_by_key(remove_keys, remove_steps)
+		removed_keys, removed_steps = remove_keys[last_removals], remove_steps[last_removals]
+		latest = _last_rows_by_key(added_keys, add_steps)
+		removed_at = np.full(len(latest), -1, dtype=np.int64)
+		if len(removed_keys) > 0:
+			rows = np.minimum(np.searchsorted(removed_keys, added_keys[latest]), len(removed_keys) - 1)
+			removed_at = np.where(removed_keys[rows] == added_keys[latest], removed_steps[rows], -1)
+		added = added.take(latest[add_steps[latest] >= removed_at])
+		# Virtual entries which were removed or re-added along the way are dropped from the stream
+		dropped = np.union1d(removed_keys, added.outpoint_keys())
+
+		for batch in self.iter_utxoset(virtual_utxo_set_key, fields=set(fields) | {'transactionId', 'index'},
+									   batch_size=batch_size):
+			kept = np.flatnonzero(~np.isin(batch.outpoint_keys(), dropped))
+			if len(kept) > 0:
+				yield batch.take(kept, fields)
+		for start in range(0, added.num_rows, batch_size):
+			yield added.take(np.arange(start, min(start + batch_size, added.num_rows)), fields)
+
+	def utxo_balances(self, store_key=virtual_utxo_set_key, top=None, min_balance=0, coinbase_only=False,
+					  batch_size=100000, block_hash=None):
+		"""
+		Aggregates a UTXO set by scriptPublicKey. Scripts are grouped by length and bytes in each streamed batch
+		with NumPy, and only the distinct scripts which pass the filters are converted to addresses
+		:param top: If set, only the top balances are returned
+		:param min_balance: Minimal balance (in sompi) of a returned script
+		:param coinbase_only: Whether to only count coinbase UTXOs
+		:param block_hash: If set, the balances are computed over the UTXO set of this past block (see
+			iter_historical_utxoset) instead of store_key
+		:return: A dict of columns (address, pubkey_script, balance, utxo_count) sorted by descending balance.
+			The address of non-standard scripts is None
+		"""
+		fields = ['amount', 'pubkey_script'] + (['isCoinbase'] if coinbase_only else [])
+		groups = {}
+		pending_rows = 0
+		if block_hash is not None:
+			batches = self.iter_historical_utxoset(block_hash, fields=fields, batch_size=batch_size)
+		else:
+			batches = self.iter_utxoset(store_key, fields=fields, batch_size=batch_size)
+		for batch in batches:
+			rows = np.flatnonzero(batch['isCoinbase']) if coinbase_only else np.arange(batch.num_rows)
+			amounts = batch['amount'][rows]
+			for length, positions, keys in _scripts_by_length(batch, rows):
+				groups.setdefault(length, []).append(
+					_group_sum(keys, amounts[positions], np.ones(len(keys), dtype=np.int64)))
+				pending_rows += len(keys)
+			# Merge partial groups once they outgrow a few batches, keeping memory bounded by the distinct scripts
+			if pending_rows > 4 * batch_size:
+				groups = {length: [_merge_groups(length_groups)] for length, length_groups in groups.items()}
+				pending_rows = sum(len(length_groups[0][0]) for length_groups in groups.values())
+		lengths = sorted(groups)
+		merged = [_merge_groups(groups[length]) for length in lengths]
+		balances = np.concatenate([m[1] for m in merged]) if merged else np.zeros(0, dtype=np.uint64)
+		counts = np.concatenate([m[2] for m in merged]) if merged else np.zeros(0, dtype=np.int64)
+		sizes = [len(m[0]) for m in merged]
+		buckets = np.repeat(np.arange(len(merged)), sizes)
+		bucket_rows = np.arange(len(balances)) - np.repeat(np.cumsum([0] + sizes)[:-1], sizes)
+
+		selected = np.flatnonzero(balances >= min_balance)
+		# Descending balance (~ reverses the order of unsigned values), ties broken by script length and bytes
+		# since keys are sorted
+		selected = selected[np.argsort(~balances[selected], kind='stable')]
+		if top is not None:
+			selected = selected[:top]
+		selected_scripts = []
+		for bucket, row in zip(buckets[selected].tolist(), bucket_rows[selected].tolist()):
+			selected_scripts.append(merged[bucket][0][row:row + 1].tobytes()[:lengths[bucket]])
+		return {
+			'address': [_script_address(script) for script in selected_scripts],
+			'pubkey_script': selected_scripts,
+			'balance': balances[selected],
+			'utxo_count': counts[selected],
+		}
+
 	def get_utxoset(self, store_key):
 		utxoset = []
 		prefix = self.prefix + sep + store_key + sep
 		prefix_len = len(prefix)
-		for key, value in tqdm(self.db.iterator(prefix=prefix)):
+		for key, value in tqdm(self._scan(prefix=prefix)):
 			outpoint_entry = KaspadDB.DbOutpoint()
 			outpoint_entry.ParseFromString(key[prefix_len:])
 			db_entry = KaspadDB.DbUtxoEntry()
@@ -434,26 +2767,26 @@ class Store:
 		return self.get_utxoset(virtual_utxo_set_key)
 
 	def candidate_pruning_point(self):
-		candidate_bytes = self.db.get(self.prefix + sep + candidate_pruning_point_key)
+		candidate_bytes = self._get(self.prefix + sep + candidate_pruning_point_key)
 		cpp = KaspadDB.DbHash()
 		cpp.ParseFromString(candidate_bytes)
 		return cpp.hash
 
 	def pruning_point(self):
-		pp_index_bytes = self.db.get(self.prefix + sep + pruning_block_index_key)
+		pp_index_bytes = self._get(self.prefix + sep + pruning_block_index_key)
 		pp_index = int.from_bytes(pp_index_bytes, 'little')
-		pp_bytes = self.db.get(self.prefix + sep + pruning_by_index_store + sep +
+		pp_bytes = self._get(self.prefix + sep + pruning_by_index_store + sep +
 							   pp_index.to_bytes(8, 'big'))
 		pp = KaspadDB.DbHash()
 		pp.ParseFromString(pp_bytes)
 		return pp.hash
 
 	def pruning_points_chain(self):
-		pp_index_bytes = self.db.get(self.prefix + sep + pruning_block_index_key)
+		pp_index_bytes = self._get(self.prefix + sep + pruning_block_index_key)
 		pp_index = int.from_bytes(pp_index_bytes, 'little')
 		pp_chain = []
 		while pp_index >= 0:
-			pp_bytes = self.db.get(self.prefix + sep + pruning_by_index_store + sep +
+			pp_bytes = self._get(self.prefix + sep + pruning_by_index_store + sep +
 								   pp_index.to_bytes(8, 'big'))
 			pp = KaspadDB.DbHash()
 			pp.ParseFromString(pp_bytes)
@@ -462,23 +2795,308 @@ class Store:
 		return pp_chain
 
 	def tips(self):
-		hst_bytes = self.db.get(self.prefix + sep + headers_selected_tip_key)
+		hst_bytes = self._get(self.prefix + sep + headers_selected_tip_key)
 		hst = KaspadDB.DbHash()
 		hst.ParseFromString(hst_bytes)
-		tips_bytes = self.db.get(self.prefix + sep + tips_key)
+		tips_bytes = self._get(self.prefix + sep + tips_key)
 		tips = KaspadDB.DbTips()
 		tips.ParseFromString(tips_bytes)
 		return [t.hash for t in tips.tips], hst.hash
 
+	def _find_bucket(self, *buckets):
+		"""
+		:return: The first of the given buckets which is not empty (the first one if all are empty)
+		"""
+		for bucket in buckets:
+			if next(self._scan(prefix=bucket, include_value=False), None) is not None:
+				return bucket
+		return buckets[0]
+
+	def _reachability_bucket(self):
+		# Reachability data is stored per block level in recent kaspad versions
+		return self._find_bucket(self.prefix + sep + level + sep + reachability_data_store + sep,
+								 self.prefix + sep + reachability_data_store + sep)
+
+	def get_reachability_data(self, block_hash):
+		data_bytes = self._get(self._reachability_bucket() + block_hash)
+		if data_bytes is None:
+			return None
+		data = KaspadDB.DbReachabilityData()
+		data.ParseFromString(data_bytes)
+		return data
+
+	def load_reachability(self):
+		"""
+		Reads the whole reachability-data bucket with a single scan into a ReachabilityIndex
+		"""
+		state_key = self._cache_state_key(fresh=True)
+		bucket = self._reachability_bucket()
+		blocks, parents, fcs = bytearray(), bytearray(), bytearray()
+		starts, ends, fcs_counts = array('Q'), array('Q'), array('q')
+		for key, value in tqdm(self._scan(prefix=bucket)):
+			data = KaspadDB.DbReachabilityData()
+			data.ParseFromString(value)
+			blocks += key[len(bucket):]
+			parents += data.parent.hash.ljust(32, b'\x00')
+			starts.append(data.interval.start)
+			ends.append(data.interval.end)
+			fcs_counts.append(len(data.futureCoveringSet))
+			for h in data.futureCoveringSet:
+				fcs += h.hash
+		index = self.block_index
+		block_ids = index.extend(np.frombuffer(bytes(blocks), dtype='S32'))
+		num_ids = len(index)
+		has_data = np.zeros(num_ids, dtype=bool)
+		has_data[block_ids] = True
+		parent = np.full(num_ids, -1, dtype=np.int32)
+		parent_ids = index.ids(np.frombuffer(bytes(parents), dtype='S32'))
+		parent[block_ids] = np.where((parent_ids >= 0) & has_data[np.maximum(parent_ids, 0)], parent_ids, -1)
+		interval_start = np.zeros(num_ids, dtype=np.uint64)
+		interval_end = np.zeros(num_ids, dtype=np.uint64)
+		interval_start[block_ids] = np.frombuffer(starts, dtype=np.uint64)
+		interval_end[block_ids] = np.frombuffer(ends, dtype=np.uint64)
+		fcs_ids = index.ids(np.frombuffer(bytes(fcs), dtype='S32'))
+
+		# Keep each future covering set ordered by interval start (dropping blocks without reachability data)
+		owners = np.repeat(block_ids.astype(np.int64), np.frombuffer(fcs_counts, dtype=np.int64))
+		known = fcs_ids >= 0
+		known[known] = has_data[fcs_ids[known]]
+		owners, fcs_ids = owners[known], fcs_ids[known]
+		order = np.lexsort((interval_start[fcs_ids], owners))
+		fcs_ids = fcs_ids[order]
+		fcs_offsets = _csr_offsets(np.bincount(owners, minlength=num_ids))
+		self.reachability = ReachabilityIndex(index, has_data, parent, interval_start, interval_end, fcs_offsets,
+											  fcs_ids)
+		self._index_state_keys['reachability'] = state_key
+		return self.reachability
+
+	def _get_reachability(self):
+		return self._get_index('reachability', self.load_reachability)
+
+	def is_dag_ancestor_of(self, a_hash, b_hash):
+		"""
+		:return: Whether block a is in the past of block b (or a == b), using the reachability data
+		"""
+		return bool(self._get_reachability().is_dag_ancestor_of([a_hash], [b_hash])[0])
+
+	def is_chain_ancestor_of(self, a_hash, b_hash):
+		"""
+		:return: Whether block a is in the selected chain of block b (or a == b), using the reachability data
+		"""
+		return bool(self._get_reachability().is_chain_ancestor_of([a_hash], [b_hash])[0])
+
+	def _daa_bucket(self, store_name):
+		return self._find_bucket(self.prefix + sep + store_name + sep, self.prefix + sep + level + sep + store_name + sep)
+
+	def get_daa_score(self, block_hash):
+		score_bytes = self._get(self._daa_bucket(daa_score_store) + block_hash)
+		if score_bytes is None:
+			return None
+		return int.from_bytes(score_bytes, 'little')
+
+	def get_daa_added_blocks(self, block_hash):
+		added_bytes = self._get(self._daa_bucket(daa_added_blocks_store) + block_hash)
+		if added_bytes is None:
+			return None
+		# A little-endian uint64 count followed by the hashes
+		return hash_list(np.frombuffer(added_bytes[8:], dtype='S32'))
+
+	def load_daa_scores(self):
+		"""
+		Reads the whole daa-score bucket with a single scan
+
+		:return: A dict of columns: hash ('S32', sorted) and daaScore (uint64)
+		"""
+		bucket = self._daa_bucket(daa_score_store)
+		blocks, scores = bytearray(), bytearray()
+		for key, value in tqdm(self._scan(prefix=bucket)):
+			blocks += key[len(bucket):]
+			scores += value
+		return {'hash': np.frombuffer(bytes(blocks), dtype='S32'), 'daaScore': np.frombuffer(bytes(scores), dtype='<u8')}
+
+	def load_daa_added_blocks(self):
+		"""
+		Reads the whole daa-added-blocks bucket with a single scan
+
+		:return: A dict of columns: hash ('S32', sorted), and the added blocks of each block in CSR form
+			(added_offsets, added)
+		"""
+		bucket = self._daa_bucket(daa_added_blocks_store)
+		blocks, added, counts = bytearray(), bytearray(), array('q')
+		for key, value in tqdm(self._scan(prefix=bucket)):
+			blocks += key[len(bucket):]
+			counts.append(int.from_bytes(value[:8], 'little'))
+			added += value[8:]
+		return {'hash': np.frombuffer(bytes(blocks), dtype='S32'),
+				'added_offsets': _csr_offsets(np.frombuffer(counts, dtype=np.int64)),
+				'added': np.frombuffer(bytes(added), dtype='S32')}
+
+	def load_daa_windows(self):
+		"""
+		Reads the whole daa-window bucket (the windows kaspad keeps for blocks with trusted data) with a single
+		scan. Entries are keyed by block hash and little-endian uint64 window position.
+
+		:return: A dict of columns: hash ('S32', sorted), and the window of each block in CSR form (window_offsets,
+			window), ordered by window position, with the blue work of each window block (window_blue_work, 'S32'
+			big-endian as in HeaderTable)
+		"""
+		bucket = self._daa_bucket(daa_window_store)
+		owners, positions, window, blue_work = bytearray(), array('Q'), bytearray(), bytearray()
+		for key, value in tqdm(self._scan(prefix=bucket)):
+			pair = KaspadDB.DbBlockGHOSTDAGDataHashPair()
+			pair.ParseFromString(value)
+			owners += key[len(bucket):len(bucket) + 32]
+			positions.append(int.from_bytes(key[len(bucket) + 32:], 'little'))
+			window += pair.hash.hash
+			blue_work += pair.GhostdagData.blueWork.rjust(32, b'\x00')
+		owners = np.frombuffer(bytes(owners), dtype='S32')
+		order = np.lexsort((np.frombuffer(positions, dtype=np.uint64), owners))
+		blocks, sizes = np.unique(owners, return_counts=True)
+		return {'hash': blocks, 'window_offsets': _csr_offsets(sizes),
+				'window': np.frombuffer(bytes(window), dtype='S32')[order],
+				'window_blue_work': np.frombuffer(bytes(blue_work), dtype='S32')[order]}
+
+	def load_daa_index(self):
+		"""
+		Builds a DAAIndex from the daa-added-blocks and daa-score buckets and the selected parents in the
+		level-0 ghostdag data (each bucket is read with a single scan)
+		"""
+		state_key = self._cache_state_key(fresh=True)
+		added = self.load_daa_added_blocks()
+		scores = self.load_daa_scores()
+		index = self.block_index
+		block_ids = index.extend(added['hash'])
+		added_ids = index.extend(added['added'])
+		num_ids = len(index)
+		has_data = np.zeros(num_ids, dtype=bool)
+		has_data[block_ids] = True
+
+		selected_parents = np.zeros(len(block_ids), dtype='S32')
+		ghostdag_data_bucket = self.prefix + sep + level + sep + ghostdag_data_store + sep
+		prefix_len = len(ghostdag_data_bucket)
+		rows = {block_hash: row for row, block_hash in enumerate(hash_list(added['hash']))}
+		for key, value in tqdm(self._scan(prefix=ghostdag_data_bucket)):
+			row = rows.get(key[prefix_len:])
+			if row is not None:
+				gdd = KaspadDB.DbBlockGhostdagData()
+				gdd.ParseFromString(value)
+				selected_parents[row] = gdd.selectedParent.hash
+		# Selected parents without DAA data end the chain walks
+		selected_parent = np.full(num_ids, -1, dtype=np.int32)
+		selected_parent_ids = index.ids(selected_parents)
+		selected_parent[block_ids] = np.where(
+			(selected_parent_ids >= 0) & has_data[np.maximum(selected_parent_ids, 0)], selected_parent_ids, -1)
+
+		daa_score = np.full(num_ids, -1, dtype=np.int64)
+		score_ids = index.ids(scores['hash'])
+		daa_score[score_ids[score_ids >= 0]] = scores['daaScore'][score_ids >= 0]
+		# The added blocks of each block in ID order (blocks without DAA data add none)
+		counts = np.zeros(num_ids, dtype=np.int64)
+		counts[block_ids] = np.diff(added['added_offsets'])
+		owners = np.repeat(block_ids.astype(np.int64), np.diff(added['added_offsets']))
+		order = np.argsort(owners, kind='stable')
+		self.daa_index = DAAIndex(index, block_ids, selected_parent, daa_score, _csr_offsets(counts), added_ids[order])
+		self._index_state_keys['daa_index'] = state_key
+		return self.daa_index
+
+	def _get_daa_index(self):
+		return self._get_index('daa_index', self.load_daa_index)
+
+	def _daa_header_columns(self, daa_index):
+		# Blue work ranks, targets and timestamps of the DAA index blocks (-inf, NaN and 0 for blocks without header)
+		header_table = self.header_table if self.header_table is not None else self.load_header_table()
+		positions = header_table.positions(daa_index.index.hashes[:len(daa_index)])
+		known = positions >= 0
+		blue_work = np.where(known, _blue_work_ranks(header_table['blueWork'])[positions], -np.inf)
+		bits = np.where(known, header_table['bits'][positions], 0).astype(np.uint32)
+		targets = np.where(known, _compact_to_targets(bits), np.nan)
+		timestamps = np.where(known, header_table['timeInMilliseconds'][positions], 0)
+		return blue_work, bits, targets, timestamps
+
+	def get_difficulty_window(self, block_hash, window_size=difficulty_window_size):
+		"""
+		:return: The hashes of the difficulty window of a block rebuilt from the DAA data (see DAAIndex), ordered
+			by decreasing blue work
+		"""
+		daa_index = self._get_daa_index()
+		block_id = daa_index.index.id(block_hash)
+		if not (0 <= block_id < len(daa_index) and daa_index.has_data[block_id]):
+			return None
+		blue_work, _, _, _ = self._daa_header_columns(daa_index)
+		_, window = daa_index.window_ids([block_id], blue_work, window_size)
+		return daa_index.index.hash_list(window)
+
+	def recompute_difficulty(self, window_size=difficulty_window_size, target_time=target_time_per_block,
+							 chunk_size=1000):
+		"""
+		Recomputes the target of every block with DAA data from its rebuilt difficulty window, for comparison
+		with the header bits. Blocks are processed in chunks of chunk_size windows.
+
+		:return: A dict of columns: hash, bits (from the header), expected_bits, target_ratio (expected over
+			header target) and full_window (False where the DAA data runs out before the window is full, in
+			which case expected_bits is 0 and target_ratio NaN)
+		"""
+		daa_index = self._get_daa_index()
+		blue_work, bits, targets, timestamps = self._daa_header_columns(daa_index)
+		block_ids = daa_index.block_ids
+		expected = np.empty(len(block_ids))
+		for start in tqdm(range(0, len(block_ids), chunk_size)):
+			rows = np.arange(start, min(start + chunk_size, len(block_ids)))
+			window_offsets, window = daa_index.window_ids(block_ids[rows], blue_work, window_size)
+			expected[rows] = _window_targets(window_offsets, window, targets, timestamps, window_size, target_time)
+		full_window = ~np.isnan(expected)
+		expected_bits = np.zeros(len(block_ids), dtype=np.uint32)
+		expected_bits[full_window] = _targets_to_compact(expected[full_window])
+		# Ratio of the capped expected target, so blocks at the minimum difficulty compare equal
+		expected = np.minimum(expected, float(pow_max))
+		return {'hash': daa_index.index.hashes[block_ids], 'bits': bits[block_ids],
+				'expected_bits': expected_bits, 'target_ratio': expected / targets[block_ids],
+				'full_window': full_window}
+
 	def get_utxo_diff_child(self, block_hash):
-		child_bytes = self.db.get(self.prefix + sep + utxo_diff_child_store + sep + block_hash)
+		child_bytes = self._get(self.prefix + sep + utxo_diff_child_store + sep + block_hash)
 		if child_bytes is None:
 			return None, None
 		h = KaspadDB.DbHash()
 		h.ParseFromString(child_bytes)
 		return h.hash, self.get_header_data(h.hash).blueWork
 
+	def load_utxo_diff_tree(self, with_blue_work=True):
+		"""
+		Reads the whole utxo-diff-children bucket with a single scan into a UTXODiffTree, which then answers
+		get_common_utxo_diff_root (and batch queries through its common_roots)
+		"""
+		state_key = self._cache_state_key(fresh=True)
+		bucket = self.prefix + sep + utxo_diff_child_store + sep
+		blocks, children = bytearray(), bytearray()
+		for key, value in tqdm(self._scan(prefix=bucket)):
+			h = KaspadDB.DbHash()
+			h.ParseFromString(value)
+			blocks += key[len(bucket):]
+			children += h.hash
+		index = self.block_index
+		block_ids = index.extend(np.frombuffer(bytes(blocks), dtype='S32'))
+		child_ids = index.extend(np.frombuffer(bytes(children), dtype='S32'))
+		child = np.full(len(index), -1, dtype=np.int32)
+		child[block_ids] = child_ids
+		blue_work = None
+		if with_blue_work:
+			# Blue work of the tree blocks (None for other IDs and for blocks whose header is missing)
+			tree_ids = np.union1d(block_ids, child_ids)
+			blue_work = np.full(len(index), None, dtype=object)
+			blue_work[tree_ids] = self.header_values(index.hashes[tree_ids], 'blueWork', skip_missing=True)
+		self.utxo_diff_tree = UTXODiffTree(index, child, blue_work)
+		self._index_state_keys['utxo_diff_tree'] = state_key
+		return self.utxo_diff_tree
+
+	def _get_utxo_diff_tree(self):
+		# Only used once loaded, and reloaded with the same options
+		with_blue_work = self.utxo_diff_tree.blue_work is not None
+		return self._get_index('utxo_diff_tree', lambda: self.load_utxo_diff_tree(with_blue_work))
+
 	def get_common_utxo_diff_root(self, low_hash, high_hash):
+		if self.utxo_diff_tree is not None:
+			return self._get_utxo_diff_tree().common_roots([low_hash], [high_hash])[0]
 		low_child, low_work = self.get_utxo_diff_child(low_hash)
 		high_child, high_work = self.get_utxo_diff_child(high_hash)
 		if low_child is None or high_child is None:
@@ -499,13 +3117,285 @@ class Store:
 				low_child, low_work = child, work
 		return low_child
 
-	def load_blocks(self, after_pruning_point=True):
-		# Reset loaded data
-		self.blocks = {}
+	def load_blocks(self, after_pruning_point=True, bulk_scan=False, compact=False, csr=False):
+		"""
+		Loads the block relations of the DAG into self.blocks
+
+		:param after_pruning_point: If True, loads the future of the pruning point, else the past of the tips
+		:param bulk_scan: If True, reads the whole relations bucket with a single sequential scan instead
+			of a BFS of random reads, and only then restricts to the reachable set
+		:param compact: If True, self.blocks holds CompactBlocks (relations over dense block IDs) instead of
+			a dict of Block objects
+		:param csr: If True, also builds self.graph, a BlockGraph of the loaded blocks (see block_graph)
+		"""
+		# Reset loaded data (the loaded set is not bounded by max_blocks)
+		self.blocks = LRUCache()
+		self.graph = None
+		self.loaded_after_pruning_point = after_pruning_point
+		start = time.time()
+		cache_name = 'blocks-pruning-point-up' if after_pruning_point else 'blocks-tips-down'
+		columns = self._load_from_cache(cache_name)
+		if columns is not None:
+			if compact:
+				self.blocks = CompactBlocks.from_relations(self.block_index, **columns)
+			else:
+				self._blocks_from_columns(columns)
+		else:
+			if bulk_scan and compact:
+				self._load_compact_blocks_by_bulk_scan(after_pruning_point)
+			elif bulk_scan:
+				self._load_blocks_by_bulk_scan(after_pruning_point)
+			elif after_pruning_point:
+				self._load_blocks_from_pruning_point_up()
+			else:
+				self._load_blocks_from_tips_down()
+			if compact and not isinstance(self.blocks, CompactBlocks):
+				self.blocks = CompactBlocks.from_relations(self.block_index, **self._blocks_to_columns())
+			self._save_to_cache(cache_name, self._blocks_to_columns())
+		elapsed = time.time() - start
+		print('Loaded {} blocks in {:.2f}s ({:.0f} rows/sec)'.format(
+			len(self.blocks), elapsed, len(self.blocks) / max(elapsed, 1e-9)))
+		if isinstance(self.blocks, LRUCache):
+			self.blocks.pin_all()
+			self.blocks.max_entries = self.max_blocks
+		if csr:
+			self.graph = self.block_graph()
+
+	def block_graph(self):
+		"""
+		:return: The relations of the loaded blocks as a BlockGraph of CSR arrays over self.block_index
+			(sharing the arrays of self.blocks when it holds unmodified CompactBlocks)
+		"""
+		if isinstance(self.blocks, CompactBlocks) and self.blocks.is_pristine():
+			blocks = self.blocks
+		else:
+			blocks = BlockGraph.from_relations(self.block_index, **self._blocks_to_columns())
+		return BlockGraph(blocks.index, blocks.loaded_ids, blocks.parent_offsets, blocks.parent_ids,
+						  blocks.child_offsets, blocks.child_ids)
+
+	def _blocks_to_columns(self):
+		if isinstance(self.blocks, CompactBlocks):
+			return self.blocks.to_relations()
+		blocks = self.blocks.values()
+		return {
+			'hash': 		np.frombuffer(b''.join(self.blocks.keys()), dtype='S32'),
+			'num_parents': 	np.array([len(block.parents) for block in blocks], dtype=np.int32),
+			'parents': 		np.frombuffer(b''.join(p for block in blocks for p in block.parents), dtype='S32'),
+			'num_children': np.array([len(block.children) for block in blocks], dtype=np.int32),
+			'children': 	np.frombuffer(b''.join(c for block in blocks for c in block.children), dtype='S32'),
+		}
+
+	def _blocks_from_columns(self, columns):
+		parents, children = hash_list(columns['parents']), hash_list(columns['children'])
+		parent_offset, child_offset = 0, 0
+		for block_hash, num_parents, num_children in zip(
+				hash_list(columns['hash']), columns['num_parents'].tolist(), columns['num_children'].tolist()):
+			block = Block()
+			block.parents = parents[parent_offset:parent_offset + num_parents]
+			block.children = children[child_offset:child_offset + num_children]
+			parent_offset += num_parents
+			child_offset += num_children
+			self.blocks[block_hash] = block
+
+	def refresh(self, db_path=None):
+		"""
+		Brings the loaded blocks up to date with a newer state of the DB (or with a newer copy of the datadir
+		at db_path) without reloading from scratch. Walks back from the new tips until reaching known blocks,
+		and loads only the new relations, as well as the headers and bodies of new blocks when those were
+		loaded before. If blocks were loaded from the pruning point up, blocks that fell out of the future of
+		the new pruning point are dropped.
+
+		:return: The hashes of the newly added blocks
+		"""
+		if db_path is not None:
+			self.close()
+			self._open(db_path)
+		elif self.snapshot is not None:
+			self.pin_snapshot()
+		self._state_key = None
+
+		self.mergeset_index = None
+		self.utxo_diff_tree = None
+		self.reachability = None
+		self.daa_index = None
+		self.block_range_index = None
+		tips, hst = self.tips()
+		pp = self.pruning_point()
+		# Blocks in the past of the pruning point have a lower DAA score, which bounds the walk in case new
+		# blocks merge blocks which were never loaded (e.g. from the anticone of the pruning point)
+		min_daa_score = self.get_header_data(pp).daaScore if self.loaded_after_pruning_point else None
+		q = deque(tip for tip in tips if tip not in self.blocks)
+		s = set(q)
+		new_blocks = []
+		missing_headers = 0
+		while len(q) > 0:
+			block_hash = q.popleft()
+			block = self._read_block(block_hash)
+			if block is None:
+				missing_headers += 1
+				continue
+			new_blocks.append((block_hash, block))
+			if min_daa_score is not None and self.get_header_data(block_hash).daaScore <= min_daa_score:
+				continue
+			for parent in block.parents:
+				if parent in self.blocks:
+					known = self.blocks[parent]
+					if block_hash not in known.children:
+						known.children.append(block_hash)
+						self.blocks[parent] = known
+				elif parent not in s:
+					s.add(parent)
+					q.append(parent)
+
+		# Add new blocks with ancestors first (pinned, as part of the loaded set)
+		for block_hash, block in reversed(new_blocks):
+			self.blocks.pin(block_hash, block)
+		new_hashes = [block_hash for block_hash, _ in reversed(new_blocks)]
+		print('Number of new blocks: ', len(new_hashes))
+		if missing_headers > 0:
+			print('Number of missing headers: ', missing_headers)
+
+		if self.loaded_after_pruning_point:
+			self._drop_blocks_out_of_future(pp)
+			new_hashes = [block_hash for block_hash in new_hashes if block_hash in self.blocks]
+
+		if self.graph is not None:
+			self.graph = self.block_graph()
+		if self.header_table is not None:
+			new_rows = [(block_hash, self._get(self.prefix + sep + header_store + sep + block_hash))
+						for block_hash in sorted(new_hashes)]
+			new_table = HeaderTable.from_raw_headers((h, value) for h, value in new_rows if value is not None)
+			self.header_table = self.header_table.merge(new_table)
+		if len(self.bodies) > 0:
+			for block_hash in tqdm(new_hashes):
+				self.get_block_data(block_hash)
+		elif len(self.headers) > 0:
+			for block_hash in tqdm(new_hashes):
+				self.get_header_data(block_hash)
+		return new_hashes
+
+	def _drop_blocks_out_of_future(self, pp):
+		q = deque([pp])
+		s = {pp}
+		while len(q) > 0:
+			current = self.blocks.get(q.popleft())
+			if current is None:
+				continue
+			for child in current.children:
+				if child not in s:
+					s.add(child)
+					q.append(child)
+		dropped = [block_hash for block_hash in self.blocks.keys() if block_hash not in s]
+		for block_hash in dropped:
+			del self.blocks[block_hash]
+			self.headers.pop(block_hash, None)
+			self.bodies.pop(block_hash, None)
+		if self.header_table is not None and len(dropped) > 0:
+			dropped_rows = self.header_table.positions(dropped)
+			keep = np.ones(len(self.header_table), dtype=bool)
+			keep[dropped_rows[dropped_rows >= 0]] = False
+			self.header_table = self.header_table.select(keep)
+		if len(dropped) > 0:
+			print('Number of blocks dropped below the pruning point: ', len(dropped))
+
+	def scan_block_relations(self):
+		"""
+		Reads the entire level-0 block relations bucket in key order
+		:return: A dict mapping each block hash to its Block relations
+		"""
+		relations_bucket = self.prefix + sep + level + sep + relations_store + sep
+		prefix_len = len(relations_bucket)
+		all_blocks = {}
+		start = time.time()
+		for key, value in tqdm(self._scan(prefix=relations_bucket)):
+			br = KaspadDB.DbBlockRelations()
+			br.ParseFromString(value)
+			block = Block()
+			block.parents = [parent.hash for parent in br.parents]
+			block.children = [child.hash for child in br.children]
+			all_blocks[key[prefix_len:]] = block
+		elapsed = time.time() - start
+		print('Scanned {} block relations in {:.2f}s ({:.0f} rows/sec)'.format(
+			len(all_blocks), elapsed, len(all_blocks) / max(elapsed, 1e-9)))
+		return all_blocks
+
+	def scan_block_relation_columns(self):
+		"""
+		Reads the entire level-0 block relations bucket in key order into relation columns (without
+		creating Block objects)
+		"""
+		relations_bucket = self.prefix + sep + level + sep + relations_store + sep
+		prefix_len = len(relations_bucket)
+		hashes, parents, children = bytearray(), bytearray(), bytearray()
+		num_parents, num_children = array('i'), array('i')
+		start = time.time()
+		for key, value in tqdm(self._scan(prefix=relations_bucket)):
+			br = KaspadDB.DbBlockRelations()
+			br.ParseFromString(value)
+			hashes += key[prefix_len:]
+			num_parents.append(len(br.parents))
+			for parent in br.parents:
+				parents += parent.hash
+			num_children.append(len(br.children))
+			for child in br.children:
+				children += child.hash
+		elapsed = time.time() - start
+		print('Scanned {} block relations in {:.2f}s ({:.0f} rows/sec)'.format(
+			len(num_parents), elapsed, len(num_parents) / max(elapsed, 1e-9)))
+		return {
+			'hash': 		np.frombuffer(bytes(hashes), dtype='S32'),
+			'num_parents': 	np.frombuffer(num_parents, dtype=np.int32),
+			'parents': 		np.frombuffer(bytes(parents), dtype='S32'),
+			'num_children': np.frombuffer(num_children, dtype=np.int32),
+			'children': 	np.frombuffer(bytes(children), dtype='S32'),
+		}
+
+	def _load_compact_blocks_by_bulk_scan(self, after_pruning_point):
+		all_blocks = CompactBlocks.from_relations(self.block_index, **self.scan_block_relation_columns())
+		if after_pruning_point:
+			pp = self.pruning_point()
+			print('Pruning point: ', pp.hex())
+			roots = [pp]
+		else:
+			roots, hst = self.tips()
+			print('Number of DAG tips: ', len(roots))
+			print('Headers selected tip: ', hst.hex())
+		root_ids = all_blocks.index.ids(roots)
+		loaded_ids, missing_headers = all_blocks.bfs(root_ids, use_children=after_pruning_point)
+		missing_headers += int(np.count_nonzero(root_ids < 0))
+		self.blocks = all_blocks.take(loaded_ids)
+		print('Overall number of headers: ', len(loaded_ids) + missing_headers)
+		if missing_headers > 0:
+			print('Number of missing headers: ', missing_headers)
+
+	def _load_blocks_by_bulk_scan(self, after_pruning_point):
+		all_blocks = self.scan_block_relations()
 		if after_pruning_point:
-			self._load_blocks_from_pruning_point_up()
+			pp = self.pruning_point()
+			print('Pruning point: ', pp.hex())
+			roots = [pp]
 		else:
-			self._load_blocks_from_tips_down()
+			roots, hst = self.tips()
+			print('Number of DAG tips: ', len(roots))
+			print('Headers selected tip: ', hst.hex())
+		# Restrict to the reachable set, visiting blocks in the same order as the BFS loaders
+		q = deque(roots)
+		s = set(roots)
+		missing_headers = 0
+		while len(q) > 0:
+			block_hash = q.popleft()
+			current = all_blocks.get(block_hash)
+			if current is None:
+				missing_headers += 1
+				continue
+			self.blocks[block_hash] = current
+			for neighbour in (current.children if after_pruning_point else current.parents):
+				if neighbour not in s:
+					s.add(neighbour)
+					q.append(neighbour)
+		print('Overall number of headers: ', len(s))
+		if missing_headers > 0:
+			print('Number of missing headers: ', missing_headers)
 
 	def _load_blocks_from_tips_down(self):
 		tips, hst = self.tips()
@@ -558,70 +3448,41 @@ class Store:
 
 	def traverse_loaded_blocks(self):
 		pp = self.pruning_point()
-		q = deque()
-		s = set()
-		q.append((pp, self.get_header_data(pp).daaScore))
-		s.add(pp)
-		while len(q) > 0:
-			block_hash, _ = q.popleft()
-			current = self.get_block(block_hash)
-			yield block_hash, current
-			children = current.children
-			for child in children:
-				if child not in s:
-					daa_score = self.get_header_data(child).daaScore
-					s.add(child)
-					index = bisect(q, daa_score)
-					q.insert(index, (child, daa_score))
+		return self._traverse_by_priority(
+			[pp], lambda block_hash: self.get_header_data(block_hash).daaScore, lambda current: current.children)
 
 	def traverse_from_tips(self):
 		tips, hst = self.tips()
-		q = deque()
-		for tip in tips:
-			q.append((tip, -self.get_header_data(tip).blueWork))
-		s = set(tips)
-		while len(q) > 0:
-			block_hash, _ = q.popleft()
-			current = self.get_block(block_hash)
-			yield block_hash, current
-			for parent in current.parents:
-				if parent not in s:
-					blue_work = self.get_header_data(parent).blueWork
-					s.add(parent)
-					index = bisect(q, -blue_work)
-					q.insert(index, (parent, -blue_work))
+		return self._traverse_by_priority(
+			tips, lambda block_hash: -self.get_header_data(block_hash).blueWork, lambda current: current.parents)
 
 	def load_recent_blocks(self, max_time_back=3600*1000):
 		tips, hst = self.tips()
 		hst_timestamp = self.get_header_data(hst).timeInMilliseconds
-		q = deque()
-		for tip in tips:
-			timestamp = self.get_header_data(tip).timeInMilliseconds
-			index = bisect(q, -timestamp)
-			q.insert(index, (tip, -timestamp))
-		s = set(tips)
+		loaded = 0
+		for _ in self._traverse_by_priority(
+				tips, lambda block_hash: -self.get_header_data(block_hash).timeInMilliseconds,
+				lambda current: current.parents, max_score=max_time_back - hst_timestamp):
+			loaded += 1
+			if loaded % self.print_freq == 0:
+				print('Loaded {} blocks'.format(loaded))
+
+	def _traverse_by_priority(self, roots, score, next_blocks, max_score=None):
+		"""
+		Yields (hash, block) pairs in ascending score order (ties broken by hash) using a binary heap,
+		starting at roots and expanding to next_blocks(block) of each visited block. Blocks
+		whose score is above max_score are not queued (roots are always queued).
+		"""
+		q = [(score(root), root) for root in roots]
+		heapq.heapify(q)
+		s = set(roots)
 		while len(q) > 0:
-			block_hash, _ = q.popleft()
+			_, block_hash = heapq.heappop(q)
 			current = self.get_block(block_hash)
-			for parent in current.parents:
-				if parent not in s:
-					timestamp = self.get_header_data(parent).timeInMilliseconds
-					s.add(parent)
-					if timestamp >= hst_timestamp - max_time_back:
-						index = bisect(q, -timestamp)
-						q.insert(index, (parent, -timestamp))
-						if len(s) % self.print_freq == 0:
-							print('Loaded {} blocks'.format(len(s)))
-
-
-def bisect(q, score):
-	# This method is simply a copy of bisect.bisect_right from the python standard
-	lo, hi = 0, len(q)
-	while lo < hi:
-		mid = (lo + hi) // 2
-		if score < q[mid][1]:
-			hi = mid
-		else:
-			lo = mid + 1
-	return lo
-
+			yield block_hash, current
+			for next_hash in next_blocks(current):
+				if next_hash not in s:
+					s.add(next_hash)
+					next_score = score(next_hash)
+					if max_score is None or next_score <= max_score:
+						heapq.heappush(q, (next_score, next_hash))
@@ -0,0 +1,47 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src'))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from store import Store, block_store, sep
+from synthetic_db import SyntheticDAG
+
+
+@pytest.fixture(scope='session')
+def dag():
+    return SyntheticDAG(300)
+
+
+@pytest.fixture(scope='session')
+def db_path(dag, tmp_path_factory):
+    path = str(tmp_path_factory.mktemp('kaspad') / 'datadir')
+    dag.write(path)
+    return path
+
+
+@pytest.fixture
+def store(db_path):
+    s = Store(db_path)
+    yield s
+    s.close()
+
+
+@pytest.fixture
+def counted_reads(store):
+    # Counts point reads of block bodies and scans of the blocks bucket
+    bucket = store.prefix + sep + block_store + sep
+    reads = {'get': 0, 'scan': 0}
+    get, iter_parallel_scan = store._get, store.iter_parallel_scan
+
+    def counting_get(key):
+        reads['get'] += key.startswith(bucket)
+        return get(key)
+
+    def counting_scan(scan_bucket, *args, **kwargs):
+        reads['scan'] += scan_bucket == bucket
+        return iter_parallel_scan(scan_bucket, *args, **kwargs)
+    store._get, store.iter_parallel_scan = counting_get, counting_scan
+    return reads
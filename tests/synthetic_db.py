@@ -0,0 +1,359 @@
+"""
+Builds small synthetic kaspad databases (in the layout read by Store) together with the reference data
+they were generated from, so tests can compare Store results against brute-force answers.
+"""
+import hashlib
+import random
+
+import plyvel
+
+import dbobjects_pb2 as KaspadDB
+
+prefix = b'\x01'
+sep = b'/'
+level = b'\x00'
+
+coinbase_subnetwork_id = b'\x01' + b'\x00' * 19
+difficulty_window_size = 50
+
+
+def block_hash(i, salt=b''):
+    return hashlib.sha256(salt + i.to_bytes(8, 'little')).digest()
+
+
+def script(i, tag=b's'):
+    # A pay-to-pubkey script (OP_DATA_32 <pubkey> OP_CHECKSIG)
+    return bytes([0x20]) + block_hash(i, tag) + bytes([0xac])
+
+
+class SyntheticDAG:
+    """
+    A random DAG of num_blocks blocks, where block i has 1 to 3 parents among the 8 previous blocks. Block 0
+    is the genesis and pruning point, and the selected parent of a block is its parent with the highest blue
+    work. Block attributes are dicts keyed by block number.
+    """
+
+    def __init__(self, num_blocks, seed=1):
+        rnd = random.Random(seed)
+        self.num_blocks = num_blocks
+        self.hashes = [block_hash(i) for i in range(num_blocks)]
+        self.parents = {0: []}
+        self.children = {i: [] for i in range(num_blocks)}
+        self.time = {0: 1000000}
+        self.blue_score = {0: 0}
+        for i in range(1, num_blocks):
+            parents = sorted(set(rnd.randint(max(0, i - 8), i - 1) for _ in range(rnd.randint(1, 3))))
+            self.parents[i] = parents
+            for parent in parents:
+                self.children[parent].append(i)
+            self.time[i] = 1000000 + i * 1000 + rnd.randint(-300, 300)
+            self.blue_score[i] = max(self.blue_score[parent] for parent in parents) + 1
+        # Blue work beyond 64 bits, distinct per block
+        self.blue_work = {i: (self.blue_score[i] << 70) + i for i in range(num_blocks)}
+        self.bits = {i: rnd.choice([0x1e7fffff, 0x1d00ffff, 0x1c0fffff]) for i in range(num_blocks)}
+        self.selected_parent = {i: max(self.parents[i], key=lambda p: self.blue_work[p])
+                                for i in range(1, num_blocks)}
+        self.tips = [i for i in range(num_blocks) if not self.children[i]]
+        self.headers_selected_tip = max(self.tips, key=lambda t: self.blue_work[t])
+        chain = [self.headers_selected_tip]
+        while chain[-1] != 0:
+            chain.append(self.selected_parent[chain[-1]])
+        self.chain = chain[::-1]
+        self.past = {}
+        for i in range(num_blocks):
+            past = set()
+            for parent in self.parents[i]:
+                past |= self.past[parent]
+                past.add(parent)
+            self.past[i] = frozenset(past)
+        # Every block adds its mergeset (its past without the past of its selected parent) to the DAA window
+        self.daa_added = {0: []}
+        self.daa_score = {0: 0}
+        for i in range(1, num_blocks):
+            sp = self.selected_parent[i]
+            self.daa_added[i] = sorted(self.past[i] - self.past[sp])
+            self.daa_score[i] = self.daa_score[sp] + len(self.daa_added[i])
+        self.transactions = {i: self._transactions(i, random.Random(seed * 1000003 + i)) for i in range(num_blocks)}
+        self.utxo_set = self._utxo_set(random.Random(seed * 7919))
+        self.utxo_diffs = self._utxo_diffs(random.Random(seed * 104729))
+        self.acceptance_data = self._acceptance_data(random.Random(seed * 15485863))
+
+    def _transactions(self, i, rnd):
+        coinbase = KaspadDB.DbTransaction()
+        pubkey_script = script(i % 37)
+        coinbase.payload = self.blue_score[i].to_bytes(8, 'little') + (500).to_bytes(8, 'little') + \
+            (0).to_bytes(2, 'little') + bytes([len(pubkey_script)]) + pubkey_script + \
+            b'0.11.7/miner-' + str(i % 3).encode()
+        coinbase.subnetworkID.subnetworkId = coinbase_subnetwork_id
+        output = coinbase.outputs.add()
+        output.value = 500
+        output.scriptPublicKey.script = pubkey_script
+        transactions = [coinbase]
+        for _ in range(rnd.randint(0, 3)):
+            tx = KaspadDB.DbTransaction()
+            tx.version = 0
+            for j in range(rnd.randint(1, 3)):
+                tx_input = tx.inputs.add()
+                tx_input.previousOutpoint.transactionID.transactionId = block_hash(rnd.getrandbits(32), b'tx')
+                tx_input.previousOutpoint.index = j
+                tx_input.signatureScript = rnd.randbytes(rnd.randint(0, 70))
+                tx_input.sequence = rnd.getrandbits(64)
+                tx_input.sigOpCount = rnd.randint(0, 3)
+            for _ in range(rnd.randint(1, 3)):
+                output = tx.outputs.add()
+                output.value = rnd.randint(1, 10**12)
+                output.scriptPublicKey.script = script(rnd.randrange(11)) if rnd.random() < 0.8 else \
+                    rnd.randbytes(rnd.randint(1, 80))
+            tx.lockTime = rnd.choice([0, rnd.getrandbits(64)])
+            tx.subnetworkID.subnetworkId = b'\x00' * 20
+            tx.payload = rnd.randbytes(rnd.choice([0, 0, 12]))
+            transactions.append(tx)
+        return transactions
+
+    def _utxo_set(self, rnd, num_transactions=600):
+        # Virtual UTXO set: (transaction ID, index) -> (amount, script, block DAA score, is coinbase). Scripts
+        # repeat across entries and have several lengths
+        utxo_set = {}
+        for k in range(num_transactions):
+            transaction_id = block_hash(k, b'utxo')
+            is_coinbase = rnd.random() < 0.2
+            daa_score = rnd.randrange(self.daa_score[self.num_blocks - 1] + 1)
+            for index in rnd.sample(range(5), rnd.randint(1, 3)):
+                kind = rnd.random()
+                if kind < 0.6:
+                    pubkey_script = script(rnd.randrange(23))
+                elif kind < 0.8:
+                    # Pay-to-script-hash (OP_BLAKE2B OP_DATA_32 <hash> OP_EQUAL)
+                    pubkey_script = bytes([0xaa, 0x20]) + block_hash(rnd.randrange(7), b'p2sh') + bytes([0x87])
+                elif kind < 0.9:
+                    pubkey_script = rnd.randbytes(rnd.randint(0, 40))
+                else:
+                    # Empty scripts, and scripts which only differ by trailing zero bytes
+                    pubkey_script = rnd.choice([b'', b'\x51', b'\x51\x00', b'\x51\x00\x00'])
+                utxo_set[transaction_id, index] = (rnd.randint(1, 10**12), pubkey_script, daa_score, is_coinbase)
+        return utxo_set
+
+    def _utxo_diffs(self, rnd, pool_size=40):
+        # Per block (to_add, to_remove) dicts of outpoint -> entry, drawn from a small pool of virtual and new
+        # outpoints, so outpoints are re-added and removed again along diff chains, and some diffs both add
+        # and remove an outpoint
+        pool = sorted(self.utxo_set, key=self.outpoint_key)[:pool_size] + \
+            [(block_hash(k, b'diff'), k % 3) for k in range(pool_size)]
+        diffs = {}
+        for i in range(self.num_blocks):
+            to_add, to_remove = {}, {}
+            for outpoint in rnd.sample(pool, rnd.randint(0, 4)):
+                to_remove[outpoint] = self.utxo_set.get(outpoint, (1, b'', 0, False))
+            for outpoint in rnd.sample(pool, rnd.randint(0, 4)):
+                to_add[outpoint] = (rnd.randint(1, 10**12), script(rnd.randrange(23), b'd'), self.daa_score[i], False)
+            diffs[i] = (to_add, to_remove)
+        return diffs
+
+    def _acceptance_data(self, rnd, num_shared=15):
+        # Acceptance data of the chain blocks (and of a few blocks off the chain): block -> list of (merged
+        # block, [(transaction, fee, is accepted)]) over its mergeset. Shared transactions are merged several
+        # times, possibly by several chain blocks, and are only accepted at some of their inclusions
+        shared = []
+        for k in range(num_shared):
+            tx = KaspadDB.DbTransaction()
+            tx.subnetworkID.subnetworkId = b'\x00' * 20
+            tx.payload = block_hash(k, b'shared')
+            shared.append(tx)
+        acceptance_data = {}
+        for i in self.chain[1:] + [i for i in range(1, self.num_blocks) if i not in self.chain][:3]:
+            merged = []
+            for b in self.daa_added[i]:
+                transactions = list(self.transactions[b])
+                if rnd.random() < 0.4:
+                    transactions.append(rnd.choice(shared))
+                merged.append((b, [(tx, rnd.randint(0, 10**6), rnd.random() < 0.7) for tx in transactions]))
+            if i not in self.chain:
+                # A transaction only merged off the chain
+                tx = KaspadDB.DbTransaction()
+                tx.subnetworkID.subnetworkId = b'\x00' * 20
+                tx.payload = block_hash(i, b'off-chain')
+                merged[0][1].append((tx, 1, True))
+            acceptance_data[i] = merged
+        return acceptance_data
+
+    @staticmethod
+    def outpoint_key(outpoint):
+        db_outpoint = KaspadDB.DbOutpoint()
+        db_outpoint.transactionID.transactionId = outpoint[0]
+        db_outpoint.index = outpoint[1]
+        return db_outpoint.SerializeToString()
+
+    @staticmethod
+    def utxo_entry(entry):
+        amount, pubkey_script, daa_score, is_coinbase = entry
+        db_entry = KaspadDB.DbUtxoEntry()
+        db_entry.amount = amount
+        db_entry.scriptPublicKey.script = pubkey_script
+        db_entry.blockDaaScore = daa_score
+        db_entry.isCoinbase = is_coinbase
+        return db_entry
+
+    def header(self, i):
+        header = KaspadDB.DbBlockHeader()
+        header.hashMerkleRoot.hash = block_hash(i, b'm')
+        header.acceptedIDMerkleRoot.hash = block_hash(i, b'a')
+        header.utxoCommitment.hash = block_hash(i, b'u')
+        header.pruningPoint.hash = self.hashes[0]
+        header.timeInMilliseconds = self.time[i]
+        header.bits = self.bits[i]
+        header.nonce = i
+        header.daaScore = self.daa_score[i]
+        header.blueWork = self.blue_work[i].to_bytes(16, 'big')
+        header.blueScore = self.blue_score[i]
+        return header
+
+    def difficulty_window(self, i, window_size=difficulty_window_size):
+        # The window_size blocks of the past of i with the highest blue work (ignoring the DAA added sets)
+        return sorted(self.past[i], key=lambda b: -self.blue_work[b])[:window_size]
+
+    def write(self, path, missing_headers=()):
+        """
+        Writes the DAG as a kaspad database at path, leaving out the headers of the blocks in missing_headers
+        """
+        db = plyvel.DB(path, create_if_missing=True)
+        db.put(b'active-prefix', prefix)
+        batch = db.write_batch()
+        for i, h in enumerate(self.hashes):
+            relations = KaspadDB.DbBlockRelations()
+            for parent in self.parents[i]:
+                relations.parents.add().hash = self.hashes[parent]
+            for child in self.children[i]:
+                relations.children.add().hash = self.hashes[child]
+            batch.put(prefix + sep + level + sep + b'block-relations' + sep + h, relations.SerializeToString())
+
+            header = self.header(i)
+            if i not in missing_headers:
+                batch.put(prefix + sep + b'block-headers' + sep + h, header.SerializeToString())
+            block = KaspadDB.DbBlock()
+            block.header.CopyFrom(header)
+            block.transactions.extend(self.transactions[i])
+            batch.put(prefix + sep + b'blocks' + sep + h, block.SerializeToString())
+
+            ghostdag_data = KaspadDB.DbBlockGhostdagData()
+            ghostdag_data.blueScore = self.blue_score[i]
+            ghostdag_data.blueWork = self.blue_work[i].to_bytes(16, 'big')
+            if i > 0:
+                ghostdag_data.selectedParent.hash = self.hashes[self.selected_parent[i]]
+                for parent in self.parents[i]:
+                    # Parents other than the selected one are red every third block
+                    mergeset = ghostdag_data.mergeSetReds if parent != self.selected_parent[i] and i % 3 == 0 \
+                        else ghostdag_data.mergeSetBlues
+                    mergeset.add().hash = self.hashes[parent]
+            else:
+                ghostdag_data.selectedParent.hash = bytes(32)
+            batch.put(prefix + sep + level + sep + b'block-ghostdag-data' + sep + h, ghostdag_data.SerializeToString())
+
+            batch.put(prefix + sep + b'daa-score' + sep + h, self.daa_score[i].to_bytes(8, 'little'))
+            batch.put(prefix + sep + b'daa-added-blocks' + sep + h, len(self.daa_added[i]).to_bytes(8, 'little') +
+                      b''.join(self.hashes[b] for b in self.daa_added[i]))
+
+        for index, i in enumerate(self.chain):
+            batch.put(prefix + sep + b'chain-block-hash-by-index' + sep + index.to_bytes(8, 'big'), self.hashes[i])
+            batch.put(prefix + sep + b'chain-block-index-by-hash' + sep + self.hashes[i], index.to_bytes(8, 'little'))
+        batch.put(prefix + sep + b'highest-chain-block-index', (len(self.chain) - 1).to_bytes(8, 'little'))
+        block_count = KaspadDB.DbBlockCount()
+        block_count.count = self.num_blocks
+        batch.put(prefix + sep + b'blocks-count', block_count.SerializeToString())
+        tips = KaspadDB.DbTips()
+        for tip in self.tips:
+            tips.tips.add().hash = self.hashes[tip]
+        batch.put(prefix + sep + b'tips', tips.SerializeToString())
+        headers_selected_tip = KaspadDB.DbHash()
+        headers_selected_tip.hash = self.hashes[self.headers_selected_tip]
+        batch.put(prefix + sep + b'headers-selected-tip', headers_selected_tip.SerializeToString())
+        batch.put(prefix + sep + b'pruning-block-index', (0).to_bytes(8, 'little'))
+        pruning_point = KaspadDB.DbHash()
+        pruning_point.hash = self.hashes[0]
+        batch.put(prefix + sep + b'pruning-point-by-index' + sep + (0).to_bytes(8, 'big'),
+                  pruning_point.SerializeToString())
+
+        for outpoint, entry in self.utxo_set.items():
+            batch.put(prefix + sep + b'virtual-utxo-set' + sep + self.outpoint_key(outpoint),
+                      self.utxo_entry(entry).SerializeToString())
+        self._write_utxo_diff_children(batch)
+        self._write_utxo_diffs(batch)
+        self._write_acceptance_data(batch)
+        self._write_reachability(batch)
+        batch.write()
+        db.close()
+
+    def utxo_diff_child(self, i):
+        # Chain blocks point up the chain, other blocks to their child with the highest blue work
+        if i in self.chain:
+            position = self.chain.index(i)
+            return self.chain[position + 1] if position + 1 < len(self.chain) else None
+        if self.children[i]:
+            return max(self.children[i], key=lambda c: self.blue_work[c])
+        return None
+
+    def _write_utxo_diff_children(self, batch):
+        for i in range(self.num_blocks):
+            child = self.utxo_diff_child(i)
+            if child is not None:
+                child_hash = KaspadDB.DbHash()
+                child_hash.hash = self.hashes[child]
+                batch.put(prefix + sep + b'utxo-diff-children' + sep + self.hashes[i], child_hash.SerializeToString())
+
+    def _write_utxo_diffs(self, batch):
+        for i, (to_add, to_remove) in self.utxo_diffs.items():
+            diff = KaspadDB.DbUtxoDiff()
+            for items, entries in ((diff.toAdd, to_add), (diff.toRemove, to_remove)):
+                for outpoint, entry in entries.items():
+                    item = items.add()
+                    item.outpoint.ParseFromString(self.outpoint_key(outpoint))
+                    item.utxoEntry.CopyFrom(self.utxo_entry(entry))
+            batch.put(prefix + sep + b'utxo-diffs' + sep + self.hashes[i], diff.SerializeToString())
+
+    def _write_acceptance_data(self, batch):
+        for i, merged in self.acceptance_data.items():
+            acceptance_data = KaspadDB.DbAcceptanceData()
+            for b, transactions in merged:
+                block_acceptance = acceptance_data.blockAcceptanceData.add()
+                block_acceptance.blockHash.hash = self.hashes[b]
+                for tx, fee, is_accepted in transactions:
+                    tx_acceptance = block_acceptance.transactionAcceptanceData.add()
+                    tx_acceptance.transaction.CopyFrom(tx)
+                    tx_acceptance.fee = fee
+                    tx_acceptance.isAccepted = is_accepted
+            batch.put(prefix + sep + b'acceptance-data' + sep + self.hashes[i], acceptance_data.SerializeToString())
+
+    def _write_reachability(self, batch):
+        # Nested intervals over the selected parent tree, and the future covering sets (the future blocks
+        # whose selected parent is outside the future)
+        tree = {i: [] for i in range(self.num_blocks)}
+        for i in range(1, self.num_blocks):
+            tree[self.selected_parent[i]].append(i)
+        start, end = {}, {}
+        stack = [(0, 1, 0)]
+        while stack:
+            node, node_start, k = stack.pop()
+            if k == 0:
+                start[node] = node_start
+            if k < len(tree[node]):
+                child_start = start[node] + 1 if k == 0 else end[tree[node][k - 1]] + 1
+                stack.append((node, node_start, k + 1))
+                stack.append((tree[node][k], child_start, 0))
+            else:
+                end[node] = end[tree[node][-1]] if tree[node] else start[node]
+        future = {i: set() for i in range(self.num_blocks)}
+        for i in range(self.num_blocks):
+            for b in self.past[i]:
+                future[b].add(i)
+        for i in range(self.num_blocks):
+            covering = sorted((c for c in future[i] if self.selected_parent[c] != i and
+                               self.selected_parent[c] not in future[i]), key=lambda c: start[c])
+            data = KaspadDB.DbReachabilityData()
+            for child in tree[i]:
+                data.children.add().hash = self.hashes[child]
+            if i > 0:
+                data.parent.hash = self.hashes[self.selected_parent[i]]
+            data.interval.start = start[i]
+            data.interval.end = end[i]
+            for c in covering:
+                data.futureCoveringSet.add().hash = self.hashes[c]
+            batch.put(prefix + sep + level + sep + b'reachability-data' + sep + self.hashes[i], data.SerializeToString())
@@ -0,0 +1,81 @@
+import numpy as np
+import pytest
+
+from store import hash_list, transaction_id
+
+
+def reference_acceptance(dag):
+    # For each txid, the (chain position, fee, is accepted) of its earliest accepted inclusion along the chain,
+    # or of its earliest inclusion if it was never accepted. Also the accepted transactions of each chain block
+    # and the number of accepted inclusions of each (chain position, merged block)
+    inclusions, num_accepted = {}, {}
+    for position, i in enumerate(dag.chain):
+        for b, transactions in dag.acceptance_data.get(i, []):
+            num_accepted[position, dag.hashes[b]] = sum(is_accepted for _, _, is_accepted in transactions)
+            for tx, fee, is_accepted in transactions:
+                inclusions.setdefault(transaction_id(tx), []).append((position, fee, is_accepted))
+    transactions = {}
+    for tx_id, rows in inclusions.items():
+        accepted = [row for row in rows if row[2]]
+        transactions[tx_id] = accepted[0] if accepted else rows[0]
+    counts = np.zeros(len(dag.chain), dtype=np.int64)
+    for position, _, is_accepted in transactions.values():
+        counts[position] += is_accepted
+    return transactions, counts, num_accepted
+
+
+@pytest.mark.parametrize('workers', [1, 2])
+def test_acceptance_index(store, dag, workers):
+    transactions, counts, num_accepted = reference_acceptance(dag)
+    index = store.load_acceptance_index(workers=workers)
+    assert hash_list(index.chain) == [dag.hashes[i] for i in dag.chain]
+    tx_ids = sorted(transactions)
+    assert hash_list(index.transaction_ids) == tx_ids
+    rows = index.positions(tx_ids)
+    assert index.chain_position[rows].tolist() == [transactions[tx_id][0] for tx_id in tx_ids]
+    assert index.fee[rows].tolist() == [transactions[tx_id][1] for tx_id in tx_ids]
+    assert index.is_accepted[rows].tolist() == [transactions[tx_id][2] for tx_id in tx_ids]
+    assert index.accepting_chain_blocks(tx_ids) == [dag.hashes[dag.chain[transactions[tx_id][0]]]
+                                                    if transactions[tx_id][2] else None for tx_id in tx_ids]
+    assert index.accepted_counts().tolist() == counts.tolist()
+    assert dict(zip(zip(index.merged_chain_position.tolist(), hash_list(index.merged_blocks)),
+                    index.num_accepted.tolist())) == num_accepted
+    assert index.is_block_accepted.tolist() == (index.num_accepted > 0).tolist()
+
+
+def test_earliest_accepting_block(store, dag):
+    # Transactions accepted by several chain blocks count once, at their earliest accepting chain block
+    index = store.load_acceptance_index(workers=1)
+    accepting = {}
+    for position, i in enumerate(dag.chain):
+        for _, transactions in dag.acceptance_data.get(i, []):
+            for tx, _, is_accepted in transactions:
+                if is_accepted:
+                    accepting.setdefault(transaction_id(tx), []).append(position)
+    repeated = {tx_id: positions for tx_id, positions in accepting.items() if len(set(positions)) > 1}
+    assert len(repeated) > 0
+    assert index.chain_position[index.positions(sorted(repeated))].tolist() == \
+        [min(repeated[tx_id]) for tx_id in sorted(repeated)]
+    assert int(index.accepted_counts().sum()) == len(accepting)
+    # Acceptance data of blocks off the chain is skipped
+    off_chain = {transaction_id(tx) for i, merged in dag.acceptance_data.items() if i not in dag.chain
+                 for _, transactions in merged for tx, _, _ in transactions} - \
+        {transaction_id(tx) for i in dag.chain for _, transactions in dag.acceptance_data.get(i, [])
+         for tx, _, _ in transactions}
+    assert len(off_chain) > 0
+    assert (index.positions(sorted(off_chain)) == -1).all()
+
+
+@pytest.mark.parametrize('bin_ms', [1000, 5000])
+def test_accepted_tps(store, dag, bin_ms):
+    _, counts, _ = reference_acceptance(dag)
+    index = store.load_acceptance_index(workers=1)
+    starts, tps = store.accepted_tps(index, bin_ms)
+    times = [dag.time[i] for i in dag.chain]
+    expected = {}
+    for time, count in zip(times, counts.tolist()):
+        start = min(times) + (time - min(times)) // bin_ms * bin_ms
+        expected[start] = expected.get(start, 0) + count
+    assert starts.tolist() == list(range(min(times), max(expected) + 1, bin_ms))
+    assert tps.tolist() == [expected.get(start, 0) * 1000 / bin_ms for start in starts.tolist()]
+
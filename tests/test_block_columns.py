@@ -0,0 +1,43 @@
+import dbobjects_pb2 as KaspadDB
+
+fields = ['pubkey_script', 'num_txs']
+
+
+def test_block_count(store, dag):
+    assert store.block_count() == dag.num_blocks
+
+
+def test_few_blocks_are_read_by_key(store, dag, counted_reads):
+    hashes = dag.hashes[5:65:5]
+    expected, _ = store.load_block_columns(hashes, fields, ['daaScore'], workers=1)
+    counted_reads['get'] = 0
+    columns, found = store.load_block_columns(hashes, fields, ['daaScore'], workers=2)
+    assert counted_reads == {'get': len(hashes), 'scan': 0}
+    assert columns == expected
+    assert columns['daaScore'] == [dag.daa_score[i] for i in range(5, 65, 5)]
+    assert found.all()
+
+
+def test_most_blocks_are_scanned(store, dag, counted_reads):
+    hashes = dag.hashes[::-1]
+    expected, _ = store.load_block_columns(hashes, fields, workers=1)
+    counted_reads['get'] = 0
+    columns, found = store.load_block_columns(hashes, fields, workers=2)
+    assert counted_reads == {'get': 0, 'scan': 1}
+    assert columns == expected
+    assert found.all()
+
+
+def test_cached_bodies_hold_no_block(store, dag, counted_reads):
+    store.load_blocks()
+    store.load_data(block_fields=['pubkey_script'], workers=1)
+    assert len(store.bodies) == dag.num_blocks
+    for body in store.bodies.values():
+        assert [name for name, value in vars(body).items() if isinstance(value, bytes)] == ['pubkey_script']
+        assert not any(isinstance(value, KaspadDB.DbBlock) for value in vars(body).values())
+    # Other fields read the block again
+    counted_reads['get'] = 0
+    body = store.get_block_data(dag.hashes[7])
+    assert body.num_txs == len(dag.transactions[7])
+    assert body.pubkey_script == dag.transactions[7][0].outputs[0].scriptPublicKey.script
+    assert counted_reads['get'] == 1
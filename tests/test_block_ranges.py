@@ -0,0 +1,55 @@
+import pytest
+
+from store import BlockRangeIndex, Store
+
+
+def test_blocks_in_range(store, dag):
+    numbers = {h: i for i, h in enumerate(dag.hashes)}
+    for field, values, lo, hi in [('timeInMilliseconds', dag.time, 1050000, 1120000),
+                                  ('daaScore', dag.daa_score, 100, 400), ('blueScore', dag.blue_score, 30, 30)]:
+        ids = store.blocks_in_range(field, lo, hi)
+        blocks = [numbers[h] for h in store.block_range_index.hashes(ids)]
+        assert [values[i] for i in blocks] == sorted(values[i] for i in blocks)
+        assert sorted(blocks) == [i for i in range(dag.num_blocks) if lo <= values[i] <= hi]
+        assert len(blocks) > 0
+    assert len(store.blocks_in_range('daaScore')) == dag.num_blocks
+
+
+@pytest.mark.parametrize('workers', [1, 2])
+def test_range_reads_only_blocks_in_range(store, dag, counted_reads, workers):
+    # As kaspad2graph --range: the bodies of a narrow range are read by key, without scanning the blocks bucket
+    store.load_blocks()
+    ids = store.blocks_in_range('blueScore', 10, 20)
+    block_hashes = store.block_range_index.hashes(ids)
+    counted_reads['get'] = 0
+    frames = store.load_data(header_fields=['blueScore', 'daaScore'], block_fields=['pubkey_script'],
+                             count_fields=[], workers=workers, block_hashes=block_hashes)
+    in_range = [i for i in range(dag.num_blocks) if 10 <= dag.blue_score[i] <= 20]
+    assert counted_reads == {'get': len(in_range), 'scan': 0}
+    assert sorted(frames['hash']) == sorted(dag.hashes[i] for i in in_range)
+    numbers = {h: i for i, h in enumerate(dag.hashes)}
+    assert list(frames['blueScore']) == [dag.blue_score[numbers[h]] for h in frames['hash']]
+    assert list(frames['pubkey_script']) == [dag.transactions[numbers[h]][0].outputs[0].scriptPublicKey.script
+                                             for h in frames['hash']]
+
+
+def test_saved_block_range_index(db_path, dag, tmp_path):
+    cache_dir = str(tmp_path / 'cache')
+    s = Store(db_path, cache_dir=cache_dir)
+    try:
+        built = s.load_block_range_index()
+        ids = s.blocks_in_range('blueScore', 10, 20)
+        expected = s.block_range_index.hashes(ids)
+    finally:
+        s.close()
+    s = Store(db_path, cache_dir=cache_dir)
+    try:
+        loaded = s.load_block_range_index()
+        # Loaded memory-mapped, without reading the headers
+        assert s.header_table is None
+        assert len(loaded) == len(built) == dag.num_blocks
+        ids = s.blocks_in_range('blueScore', 10, 20)
+        assert s.block_range_index.hashes(ids) == expected
+    finally:
+        s.close()
+    assert BlockRangeIndex.load(str(tmp_path / 'missing')) is None
@@ -0,0 +1,41 @@
+from store import HeaderData, pow_max
+from synthetic_db import difficulty_window_size
+
+target_time = 1000
+
+
+def reference_bits(dag, window):
+    # kaspad's integer difficulty adjustment: the average target without the earliest block (the first one
+    # in window order on ties), scaled by the window timespan over the expected one
+    times = [dag.time[b] for b in window]
+    earliest = times.index(min(times))
+    targets = [HeaderData.compact_to_big(dag.bits[b]) for k, b in enumerate(window) if k != earliest]
+    target = sum(targets) // len(targets)
+    target = target * (max(times) - min(times)) // target_time // len(targets)
+    return HeaderData.big_to_compact(min(target, pow_max))
+
+
+def test_difficulty_windows(store, dag):
+    for i in range(0, dag.num_blocks, 7):
+        window = store.get_difficulty_window(dag.hashes[i], window_size=difficulty_window_size)
+        assert window == [dag.hashes[b] for b in dag.difficulty_window(i)]
+
+
+def test_recompute_difficulty(store, dag):
+    result = store.recompute_difficulty(window_size=difficulty_window_size, target_time=target_time)
+    numbers = {h: i for i, h in enumerate(dag.hashes)}
+    blocks = [numbers[h] for h in result['hash'].tolist()]
+    assert sorted(blocks) == list(range(dag.num_blocks))
+    assert result['bits'].tolist() == [dag.bits[i] for i in blocks]
+    assert result['full_window'].tolist() == [len(dag.past[i]) >= difficulty_window_size for i in blocks]
+    num_exact = 0
+    for i, full, bits in zip(blocks, result['full_window'].tolist(), result['expected_bits'].tolist()):
+        if not full:
+            assert bits == 0
+            continue
+        expected = reference_bits(dag, dag.difficulty_window(i))
+        # Computed in float64, so one mantissa unit off at most
+        target, expected_target = HeaderData.compact_to_big(bits), HeaderData.compact_to_big(expected)
+        assert abs(target - expected_target) <= max(target, expected_target) >> 15
+        num_exact += bits == expected
+    assert num_exact > sum(result['full_window']) // 2
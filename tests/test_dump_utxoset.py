@@ -0,0 +1,80 @@
+import io
+import json
+
+import pytest
+
+import dump_utxoset
+from dump_utxoset import iter_utxo_dump, write_arrow, write_binary, write_json, write_parquet
+
+
+def rows(batches):
+    return [row for batch in batches for row in zip(
+        batch.transaction_ids(), batch['index'].tolist(), batch['amount'].tolist(), batch.scripts(),
+        batch['blockDaaScore'].tolist(), batch['isCoinbase'].tolist())]
+
+
+def check_round_trip(store, path):
+    dumped = list(iter_utxo_dump(path))
+    assert rows(dumped) == rows(store.iter_virtual_utxoset())
+    return dumped
+
+
+def test_json_matches_json_dump(store):
+    # The list json.dump wrote before the output was streamed
+    entries = [{
+        'txId': key.transactionId.hex(),
+        'index': key.index,
+        'amount': entry.amount,
+        'pubkeyScript': entry.pubkey_script.hex(),
+        'blockDaaScore': entry.blockDaaScore,
+        'isCoinbase': entry.isCoinbase
+    } for key, entry in store.get_virtual_utxoset()]
+    expected = io.StringIO()
+    json.dump(entries, expected)
+    streamed = io.StringIO()
+    write_json(store.iter_virtual_utxoset(batch_size=100), streamed)
+    assert streamed.getvalue() == expected.getvalue()
+    empty = io.StringIO()
+    write_json([], empty)
+    assert empty.getvalue() == '[]'
+
+
+def test_binary(store, tmp_path):
+    path = str(tmp_path / 'utxoset.bin')
+    with open(path, 'wb') as f:
+        write_binary(store.iter_virtual_utxoset(batch_size=100), f)
+    # One row group per batch, memory-mapped
+    dumped = check_round_trip(store, path)
+    expected = store.iter_virtual_utxoset(batch_size=100)
+    assert [batch.num_rows for batch in dumped] == [batch.num_rows for batch in expected]
+
+
+def test_binary_zstd(store, tmp_path):
+    zstandard = pytest.importorskip('zstandard')
+    path = str(tmp_path / 'utxoset.bin')
+    with open(path, 'wb') as f:
+        write_binary(store.iter_virtual_utxoset(batch_size=100), f, 'zstd')
+    check_round_trip(store, path)
+    # Row group headers hold the unpadded size of the compressed payload, whose padding follows
+    with open(path, 'rb') as f:
+        data = f.read()
+    position = dump_utxoset.binary_header.size
+    while position < len(data):
+        num_rows, payload_size, raw_size = dump_utxoset.row_group_header.unpack_from(data, position)
+        position += dump_utxoset.row_group_header.size
+        decompressor = zstandard.ZstdDecompressor().decompressobj()
+        assert len(decompressor.decompress(data[position:position + payload_size])) == raw_size
+        assert decompressor.eof and decompressor.unused_data == b''
+        position += payload_size
+        assert data[position:position + dump_utxoset._pad8(payload_size)] == bytes(dump_utxoset._pad8(payload_size))
+        position += dump_utxoset._pad8(payload_size)
+        assert position % 8 == dump_utxoset.binary_header.size % 8
+
+
+@pytest.mark.parametrize('compression', ['none', 'zstd'])
+@pytest.mark.parametrize('extension, write', [('arrow', write_arrow), ('parquet', write_parquet)])
+def test_arrow_and_parquet(store, tmp_path, extension, write, compression):
+    pytest.importorskip('pyarrow')
+    path = str(tmp_path / ('utxoset.' + extension))
+    write(store.iter_virtual_utxoset(batch_size=100), path, compression)
+    check_round_trip(store, path)
@@ -0,0 +1,48 @@
+import numpy as np
+
+header_fields = ['timeInMilliseconds', 'daaScore', 'blueScore', 'bits', 'blueWork', 'difficulty']
+
+
+def test_header_table_columns(store, dag):
+    store.load_header_table()
+    table = store.header_table
+    blocks = sorted(range(dag.num_blocks), key=lambda i: dag.hashes[i])
+    positions = table.positions(np.array([dag.hashes[i] for i in blocks], dtype='S32'))
+    assert len(table) == dag.num_blocks
+    assert table.column('hash', positions) == [dag.hashes[i] for i in blocks]
+    for field, values in [('timeInMilliseconds', dag.time), ('daaScore', dag.daa_score),
+                          ('blueScore', dag.blue_score), ('bits', dag.bits), ('blueWork', dag.blue_work)]:
+        assert [int(v) for v in table.column(field, positions)] == [values[i] for i in blocks]
+
+
+def test_load_data_from_header_table(store):
+    store.load_blocks()
+    expected = store.load_data(header_fields=header_fields, block_fields=['pubkey_script'])
+    store.load_header_table()
+    frames = store.load_data(header_fields=header_fields, block_fields=['pubkey_script'])
+
+    def rows(f):
+        return sorted(zip(*(list(f[field]) for field in ['hash'] + header_fields + ['pubkey_script'])))
+    assert rows(frames) == rows(expected)
+    assert len(rows(frames)) == len(store.blocks)
+
+
+def test_blue_work_is_exact(store, dag):
+    # Blue work beyond 2^53 differs by one between blocks, which float64 cannot tell apart
+    store.load_header_table()
+    blocks = list(range(dag.num_blocks))[::-1]
+    positions = store.header_table.positions(np.array([dag.hashes[i] for i in blocks], dtype='S32'))
+    blue_work = store.header_table.column('blueWork', positions)
+    assert blue_work == [dag.blue_work[i] for i in blocks]
+    assert all(type(value) is int for value in blue_work)
+    values = store.header_values(np.array([dag.hashes[i] for i in blocks], dtype='S32'), 'blueWork')
+    assert list(values) == [dag.blue_work[i] for i in blocks]
+
+
+def test_load_data_keeps_requested_order(store, dag):
+    store.load_header_table()
+    blocks = list(range(0, dag.num_blocks, 3))[::-1]
+    frames = store.load_data(header_fields=['daaScore', 'blueWork'], block_hashes=[dag.hashes[i] for i in blocks])
+    assert list(frames['hash']) == [dag.hashes[i] for i in blocks]
+    assert list(frames['daaScore']) == [dag.daa_score[i] for i in blocks]
+    assert list(frames['blueWork']) == [dag.blue_work[i] for i in blocks]
@@ -0,0 +1,36 @@
+import numpy as np
+
+from synthetic_db import block_hash
+
+
+def selected_chain(dag, i):
+    chain = {i}
+    while i != 0:
+        i = dag.selected_parent[i]
+        chain.add(i)
+    return chain
+
+
+def test_ancestry_all_pairs(store, dag):
+    reachability = store.load_reachability()
+    n = dag.num_blocks
+    a, b = np.repeat(np.arange(n), n), np.tile(np.arange(n), n)
+    hashes = np.array(dag.hashes, dtype='S32')
+    dag_ancestor = reachability.is_dag_ancestor_of(hashes[a], hashes[b])
+    chain_ancestor = reachability.is_chain_ancestor_of(hashes[a], hashes[b])
+    chains = [selected_chain(dag, j) for j in range(n)]
+    expected_dag = [i == j or i in dag.past[j] for i, j in zip(a.tolist(), b.tolist())]
+    expected_chain = [i in chains[j] for i, j in zip(a.tolist(), b.tolist())]
+    assert dag_ancestor.tolist() == expected_dag
+    assert chain_ancestor.tolist() == expected_chain
+    # The DAG relation is not only the chain relation
+    assert np.sum(dag_ancestor) > np.sum(chain_ancestor)
+
+
+def test_store_ancestry(store, dag):
+    for i, j in [(0, dag.num_blocks - 1), (5, 6), (dag.chain[3], dag.chain[-1]), (dag.tips[0], 0)]:
+        assert store.is_dag_ancestor_of(dag.hashes[i], dag.hashes[j]) == (i == j or i in dag.past[j])
+        assert store.is_chain_ancestor_of(dag.hashes[i], dag.hashes[j]) == (i in selected_chain(dag, j))
+    unknown = block_hash(0, b'unknown')
+    assert not store.is_dag_ancestor_of(unknown, dag.hashes[-1])
+    assert not store.is_chain_ancestor_of(dag.hashes[0], unknown)
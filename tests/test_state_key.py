@@ -0,0 +1,50 @@
+from store import Store
+from synthetic_db import SyntheticDAG
+
+
+def count_tips_reads(store):
+    reads = [0]
+    tips = store.tips
+
+    def counting_tips():
+        reads[0] += 1
+        return tips()
+    store.tips = counting_tips
+    return reads
+
+
+def test_queries_reuse_the_state_key(store, dag):
+    store.load_reachability()
+    store.load_block_range_index()
+    reads = count_tips_reads(store)
+    for i in range(1, 50):
+        assert store.is_dag_ancestor_of(dag.hashes[0], dag.hashes[i])
+        assert store.is_chain_ancestor_of(dag.hashes[0], dag.hashes[i])
+        store.blocks_in_range('daaScore', i, i + 10)
+    assert reads[0] == 0
+
+
+def test_pinned_snapshot_renews_the_state_key(store, dag):
+    reachability = store.load_reachability()
+    reads = count_tips_reads(store)
+    store.pin_snapshot()
+    assert store.is_dag_ancestor_of(dag.hashes[0], dag.hashes[-1])
+    assert store.is_dag_ancestor_of(dag.hashes[1], dag.hashes[-1]) == (1 in dag.past[dag.num_blocks - 1])
+    # Recomputed once, and the index is kept since the state did not change
+    assert reads[0] == 1
+    assert store.reachability is reachability
+
+
+def test_refresh_reloads_indexes(db_path, dag, tmp_path):
+    newer = SyntheticDAG(dag.num_blocks + 20)
+    newer_path = str(tmp_path / 'datadir')
+    newer.write(newer_path)
+    s = Store(db_path)
+    try:
+        reachability = s.load_reachability()
+        s.refresh(db_path=newer_path)
+        last = newer.num_blocks - 1
+        assert s.is_dag_ancestor_of(newer.hashes[0], newer.hashes[last])
+        assert s.reachability is not reachability
+    finally:
+        s.close()
@@ -0,0 +1,86 @@
+import hashlib
+import struct
+
+import dbobjects_pb2 as KaspadDB
+import kbech32
+from store import transaction_id, transaction_mass
+from synthetic_db import coinbase_subnetwork_id, script
+
+
+def reference_transaction_id(tx):
+    # kaspad's serialization with signature scripts excluded, hashed with the TransactionID key
+    data = struct.pack('<HQ', tx.version, len(tx.inputs))
+    for tx_input in tx.inputs:
+        outpoint = tx_input.previousOutpoint
+        data += outpoint.transactionID.transactionId + struct.pack('<IQBQ', outpoint.index, 0, 0, tx_input.sequence)
+    data += struct.pack('<Q', len(tx.outputs))
+    for tx_output in tx.outputs:
+        script = tx_output.scriptPublicKey.script
+        data += struct.pack('<QHQ', tx_output.value, tx_output.scriptPublicKey.version, len(script)) + script
+    data += struct.pack('<Q', tx.lockTime) + tx.subnetworkID.subnetworkId
+    data += struct.pack('<QQ', tx.gas, len(tx.payload)) + tx.payload
+    return hashlib.blake2b(data, digest_size=32, key=b'TransactionID').digest()
+
+
+def make_transaction(signature_script, sig_op_count, script, payload=b''):
+    tx = KaspadDB.DbTransaction()
+    tx_input = tx.inputs.add()
+    tx_input.previousOutpoint.transactionID.transactionId = bytes(range(32))
+    tx_input.signatureScript = signature_script
+    tx_input.sigOpCount = sig_op_count
+    tx_output = tx.outputs.add()
+    tx_output.value = 1000
+    tx_output.scriptPublicKey.script = script
+    tx.subnetworkID.subnetworkId = bytes(20)
+    tx.payload = payload
+    return tx
+
+
+def test_transaction_mass():
+    tx = make_transaction(bytes(10), 1, bytes(34))
+    # Estimated size: 10 (version, input count) + 62 (input) + 8 (output count) + 52 (output) + 76 (lock time,
+    # subnetwork ID, gas, payload hash and length), 10 per scriptPublicKey byte and 1000 per sigop
+    assert transaction_mass(tx) == 208 + 10 * 36 + 1000
+    tx = make_transaction(bytes(70), 2, bytes(34), payload=bytes(5))
+    assert transaction_mass(tx) == 208 + 60 + 5 + 10 * 36 + 2000
+
+
+def test_coinbase_mass_is_zero(dag):
+    for i in range(10):
+        coinbase = dag.transactions[i][0]
+        assert coinbase.subnetworkID.subnetworkId == coinbase_subnetwork_id
+        assert transaction_mass(coinbase) == 0
+
+
+def test_transaction_ids(dag):
+    for transactions in dag.transactions.values():
+        for tx in transactions:
+            assert transaction_id(tx) == reference_transaction_id(tx)
+
+
+def test_transaction_index(store, dag):
+    index = store.load_transaction_index(workers=1)
+    assert len(index) == sum(len(transactions) for transactions in dag.transactions.values())
+    for i in range(0, dag.num_blocks, 7):
+        for position, tx in enumerate(dag.transactions[i]):
+            found = index.lookup(transaction_id(tx))
+            assert {'block': dag.hashes[i], 'position': position, 'num_inputs': len(tx.inputs),
+                    'num_outputs': len(tx.outputs), 'mass': transaction_mass(tx)} in found
+
+
+def test_script_index(store, dag):
+    index = store.load_script_index(workers=1)
+    outputs = {}
+    for i, transactions in dag.transactions.items():
+        for position, tx in enumerate(transactions):
+            for output_index, tx_output in enumerate(tx.outputs):
+                outputs.setdefault(tx_output.scriptPublicKey.script, []).append(
+                    (dag.hashes[i], position, output_index, tx_output.value))
+    for script_bytes in [script(0), script(5), script(10)] + list(outputs)[::50]:
+        found = index.lookup(script_bytes)
+        assert sorted(zip(found['block'], found['position'].tolist(), found['output_index'].tolist(),
+                          found['amount'].tolist())) == sorted(outputs[script_bytes])
+    by_address = index.lookup_address(kbech32.toAddress(script(5)))
+    assert by_address['block'] == index.lookup(script(5))['block']
+    assert (by_address['amount'] == index.lookup(script(5))['amount']).all()
+    assert len(index.lookup(script(0, b'missing'))['block']) == 0
@@ -0,0 +1,79 @@
+from collections import deque
+
+from store import Store
+
+
+def bisect(q, score):
+    lo, hi = 0, len(q)
+    while lo < hi:
+        mid = (lo + hi) // 2
+        if score < q[mid][1]:
+            hi = mid
+        else:
+            lo = mid + 1
+    return lo
+
+
+def sorted_queue_traversal(store, roots, score, next_blocks, max_score=None):
+    # The sorted-deque traversal the Store used before the binary heap
+    q = deque()
+    for root in roots:
+        q.insert(bisect(q, score(root)), (root, score(root)))
+    s = set(roots)
+    order = []
+    while len(q) > 0:
+        block_hash, _ = q.popleft()
+        order.append(block_hash)
+        for next_hash in next_blocks(store.get_block(block_hash)):
+            if next_hash not in s:
+                s.add(next_hash)
+                next_score = score(next_hash)
+                if max_score is None or next_score <= max_score:
+                    q.insert(bisect(q, next_score), (next_hash, next_score))
+    return order
+
+
+def test_traverse_loaded_blocks_order(store, dag):
+    def score(h):
+        return store.get_header_data(h).daaScore
+    expected = sorted_queue_traversal(store, [store.pruning_point()], score, lambda block: block.children)
+    order = [h for h, _ in store.traverse_loaded_blocks()]
+    # DAA scores can tie, and the heap breaks ties by hash where the sorted queue kept insertion order
+    assert order == sorted(expected, key=lambda h: (score(h), h))
+    assert [score(h) for h in order] == [score(h) for h in expected]
+    assert len(order) == dag.num_blocks
+
+
+def test_traverse_from_tips_order(store, dag):
+    tips, _ = store.tips()
+    expected = sorted_queue_traversal(store, tips, lambda h: -store.get_header_data(h).blueWork,
+                                      lambda block: block.parents)
+    order = [h for h, _ in store.traverse_from_tips()]
+    assert order == expected
+    assert len(order) == dag.num_blocks
+
+
+def test_load_recent_blocks(store, dag):
+    tips, hst = store.tips()
+    max_time_back = 60 * 1000
+    hst_timestamp = store.get_header_data(hst).timeInMilliseconds
+    store.load_recent_blocks(max_time_back)
+    recent = [h for h in dag.hashes if h in store.blocks]
+    expected = sorted_queue_traversal(store, tips, lambda h: -store.get_header_data(h).timeInMilliseconds,
+                                      lambda block: block.parents, max_time_back - hst_timestamp)
+    assert sorted(recent) == sorted(expected)
+    assert 0 < len(recent) < dag.num_blocks
+
+
+def test_bulk_scan(db_path, dag):
+    for after_pruning_point in [True, False]:
+        loaded = []
+        for bulk_scan in [False, True]:
+            s = Store(db_path)
+            try:
+                s.load_blocks(after_pruning_point=after_pruning_point, bulk_scan=bulk_scan)
+                loaded.append({h: (sorted(block.parents), sorted(block.children)) for h, block in s.blocks.items()})
+            finally:
+                s.close()
+        assert loaded[0] == loaded[1]
+        assert len(loaded[0]) == dag.num_blocks
@@ -0,0 +1,130 @@
+import pytest
+
+from store import Store
+
+
+def utxo_diff_chain(dag, i):
+    chain = []
+    while i is not None:
+        chain.append(i)
+        i = dag.utxo_diff_child(i)
+    return chain
+
+
+def reference_common_root(dag, low, high):
+    # The first block of the diff-child chain of high (from its diff child on) that is on the chain of low
+    low_chain = set(utxo_diff_chain(dag, low)[1:])
+    for b in utxo_diff_chain(dag, high)[1:]:
+        if b in low_chain:
+            return dag.hashes[b]
+    return None
+
+
+def tree_blocks(dag):
+    # Blocks with a diff child, and diff children
+    with_child = [i for i in range(dag.num_blocks) if dag.utxo_diff_child(i) is not None]
+    return sorted(set(with_child) | {dag.utxo_diff_child(i) for i in with_child})
+
+
+def check_common_roots(s, dag):
+    tree = s.load_utxo_diff_tree()
+    pairs = [(low, high) for low in range(0, dag.num_blocks, 13) for high in range(5, dag.num_blocks, 17)]
+    roots = tree.common_roots([dag.hashes[low] for low, _ in pairs], [dag.hashes[high] for _, high in pairs])
+    assert roots == [reference_common_root(dag, low, high) for low, high in pairs]
+    assert any(root is not None for root in roots)
+    return tree
+
+
+def test_common_utxo_diff_roots(store, dag):
+    pairs = [(5, 200), (17, 150), (dag.chain[2], dag.chain[-1]), (dag.tips[0], 40)]
+    # The chain walk of get_common_utxo_diff_root, used until the tree is loaded
+    walked = [store.get_common_utxo_diff_root(dag.hashes[low], dag.hashes[high]) for low, high in pairs]
+    tree = check_common_roots(store, dag)
+    assert [store.get_common_utxo_diff_root(dag.hashes[low], dag.hashes[high]) for low, high in pairs] == walked
+    blocks = tree_blocks(dag)
+    ids = store.block_index.ids([dag.hashes[i] for i in blocks])
+    assert list(tree.blue_work[ids]) == [dag.blue_work[i] for i in blocks]
+
+
+def test_missing_headers(dag, tmp_path):
+    missing = {dag.chain[len(dag.chain) // 2], dag.num_blocks // 3}
+    path = str(tmp_path / 'datadir')
+    dag.write(path, missing_headers=missing)
+    s = Store(path)
+    try:
+        tree = check_common_roots(s, dag)
+        blocks = tree_blocks(dag)
+        assert missing <= set(blocks)
+        ids = s.block_index.ids([dag.hashes[i] for i in blocks])
+        assert list(tree.blue_work[ids]) == [None if i in missing else dag.blue_work[i] for i in blocks]
+    finally:
+        s.close()
+
+
+def replay(dag, i):
+    # Brute-force UTXO set of block i: the diffs of its diff chain applied to the virtual UTXO set, from the
+    # virtual side down to i, each removing its toRemove outpoints before adding its toAdd ones
+    utxo_set = dict(dag.utxo_set)
+    for b in utxo_diff_chain(dag, i)[::-1]:
+        to_add, to_remove = dag.utxo_diffs[b]
+        for outpoint in to_remove:
+            utxo_set.pop(outpoint, None)
+        utxo_set.update(to_add)
+    return utxo_set
+
+
+def replay_cases(dag, i):
+    # Outpoints re-added after a removal, removed again after an addition, and added and removed in one step
+    removed, added, cases = set(), set(), set()
+    for b in utxo_diff_chain(dag, i)[::-1]:
+        to_add, to_remove = dag.utxo_diffs[b]
+        cases |= {'re-added' for outpoint in to_add if outpoint in removed}
+        cases |= {'removed again' for outpoint in to_remove if outpoint in added}
+        cases |= {'same step' for outpoint in to_add if outpoint in to_remove}
+        removed |= set(to_remove)
+        added |= set(to_add)
+    return cases
+
+
+def historical_rows(batches):
+    rows = {}
+    for batch in batches:
+        for transaction_id, index, amount, pubkey_script, daa_score, is_coinbase in zip(
+                batch.transaction_ids(), batch['index'].tolist(), batch['amount'].tolist(), batch.scripts(),
+                batch['blockDaaScore'].tolist(), batch['isCoinbase'].tolist()):
+            assert (transaction_id, index) not in rows
+            rows[transaction_id, index] = (amount, pubkey_script, daa_score, is_coinbase)
+    return rows
+
+
+def test_utxo_diff_chain(store, dag):
+    blocks = [0, dag.chain[len(dag.chain) // 2], dag.headers_selected_tip] + \
+        [i for i in range(dag.num_blocks) if i not in dag.chain][:20:4] + dag.tips
+    walked = [store.get_utxo_diff_chain(dag.hashes[i]) for i in blocks]
+    assert walked == [[dag.hashes[b] for b in utxo_diff_chain(dag, i)] for i in blocks]
+    store.load_utxo_diff_tree()
+    assert [store.get_utxo_diff_chain(dag.hashes[i]) for i in blocks] == walked
+
+
+@pytest.mark.parametrize('batch_size', [16, 100000])
+def test_historical_utxoset(store, dag, batch_size):
+    blocks = [0, dag.chain[len(dag.chain) // 2], dag.chain[-3],
+              next(i for i in range(dag.num_blocks) if i not in dag.chain)]
+    assert replay_cases(dag, 0) == {'re-added', 'removed again', 'same step'}
+    for i in blocks:
+        expected = replay(dag, i)
+        batches = list(store.iter_historical_utxoset(dag.hashes[i], batch_size=batch_size))
+        assert all(0 < batch.num_rows <= batch_size for batch in batches)
+        assert historical_rows(batches) == expected
+        amounts = [amount for batch in store.iter_historical_utxoset(dag.hashes[i], fields=['amount'],
+                                                                     batch_size=batch_size)
+                   for amount in batch['amount'].tolist()]
+        assert sorted(amounts) == sorted(entry[0] for entry in expected.values())
+
+
+def test_historical_balances(store, dag):
+    expected = {}
+    for amount, pubkey_script, _, _ in replay(dag, 0).values():
+        expected[pubkey_script] = expected.get(pubkey_script, 0) + amount
+    balances = store.utxo_balances(block_hash=dag.hashes[0], batch_size=16)
+    assert dict(zip(balances['pubkey_script'], balances['balance'].tolist())) == expected
@@ -0,0 +1,107 @@
+import numpy as np
+import pytest
+
+from store import UTXOBatch, virtual_utxo_set_key
+
+
+def reference_rows(dag):
+    # UTXO set rows in DB order (by serialized outpoint)
+    outpoints = sorted(dag.utxo_set, key=dag.outpoint_key)
+    return [(transaction_id, index) + dag.utxo_set[transaction_id, index] for transaction_id, index in outpoints]
+
+
+def batch_rows(batch):
+    return list(zip(batch.transaction_ids(), batch['index'].tolist(), batch['amount'].tolist(), batch.scripts(),
+                    batch['blockDaaScore'].tolist(), batch['isCoinbase'].tolist()))
+
+
+@pytest.mark.parametrize('batch_size', [1, 7, 250, 100000])
+def test_batch_boundaries(store, dag, batch_size):
+    batches = list(store.iter_utxoset(virtual_utxo_set_key, batch_size=batch_size))
+    expected = reference_rows(dag)
+    assert [batch.num_rows for batch in batches[:-1]] == [batch_size] * (len(batches) - 1)
+    assert 0 < batches[-1].num_rows <= batch_size
+    assert sum(batch.num_rows for batch in batches) == len(expected)
+    assert [row for batch in batches for row in batch_rows(batch)] == expected
+    merged = UTXOBatch.concat(batches)
+    assert merged.num_rows == len(expected)
+    assert batch_rows(merged) == expected
+
+
+def test_field_projection(store, dag):
+    expected = reference_rows(dag)
+    batch, = store.iter_virtual_utxoset(fields=['amount', 'pubkey_script'])
+    assert set(batch) == {'amount', 'pubkey_script', 'pubkey_script_offsets'}
+    assert batch['amount'].tolist() == [row[2] for row in expected]
+    assert batch.scripts() == [row[3] for row in expected]
+    batch, = store.iter_virtual_utxoset(fields=['index', 'isCoinbase'])
+    assert set(batch) == {'index', 'isCoinbase'}
+    assert batch['index'].tolist() == [row[1] for row in expected]
+    assert batch['isCoinbase'].tolist() == [row[5] for row in expected]
+    with pytest.raises(ValueError):
+        next(store.iter_virtual_utxoset(fields=['amount', 'address']))
+
+
+@pytest.mark.parametrize('workers', [1, 2])
+def test_load_utxo_data(store, dag, workers):
+    expected = reference_rows(dag)
+    frames = store.load_utxo_data(UTXOBatch.fields, workers=workers)
+    assert set(frames) == set(UTXOBatch.fields)
+    assert frames['transactionId'] == [row[0] for row in expected]
+    assert frames['pubkey_script'] == [row[3] for row in expected]
+    for column, field in enumerate(UTXOBatch.fields):
+        if field in ('transactionId', 'pubkey_script'):
+            continue
+        assert isinstance(frames[field], np.ndarray)
+        assert frames[field].dtype == {'index': np.uint32, 'amount': np.uint64, 'blockDaaScore': np.uint64,
+                                       'isCoinbase': np.bool_}[field]
+        assert frames[field].tolist() == [row[column] for row in expected]
+    assert store.load_utxo_data(workers=workers) == {}
+
+
+
+def reference_balances(utxo_set, coinbase_only=False):
+    balances = {}
+    for amount, pubkey_script, _, is_coinbase in utxo_set.values():
+        if is_coinbase or not coinbase_only:
+            balance, count = balances.get(pubkey_script, (0, 0))
+            balances[pubkey_script] = (balance + amount, count + 1)
+    # By descending balance, ties by script length and bytes
+    return sorted(((script, balance, count) for script, (balance, count) in balances.items()),
+                  key=lambda row: (-row[1], len(row[0]), row[0]))
+
+
+@pytest.mark.parametrize('batch_size', [10, 100000])
+@pytest.mark.parametrize('coinbase_only', [False, True])
+def test_utxo_balances(store, dag, batch_size, coinbase_only):
+    expected = reference_balances(dag.utxo_set, coinbase_only)
+    # Empty scripts, scripts with trailing zero bytes and several script lengths are grouped
+    scripts = [row[0] for row in expected]
+    assert b'' in scripts or coinbase_only
+    assert {b'\x51', b'\x51\x00', b'\x51\x00\x00'} <= set(scripts)
+    assert len({len(row[0]) for row in expected}) > 5
+    balances = store.utxo_balances(coinbase_only=coinbase_only, batch_size=batch_size)
+    assert list(zip(balances['pubkey_script'], balances['balance'].tolist(), balances['utxo_count'].tolist())) \
+        == expected
+    assert balances['address'][0] is None or balances['address'][0].startswith('kaspa')
+    top = store.utxo_balances(coinbase_only=coinbase_only, top=5, min_balance=expected[3][1], batch_size=batch_size)
+    assert top['pubkey_script'] == [row[0] for row in expected[:4]]
+
+
+def test_take_and_concat(store, dag):
+    expected = reference_rows(dag)
+    batches = list(store.iter_virtual_utxoset(batch_size=100))
+    batch = UTXOBatch.concat(batches)
+    rows = np.array([5, 0, 5, len(expected) - 1, 42])
+    assert batch_rows(batch.take(rows)) == [expected[row] for row in rows]
+    mask = np.array([len(row[3]) % 2 == 0 for row in expected])
+    assert batch_rows(batch.take(mask)) == [row for row, keep in zip(expected, mask) if keep]
+    scripts = batch.take(rows, ['pubkey_script'])
+    assert set(scripts) == {'pubkey_script', 'pubkey_script_offsets'}
+    assert scripts.scripts() == [expected[row][3] for row in rows]
+    empty = batch.take(np.zeros(0, dtype=np.int64))
+    assert empty.num_rows == 0 and empty.scripts() == []
+    parts = [batch.take(np.arange(10, 20)), None, empty, batch.take(np.arange(3))]
+    assert batch_rows(UTXOBatch.concat(parts)) == expected[10:20] + expected[:3]
+    assert UTXOBatch.concat(parts).outpoint_keys().tobytes() == b''.join(
+        row[0] + row[1].to_bytes(4, 'little') for row in expected[10:20] + expected[:3])